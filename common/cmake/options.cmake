@@ -57,11 +57,23 @@ INCLUDE(linkoplklib)
 SET (OPCUA_NAMESPACE "http://opcua2powerlink.org/demo/"
     CACHE STRING "Name of the OPC UA namespace")
 
+# split the generated nodeset code into several files, which are compiled in parallel
+SET (OPCUA_NODESET_SHARDS 1
+    CACHE STRING "Number of files the generated nodeset code is split into, only used with the functions backend")
+
+# generate two functions per node, tables which are walked by a generic loader,
+# or a binary snapshot which is loaded directly into the nodestore
+SET (OPCUA_NODESET_BACKEND "functions"
+    CACHE STRING "Generate the nodeset as functions, as tables or as binary snapshot")
+SET_PROPERTY(CACHE OPCUA_NODESET_BACKEND PROPERTY STRINGS functions tables snapshot)
+
+# measure the phases and node classes of the nodeset start-up and log them
+OPTION (OPCUA_NODESET_PROFILE "Log the start-up profile of the generated nodeset code" OFF)
+
 # search for an .xdd file
 file(GLOB XDD_LIST ${OBJDICT_DIR}/CiA401_CN/*.xdd)
 list(GET XDD_LIST 0 XDD_FILE)
 
-UNSET(XDD CACHE)
 IF(XDD_FILE)
 	SET(XDD ${XDD_FILE} CACHE STRING "Loading xdd file: ${XDD_FILE}")
 	MESSAGE(STATUS "Found XDD file: ${XDD}")
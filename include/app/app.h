@@ -66,6 +66,7 @@ void       printOutputs(void);
 void       printInputs(void);
 void       setupInputs(void);
 void       callbackOPCUA(UA_Server* server);
+UA_StatusCode setupCallbacks_OPCUA(UA_Server* server);
 void	   setStatus_OPCUA(const char* status);
 
 #ifdef __cplusplus
@@ -388,12 +388,25 @@ void *OPCUA_thread(void)
 	UA_Server_addRepeatedCallback(server, callbackOPCUA, NULL, 5, NULL);
 
 	UA_StatusCode retval;
-	// create nodes from nodeset
-	if (nodeset(server) != UA_STATUSCODE_GOOD) {
+	// create nodes from nodeset, a snapshot is loaded directly into the nodestore
+#ifdef NODESET_SNAPSHOT
+	retval = nodeset(server, &config->nodestore);
+#else
+	retval = nodeset(server);
+#endif
+#ifdef NODESET_PROFILE
+	nodeset_logProfile(UA_Log_Stdout);
+#endif
+	if (retval != UA_STATUSCODE_GOOD) {
 		UA_LOG_ERROR(UA_Log_Stdout, UA_LOGCATEGORY_SERVER, "Could not add the example nodeset. "
 			"Check previous output for any error.");
 		retval = UA_STATUSCODE_BADUNEXPECTEDERROR;
 	}
+	// forward client writes directly to the application variables
+	else if (setupCallbacks_OPCUA(server) != UA_STATUSCODE_GOOD) {
+		UA_LOG_ERROR(UA_Log_Stdout, UA_LOGCATEGORY_SERVER, "Could not attach the write callbacks.");
+		retval = UA_STATUSCODE_BADUNEXPECTEDERROR;
+	}
 	else {
 		UA_Server_run(server, &running);
 		UA_Server_run_shutdown(server);
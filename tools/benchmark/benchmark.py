@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###
+### This program benchmarks the code generators. For each model size a
+### synthetic xdd file is created and converted like during the CMake run.
+### The wall time and the peak memory of every phase of ConvertXDD.create_all
+### and of the nodeset compiler are recorded.
+###
+### The results can be saved as a baseline and compared against a previously
+### saved baseline, so performance regressions of the generators are detected.
+###
+
+from __future__ import print_function
+
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", ".."))
+
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools", "xdd_compiler"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools", "nodeset_compiler"))
+
+from generate_xdd import create_xdd, TEMPLATE
+from ConvertXDD import ConvertXDD
+from nodeset import NodeSet
+from backend_open62541 import generateOpen62541Code
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "http://opcua2powerlink.org/demo/"
+# Version 2 dropped the phase nodeset.allocate_variables
+BASELINE_VERSION = 2
+
+
+# Create a scratch project directory with the layout expected by ConvertXDD
+def create_workspace(directory):
+    for sub_dir in ["common/objdicts/CiA401_CN", "include/opcua", "src/opcua2powerlink", "tools/nodeset"]:
+        os.makedirs(os.path.join(directory, sub_dir))
+    for sub_dir in ["tools/schema", "tools/xdd_compiler"]:
+        shutil.copytree(os.path.join(ROOT_DIR, sub_dir), os.path.join(directory, sub_dir))
+
+
+# Get the phases of the generator run, each phase works on the shared state
+def create_phases(directory, xdd, backend="functions"):
+    state = {}
+    schema = os.path.join(directory, "tools", "schema", "Opc.Ua.NodeSet2.Minimal.xml")
+    nodeset_xml = os.path.join(directory, "tools", "nodeset", "nodeset.xml")
+    output = os.path.join(directory, "include", "opcua", "nodeset")
+
+    def parse():
+        state['converter'] = ConvertXDD(directory=directory, link=NAMESPACE, xdd=xdd)
+
+    def load_nodeset(filename, hidden):
+        with open(filename, "rb") as f:
+            state['nodeset'].addNodeSet(f, hidden, typesArray="UA_TYPES")
+
+    def create_nodeset():
+        state['nodeset'] = NodeSet()
+
+    return [
+        ("xdd.parse", parse),
+        ("xdd.create_oplk_elements", lambda: state['converter'].create_oplk_elements()),
+        ("xdd.create_oplk_tags", lambda: state['converter'].create_oplk_tags()),
+        ("xdd.create_devices", lambda: state['converter'].create_devices()),
+        ("xdd.create_objdict", lambda: state['converter'].create_objdict()),
+        ("xdd.create_nodeset_xml", lambda: state['converter'].create_nodeset_xml()),
+        ("xdd.create_app", lambda: state['converter'].create_app()),
+        ("nodeset.init", create_nodeset),
+        ("nodeset.load_existing", lambda: load_nodeset(schema, True)),
+        ("nodeset.load_xml", lambda: load_nodeset(nodeset_xml, False)),
+        ("nodeset.sanitize", lambda: state['nodeset'].sanitize()),
+        ("nodeset.build_encoding_rules", lambda: state['nodeset'].buildEncodingRules()),
+        # Like the nodeset compiler, the values are decoded per node during
+        # the code generation
+        ("nodeset.generate_code", lambda: generateOpen62541Code(state['nodeset'], output, False, False,
+                                                                ["UA_TYPES"], 0, backend=backend)),
+    ]
+
+
+# Run all phases once and measure either the time or the peak memory
+def run_phases(xdd, trace_memory, backend):
+    results = {}
+    directory = tempfile.mkdtemp(prefix="oplk_bench_")
+    try:
+        create_workspace(directory)
+        for name, phase in create_phases(directory, xdd, backend):
+            gc.collect()
+            if trace_memory:
+                # Restarting the trace resets the peak, so the peak only
+                # contains the memory allocated during this phase
+                tracemalloc.start()
+                phase()
+                results[name] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                start = time.time()
+                phase()
+                results[name] = time.time() - start
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+# Benchmark one xdd file
+def benchmark_xdd(xdd, repeat, measure_memory, backend):
+    times = None
+    for run in range(repeat):
+        run_times = run_phases(xdd, False, backend)
+        if times is None:
+            times = run_times
+        else:
+            times = dict((name, min(times[name], run_times[name])) for name in times)
+
+    memory = run_phases(xdd, True, backend) if measure_memory else {}
+
+    result = {}
+    for name in times:
+        result[name] = {'time': times[name]}
+        if name in memory:
+            result[name]['peak'] = memory[name]
+    result['total'] = {'time': sum(times.values())}
+    if memory:
+        result['total']['peak'] = max(memory.values())
+    return result
+
+
+# Compare the results against a baseline, returns the list of regressions
+def compare(results, baseline, tolerance, min_time):
+    regressions = list()
+    for size, phases in sorted(results.items()):
+        if size not in baseline['results']:
+            continue
+        for name, values in sorted(phases.items()):
+            base = baseline['results'][size].get(name)
+            if base is None:
+                continue
+            for key, limit in [('time', min_time), ('peak', 0)]:
+                if key not in values or key not in base:
+                    continue
+                if values[key] > base[key] * (1.0 + tolerance) and values[key] - base[key] > limit:
+                    regressions.append((size, name, key, base[key], values[key]))
+    return regressions
+
+
+# Format a value for the report
+def format_value(key, value):
+    if key == 'time':
+        return "%.4f s" % value
+    return "%.1f kB" % (value / 1024.0)
+
+
+# Print the results in the order of the inputs and phases
+def print_results(results, names):
+    order = [name for name, phase in create_phases("", "")] + ['total']
+    for size in names:
+        print("%s:" % size)
+        for name in order:
+            values = results[size][name]
+            peak = format_value('peak', values['peak']) if 'peak' in values else "-"
+            print("    %-32s %12s %14s" % (name, format_value('time', values['time']), peak))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the xdd and nodeset code generators.')
+    parser.add_argument('-n', '--variables', default="100,1000,10000",
+                        help='Comma separated list of model sizes in process variables (default: 100,1000,10000)')
+    parser.add_argument('-x', '--xdd', action='append', default=[],
+                        help='Benchmark the given xdd file instead of synthetic files, can be used multiple times')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest run is reported (default: 3)')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Seed for the synthetic xdd files (default: 0)')
+    parser.add_argument('-b', '--backend', choices=["functions", "tables", "snapshot"], default="functions",
+                        help='Backend of the nodeset compiler (default: functions)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the additional run which measures the peak memory')
+    parser.add_argument('--save', metavar='<baseline>', help='Save the results as baseline json file')
+    parser.add_argument('--compare', metavar='<baseline>', help='Compare the results against a baseline json file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative increase before a regression is reported (default: 0.2)')
+    parser.add_argument('--min-time', type=float, default=0.01,
+                        help='Time differences below this value in s are never reported (default: 0.01)')
+    args = parser.parse_args()
+
+    measure_memory = not args.no_memory
+    if measure_memory and tracemalloc is None:
+        logger.warning("tracemalloc is not available, the peak memory is not measured!")
+        measure_memory = False
+
+    inputs = list()
+    if args.xdd:
+        for xdd_file in args.xdd:
+            if not os.path.isfile(xdd_file):
+                logger.error("No xdd file %s was found!" % xdd_file)
+                sys.exit(-1)
+            inputs.append((os.path.basename(xdd_file), os.path.abspath(xdd_file), None))
+    else:
+        for size in args.variables.split(','):
+            inputs.append(("%s variables" % size, None, int(size)))
+
+    results = {}
+    for name, xdd_file, size in inputs:
+        print("Benchmarking %s..." % name)
+        tmp_file = None
+        if xdd_file is None:
+            fd, tmp_file = tempfile.mkstemp(suffix=".xdd")
+            with os.fdopen(fd, 'w') as f:
+                f.write(create_xdd(TEMPLATE, size, seed=args.seed))
+            xdd_file = tmp_file
+        try:
+            results[name] = benchmark_xdd(xdd_file, max(args.repeat, 1), measure_memory, args.backend)
+        finally:
+            if tmp_file:
+                os.remove(tmp_file)
+
+    print_results(results, [name for name, xdd_file, size in inputs])
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'version': BASELINE_VERSION, 'python': platform.python_version(), 'seed': args.seed,
+                       'results': results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != BASELINE_VERSION:
+            logger.error("Unsupported baseline version!")
+            sys.exit(-1)
+        regressions = compare(results, baseline, args.tolerance, args.min_time)
+        for size, name, key, old, new in regressions:
+            print("REGRESSION %s %s %s: %s -> %s" % (size, name, key, format_value(key, old), format_value(key, new)))
+        if regressions:
+            sys.exit(1)
+        print("No regressions against %s" % args.compare)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###
+### This program creates synthetic POWERLINK device description (xdd) files
+### with a configurable number of application objects. The files are used to
+### benchmark the code generators with models of different sizes.
+###
+### The communication profile (0x1000 - 0x1FFF) is taken unchanged from the
+### CiA401 template. All objects of the manufacturer (0x2000 - 0x5FFF) and
+### device profile (0x6000 - 0x9FFF) areas are replaced by generated ones.
+###
+
+import os
+import re
+import sys
+import random
+import argparse
+import logging
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+# Default template containing the communication profile
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common", "objdicts",
+                        "CiA401_CN", "00000000_POWERLINK_CiA401_CN.xdd")
+
+# POWERLINK data types which can be used for the generated objects
+DATA_TYPES = {
+    'INT8': '0002',
+    'INT16': '0003',
+    'INT32': '0004',
+    'UINT8': '0005',
+    'UINT16': '0006',
+    'UINT32': '0007',
+}
+
+# The code generators build the OPC UA node ids by concatenating the index and
+# sub-index strings, so only hex values without the digits A-F can be used.
+MAX_SUB_INDEX = 9
+MANUFACTURER_INDICES = ["%04d" % i for i in range(2000, 6000)]
+STANDARDISED_INDICES = ["%04d" % i for i in range(6000, 10000)]
+
+OBJECT_RE = re.compile(r'[ \t]*<Object\s+index="([0-9A-Fa-f]{4})"[^>]*?(?:/>|>.*?</Object>)[ \t]*\n?', re.DOTALL)
+
+
+# Create the xml lines of one array object
+def create_array(index, data_type, access, entries):
+    pdo = 'TPDO' if access == 'ro' else 'RPDO'
+    name = 'Input' if access == 'ro' else 'Output'
+    lines = list()
+    lines.append('          <Object index="%s" name="Array_%s" objectType="8" dataType="%s">\n' % (
+        index, index, data_type))
+    lines.append('            <SubObject subIndex="00" name="NumberOfEntries" objectType="7" dataType="0005" ' +
+                 'accessType="const" defaultValue="%d" PDOmapping="no"/>\n' % entries)
+    for sub_index in range(1, entries + 1):
+        lines.append('            <SubObject subIndex="%02d" name="%s" objectType="7" dataType="%s" ' % (
+            sub_index, name, data_type) + 'accessType="%s" PDOmapping="%s"/>\n' % (access, pdo))
+    lines.append('          </Object>\n')
+    return lines
+
+
+# Create the xml line of one single object
+def create_single(index, data_type, access):
+    pdo = 'TPDO' if access == 'ro' else 'RPDO'
+    return ['          <Object index="%s" name="Var_%s" objectType="7" dataType="%s" accessType="%s" ' % (
+        index, index, data_type, access) + 'PDOmapping="%s"/>\n' % pdo]
+
+
+# Create the application objects for the requested number of variables
+def create_objects(variables, array_ratio, ro_ratio, types, seed):
+    rand = random.Random(seed)
+    pools = [list(MANUFACTURER_INDICES), list(STANDARDISED_INDICES)]
+    objects = list()
+    remaining = variables
+    area = 0
+
+    while remaining > 0:
+        # Alternate between the manufacturer and the standardised area
+        if not pools[area]:
+            area = 1 - area
+            if not pools[area]:
+                logger.error("%d variables do not fit into the available object indices!" % variables)
+                sys.exit(-1)
+        index = pools[area].pop(0)
+        area = 1 - area
+
+        data_type = DATA_TYPES[rand.choice(types)]
+        access = 'ro' if rand.random() < ro_ratio else 'rw'
+        if remaining > 1 and rand.random() < array_ratio:
+            entries = min(rand.randint(2, MAX_SUB_INDEX), remaining)
+            objects.append((index, create_array(index, data_type, access, entries)))
+            remaining -= entries
+        else:
+            objects.append((index, create_single(index, data_type, access)))
+            remaining -= 1
+
+    # The generators expect the objects in ascending order
+    lines = list()
+    for index, object_lines in sorted(objects):
+        lines.extend(object_lines)
+    return lines
+
+
+# Create the xdd file content from the template
+def create_xdd(template, variables, array_ratio=0.8, ro_ratio=0.5, types=None, seed=0):
+    if not os.path.isfile(template):
+        logger.error("No xdd template file was found!")
+        sys.exit(-1)
+
+    with open(template, 'r') as f:
+        content = f.read()
+
+    start = content.find('<ObjectList>')
+    end = content.find('</ObjectList>')
+    if start < 0 or end < 0:
+        logger.error("The xdd template contains no object list!")
+        sys.exit(-1)
+    start += len('<ObjectList>')
+
+    # Keep the communication profile objects only
+    object_list = content[start:end]
+    kept = [block.group(0) for block in OBJECT_RE.finditer(object_list) if int(block.group(1), 16) < 0x2000]
+    generated = create_objects(variables, array_ratio, ro_ratio, types or sorted(DATA_TYPES), seed)
+
+    return content[:start] + '\n' + ''.join(kept) + ''.join(generated) + '        ' + content[end:]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create a synthetic POWERLINK xdd file.')
+    parser.add_argument('output', help='Path of the xdd file to create')
+    parser.add_argument('-n', '--variables', type=int, default=100,
+                        help='Number of process variables to create (default: 100)')
+    parser.add_argument('-a', '--array-ratio', type=float, default=0.8,
+                        help='Probability that an object is an array (default: 0.8)')
+    parser.add_argument('-r', '--ro-ratio', type=float, default=0.5,
+                        help='Probability that an object is read only (default: 0.5)')
+    parser.add_argument('-t', '--types', default=','.join(sorted(DATA_TYPES)),
+                        help='Comma separated list of data types to use (default: all of %s)' %
+                             ','.join(sorted(DATA_TYPES)))
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Seed of the random generator (default: 0)')
+    parser.add_argument('--template', default=TEMPLATE, help='xdd file with the communication profile')
+    args = parser.parse_args()
+
+    type_list = args.types.split(',')
+    for type_name in type_list:
+        if type_name not in DATA_TYPES:
+            logger.error("Unsupported data type %s!" % type_name)
+            sys.exit(-1)
+
+    if args.variables < 1:
+        logger.error("At least one variable must be created!")
+        sys.exit(-1)
+
+    xdd = create_xdd(args.template, args.variables, args.array_ratio, args.ro_ratio, type_list, args.seed)
+    with open(args.output, 'w') as f:
+        f.write(xdd)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###
+### This program is a micro-benchmark of the NodeId class of the nodeset
+### compiler. The dictionary, set and list operations which the compiler
+### performs with NodeIds are timed for the current NodeId, which hashes and
+### compares a precomputed tuple, and for a NodeId with the former string based
+### identity, which formats the id on every hash and comparison.
+###
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import argparse
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", ".."))
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools", "nodeset_compiler"))
+
+from datatypes import NodeId, internNodeId
+
+
+class StringNodeId(NodeId):
+    """ NodeId with the former identity, the string representation is created
+        for every hash and comparison.
+    """
+
+    def __eq__(self, nodeId2):
+        return str(self) == str(nodeId2)
+
+    def __ne__(self, nodeId2):
+        return not self.__eq__(nodeId2)
+
+    def __hash__(self):
+        return hash(str(self))
+
+
+# Get the id strings of the benchmark, a mix of namespaces and id types
+def create_id_strings(count):
+    ids = list()
+    for i in range(count):
+        if i % 10 == 9:
+            ids.append("ns=%d;s=Device%d.Variable%d" % (i % 3 + 1, i // 1000, i))
+        else:
+            ids.append("ns=%d;i=%d" % (i % 3, i))
+    return ids
+
+
+# Get the operations of the benchmark for one NodeId factory
+def create_operations(factory, id_strings, relevant_count):
+    keys = [factory(s) for s in id_strings]
+    queries = [factory(s) for s in id_strings]
+    table = dict((key, None) for key in keys)
+    relevant = keys[:relevant_count]
+
+    def dict_insert():
+        d = {}
+        for key in keys:
+            d[key] = None
+
+    def dict_lookup():
+        for query in queries:
+            table[query]
+
+    def set_insert():
+        s = set()
+        for key in keys:
+            s.add(key)
+
+    def list_membership():
+        for query in queries:
+            query in relevant
+
+    def compare():
+        for key, query in zip(keys, queries):
+            key == query
+
+    return [
+        ("dict insert", dict_insert),
+        ("dict lookup", dict_lookup),
+        ("set insert", set_insert),
+        ("list membership", list_membership),
+        ("equality", compare),
+    ]
+
+
+# Run an operation several times and return the fastest run
+def measure(operation, repeat):
+    best = None
+    for run in range(repeat):
+        start = time.time()
+        operation()
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the NodeId operations of the nodeset compiler.')
+    parser.add_argument('-n', '--nodes', type=int, default=100000,
+                        help='Number of NodeIds (default: 100000)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Number of timed runs, the fastest run is reported (default: 5)')
+    parser.add_argument('--relevant', type=int, default=20,
+                        help='Length of the list used for the membership test (default: 20)')
+    args = parser.parse_args()
+
+    id_strings = create_id_strings(args.nodes)
+    factories = [
+        ("string", StringNodeId),
+        ("tuple", NodeId),
+        ("interned", internNodeId),
+    ]
+    results = dict((name, create_operations(factory, id_strings, args.relevant)) for name, factory in factories)
+
+    print("%d NodeIds, fastest of %d runs" % (args.nodes, max(args.repeat, 1)))
+    print("    %-20s %12s %12s %12s %9s" % ("operation", "string", "tuple", "interned", "speedup"))
+    for index, (operation, _) in enumerate(results["string"]):
+        times = [measure(results[name][index][1], max(args.repeat, 1)) for name, factory in factories]
+        print("    %-20s %10.4f s %10.4f s %10.4f s %8.1fx" % (
+            operation, times[0], times[1], times[2], times[0] / max(times[1], 1e-9)))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###
+### This program is a benchmark of the node ordering of the nodeset compiler.
+### Synthetic nodesets of different sizes are loaded on top of the minimal
+### namespace 0 and the time of reorderNodesMinDependencies is reported per
+### node. For a linear-time ordering the time per node stays constant.
+###
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import time
+import argparse
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", ".."))
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools", "nodeset_compiler"))
+
+from nodeset import NodeSet
+from backend_open62541 import reorderNodesMinDependencies
+
+NS0_FILE = os.path.join(ROOT_DIR, "tools", "schema", "Opc.Ua.NodeSet2.Minimal.xml")
+
+
+# Get a synthetic nodeset with the given number of nodes. The variables are
+# grouped into folders of 100 variables below the objects folder.
+def create_nodeset(count):
+    folders = max(1, count // 101)
+    out = ['<?xml version="1.0" encoding="utf-8"?>',
+           '<UANodeSet xmlns="http://opcfoundation.org/UA/2011/03/UANodeSet.xsd" '
+           'xmlns:uax="http://opcfoundation.org/UA/2008/02/Types.xsd">',
+           '<NamespaceUris><Uri>http://benchmark.test/</Uri></NamespaceUris>',
+           '<Aliases><Alias Alias="Int32">i=6</Alias><Alias Alias="Organizes">i=35</Alias>'
+           '<Alias Alias="HasComponent">i=47</Alias><Alias Alias="HasTypeDefinition">i=40</Alias></Aliases>']
+    for f in range(folders):
+        out.append('<UAObject NodeId="ns=1;i=%d" BrowseName="1:Folder%d"><DisplayName>Folder%d</DisplayName>'
+                   '<References><Reference ReferenceType="Organizes" IsForward="false">i=85</Reference>'
+                   '<Reference ReferenceType="HasTypeDefinition">i=61</Reference></References></UAObject>'
+                   % (f + 1, f, f))
+    for v in range(count - folders):
+        out.append('<UAVariable NodeId="ns=1;i=%d" BrowseName="1:Variable%d" DataType="Int32" AccessLevel="3">'
+                   '<DisplayName>Variable%d</DisplayName><References>'
+                   '<Reference ReferenceType="HasComponent" IsForward="false">ns=1;i=%d</Reference>'
+                   '<Reference ReferenceType="HasTypeDefinition">i=63</Reference></References>'
+                   '<Value><uax:Int32>%d</uax:Int32></Value></UAVariable>'
+                   % (1000000 + v, v, v, v % folders + 1, v))
+    out.append('</UANodeSet>')
+    return "\n".join(out).encode("utf-8")
+
+
+def load_nodeset(count):
+    ns = NodeSet()
+    with open(NS0_FILE, "rb") as xmlfile:
+        ns.addNodeSet(xmlfile, True)
+    xmlfile = io.BytesIO(create_nodeset(count))
+    xmlfile.name = "synthetic_%d.xml" % count
+    ns.addNodeSet(xmlfile)
+    return ns
+
+
+# Order the nodes several times and return the fastest run
+def measure(ns, repeat):
+    best = None
+    for run in range(repeat):
+        start = time.time()
+        ordered = reorderNodesMinDependencies(ns)
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return best, len(ordered)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the node ordering of the nodeset compiler.')
+    parser.add_argument('-n', '--nodes', default="25000,50000,100000,200000",
+                        help='Comma separated list of nodeset sizes (default: 25000,50000,100000,200000)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest run is reported (default: 3)')
+    args = parser.parse_args()
+
+    print("    %-10s %12s %12s %14s" % ("nodes", "ordered", "time", "per node"))
+    for count in [int(n) for n in args.nodes.split(",")]:
+        ns = load_nodeset(count)
+        duration, ordered = measure(ns, max(args.repeat, 1))
+        print("    %-10d %12d %10.3f s %11.2f us" % (len(ns.nodes), ordered, duration, duration * 1e6 / len(ns.nodes)))
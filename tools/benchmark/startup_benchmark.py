@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###
+### This program is a benchmark of the start-up of the generated nodeset code.
+### Synthetic nodesets of different sizes are compiled with every backend of
+### the nodeset compiler into a small server program, which reports how long
+### adding the nodes to the server takes.
+###
+
+from __future__ import print_function
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", ".."))
+OPEN62541_DIR = os.path.join(ROOT_DIR, "include", "opcua")
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools", "nodeset_compiler"))
+
+from backend_open62541 import generateOpen62541Code
+from ordering_benchmark import load_nodeset
+
+BACKENDS = ["functions", "tables", "snapshot"]
+
+# Server program which times the generated nodeset function
+DRIVER_CODE = """
+#include <stdio.h>
+#include "nodeset.h"
+
+int main(void) {
+    UA_ServerConfig *config = UA_ServerConfig_new_minimal(4840, NULL);
+    UA_Server *server = UA_Server_new(config);
+    UA_DateTime start = UA_DateTime_nowMonotonic();
+#ifdef NODESET_SNAPSHOT
+    UA_StatusCode retval = nodeset(server, &config->nodestore);
+#else
+    UA_StatusCode retval = nodeset(server);
+#endif
+    UA_DateTime duration = UA_DateTime_nowMonotonic() - start;
+    printf("startup %s %lld\\n", UA_StatusCode_name(retval), (long long)duration);
+    UA_Server_delete(server);
+    UA_ServerConfig_delete(config);
+    return retval != UA_STATUSCODE_GOOD;
+}
+"""
+
+
+def compile_c(args, cc, cflags):
+    subprocess.check_call([cc] + cflags.split() + ["-I", OPEN62541_DIR] + args)
+
+
+# Generate and build the start-up program of one backend
+def build_program(directory, count, backend, library, cc, cflags):
+    ns = load_nodeset(count)
+    ns.sanitize()
+    ns.buildEncodingRules()
+    # Like the nodeset compiler, the values are decoded per node during the
+    # code generation
+    generateOpen62541Code(ns, os.path.join(directory, "nodeset"), typesArray=["UA_TYPES"], backend=backend)
+    driver = os.path.join(directory, "driver.c")
+    with open(driver, "w") as f:
+        f.write(DRIVER_CODE)
+    program = os.path.join(directory, "startup")
+    compile_c(["-I", directory, driver, os.path.join(directory, "nodeset.c"), library,
+               "-o", program, "-lpthread", "-lm"], cc, cflags)
+    return len(ns.nodes), program
+
+
+# Run the program several times and return the fastest start-up in seconds
+def measure(program, repeat):
+    best = None
+    for run in range(repeat):
+        output = subprocess.check_output([program]).decode("utf-8")
+        line = [l for l in output.splitlines() if l.startswith("startup ")][-1]
+        status, duration = line.split()[1:3]
+        if status != "Good":
+            raise Exception("Loading the nodeset failed with %s" % status)
+        duration = int(duration) / 1e7
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the start-up time of the generated nodeset code.')
+    parser.add_argument('-n', '--nodes', default="1000,2000,5000",
+                        help='Comma separated list of nodeset sizes (default: 1000,2000,5000)')
+    parser.add_argument('-b', '--backend', action='append', choices=BACKENDS, default=[],
+                        help='Backend to benchmark, can be used multiple times (default: all backends)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest run is reported (default: 3)')
+    parser.add_argument('--cc', default=os.environ.get("CC", "cc"), help='C compiler (default: $CC or cc)')
+    parser.add_argument('--cflags', default="-O2 -std=c99 -D_GNU_SOURCE",
+                        help='Flags of the C compiler (default: -O2 -std=c99 -D_GNU_SOURCE)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="startup_benchmark_")
+    try:
+        library = os.path.join(directory, "open62541.o")
+        compile_c(["-c", os.path.join(OPEN62541_DIR, "open62541.c"), "-o", library], args.cc, args.cflags)
+
+        print("    %-10s %-10s %12s %14s" % ("nodes", "backend", "startup", "per node"))
+        for count in [int(n) for n in args.nodes.split(",")]:
+            for backend in args.backend or BACKENDS:
+                build_dir = os.path.join(directory, "%s_%d" % (backend, count))
+                os.mkdir(build_dir)
+                nodes, program = build_program(build_dir, count, backend, library, args.cc, args.cflags)
+                duration = measure(program, max(args.repeat, 1))
+                print("    %-10d %-10s %10.2f ms %11.2f us" % (nodes, backend, duration * 1e3, duration * 1e6 / nodes))
+    finally:
+        shutil.rmtree(directory)
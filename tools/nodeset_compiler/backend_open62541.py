@@ -21,20 +21,26 @@
 from __future__ import print_function
 import string
 from collections import deque
+import os
 from os.path import basename
 import logging
-import codecs
-try:
-    from StringIO import StringIO
-except ImportError:
-    from io import StringIO
+import hashlib
+import json
 
 logger = logging.getLogger(__name__)
 
 from constants import *
 from nodes import *
 from nodeset import *
-from backend_open62541_nodes import generateNodeCode_begin, generateNodeCode_finish, generateReferenceCode
+from backend_open62541_nodes import generateNodeCode_begin, generateNodeCode_finish, getNodeBeginArguments, \
+    hasNodeParent
+from backend_open62541_references import referenceBatchCode, generateReferenceBatchCode
+from backend_open62541_tables import generateNodeTables
+from backend_open62541_snapshot import generateNodeSnapshot
+from backend_open62541_profile import *
+from backend_open62541_stream import StreamWriter, CodeSpool
+from backend_open62541_strings import StringPool, writeSharedStringDeclaration
+from backend_open62541_cache import CodeCache, hashCodeContext, hashNodeCode, hashShard
 
 ##############
 # Sort Nodes #
@@ -43,21 +49,22 @@ from backend_open62541_nodes import generateNodeCode_begin, generateNodeCode_fin
 # Select the references that shall be generated after this node in the ordering
 # If both nodes of the reference are hidden we assume that the references between
 # those nodes are already setup. Still print if only the target node is hidden,
-# because we need that reference.
-def selectPrintRefs(nodeset, L, node):
+# because we need that reference. printed is the set of the ids of the nodes
+# which are already in the ordering.
+def selectPrintRefs(nodeset, printed, node):
     printRefs = []
     for ref in node.references:
         targetnode = nodeset.nodes[ref.target]
         if node.hidden and targetnode.hidden:
             continue
-        if not targetnode.hidden and not targetnode in L:
+        if not targetnode.hidden and not ref.target in printed:
             continue
         printRefs.append(ref)
     for ref in node.inverseReferences:
         targetnode = nodeset.nodes[ref.target]
         if node.hidden and targetnode.hidden:
             continue
-        if not targetnode.hidden and not targetnode in L:
+        if not targetnode.hidden and not ref.target in printed:
             continue
         printRefs.append(ref)
     return printRefs
@@ -73,11 +80,14 @@ def reorderNodesMinDependencies(nodeset):
     # Kahn's algorithm
     # https://algocoding.wordpress.com/2015/04/05/topological-sorting-python/
 
+    # frozenset, the membership tests are O(1)
     relevant_types = nodeset.getRelevantOrderingReferences()
 
     # determine in-degree
     in_degree = {u.id: 0 for u in nodeset.nodes.values()}
     dataType_refs = {}
+    # most variables share a few data types, so each one is only looked up once
+    dataTypeNodes = {}
     hiddenCount = 0
     for u in nodeset.nodes.values():  # of each node
         if u.hidden:
@@ -94,7 +104,11 @@ def reorderNodesMinDependencies(nodeset):
             in_degree[u.id] += 1
 
         if isinstance(u, VariableNode) and u.dataType is not None:
-            dataTypeNode = nodeset.getDataTypeNode(u.dataType)
+            if u.dataType in dataTypeNodes:
+                dataTypeNode = dataTypeNodes[u.dataType]
+            else:
+                dataTypeNode = nodeset.getDataTypeNode(u.dataType)
+                dataTypeNodes[u.dataType] = dataTypeNode
             if dataTypeNode is not None and not dataTypeNode.hidden:
                 # we cannot print the node u because it first needs the data type node
                 in_degree[u.id] += 1
@@ -113,14 +127,16 @@ def reorderNodesMinDependencies(nodeset):
                 Q.appendleft(nodeset.nodes[id])
 
     L = []  # list for order of nodes
+    printed = set()  # ids of the nodes in L
     while Q:
         u = Q.pop()  # choose node of zero in-degree
         # decide which references to print now based on the ordering
-        u.printRefs = selectPrintRefs(nodeset, L, u)
+        u.printRefs = selectPrintRefs(nodeset, printed, u)
         if u.hidden:
             continue
 
         L.append(u)  # and 'remove' it from graph
+        printed.add(u.id)
 
         if isinstance(u, DataTypeNode):
             # decrement all the nodes which depend on this datatype
@@ -156,22 +172,314 @@ def reorderNodesMinDependencies(nodeset):
         raise Exception("Node graph is circular on the specified references. Still open nodes:\r\n" + stillOpen)
     return L
 
+###############
+# Order Cache #
+###############
+
+# Increment if the ordering or the cache format changes
+ORDER_CACHE_VERSION = 1
+
+def hashNodeSetGraph(nodeset):
+    """ Returns a hash over everything the ordering depends on: the nodes with
+        their class, hidden flag and data type, and all their references. The
+        references of a node are sorted, so the hash does not depend on the
+        iteration order of the reference sets.
+    """
+    h = hashlib.sha1()
+    h.update(("version %d\n" % ORDER_CACHE_VERSION).encode("utf-8"))
+    for node in nodeset.nodes.values():
+        refs = sorted(str(ref.referenceType) + " " + str(ref.target) + (" >" if ref.isForward else " <")
+                      for ref in node.references | node.inverseReferences)
+        dataType = getattr(node, "dataType", None)
+        line = "%s %s %d %s|%s\n" % (str(node.id), node.__class__.__name__, node.hidden,
+                                    str(dataType), "|".join(refs))
+        if not isinstance(line, bytes):
+            line = line.encode("utf-8")
+        h.update(line)
+    return h.hexdigest()
+
+def saveOrderCache(filename, graphHash, sorted_nodes):
+    cache = {
+        "version": ORDER_CACHE_VERSION,
+        "hash": graphHash,
+        "order": [str(node.id) for node in sorted_nodes],
+    }
+    with open(filename, "w") as f:
+        json.dump(cache, f)
+
+def loadOrderCache(nodeset, filename, graphHash):
+    """ Returns the ordered nodes from the cache file, or None if the file does
+        not exist or belongs to a different nodeset. The printRefs only depend
+        on the nodes ordered before, so they are selected again in that order.
+    """
+    try:
+        with open(filename, "r") as f:
+            cache = json.load(f)
+    except (IOError, ValueError):
+        return None
+    if cache.get("version") != ORDER_CACHE_VERSION or cache.get("hash") != graphHash:
+        return None
+
+    nodesById = dict((str(nodeId), node) for nodeId, node in nodeset.nodes.items())
+    sorted_nodes = []
+    for nodeId in cache["order"]:
+        node = nodesById.get(nodeId)
+        if node is None:
+            return None
+        sorted_nodes.append(node)
+
+    printed = set()
+    for node in sorted_nodes:
+        node.printRefs = selectPrintRefs(nodeset, printed, node)
+        printed.add(node.id)
+    return sorted_nodes
+
+def reorderNodesCached(nodeset, cachefile):
+    """ Orders the nodes with reorderNodesMinDependencies and stores the result
+        in cachefile. A later run on the same nodeset loads the ordering from
+        the file instead.
+    """
+    graphHash = hashNodeSetGraph(nodeset)
+    sorted_nodes = loadOrderCache(nodeset, cachefile, graphHash)
+    if sorted_nodes is not None:
+        logger.info("Loaded the node ordering from " + cachefile)
+        return sorted_nodes
+    sorted_nodes = reorderNodesMinDependencies(nodeset)
+    saveOrderCache(cachefile, graphHash, sorted_nodes)
+    return sorted_nodes
+
 ###################
 # Generate C Code #
 ###################
 
-def generateOpen62541Code(nodeset, outfilename, generate_ns0=False, internal_headers=False, typesArray=[], max_string_length=0):
-    outfilebase = basename(outfilename)
-    # Printing functions
-    outfileh = codecs.open(outfilename + ".h", r"w+", encoding='utf-8')
-    outfilec = StringIO()
+def generatedFilePreamble(outfilebase):
+    return """/* WARNING: This is a generated file.
+ * Any manual changes will be overwritten. */
 
-    def writeh(line):
-        print(unicode(line), end='\n', file=outfileh)
+#include "%s.h"
+""" % (outfilebase)
+
+def writeNamespaces(writec, namespaces):
+    # Generate namespaces (don't worry about duplicates)
+    writec("/* Use namespace ids generated by the server */")
+    writec("UA_UInt16 ns[" + str(len(namespaces)) + "];")
+    for i, nsid in enumerate(namespaces):
+        nsid = nsid.replace("\"", "\\\"")
+        writec("ns[" + str(i) + "] = UA_Server_addNamespace(server, \"" + nsid + "\");")
 
-    def writec(line):
-        print(unicode(line), end='\n', file=outfilec)
+def writeNodesetFunction(writec, outfilebase, parameters, namespaces, loadCode, profile):
+    """ Writes the exported function which adds the namespaces and runs the
+        load code of the backend. With profiling the phases are measured.
+    """
+    writec("""
+UA_StatusCode %s(%s) {
+UA_StatusCode retVal = UA_STATUSCODE_GOOD;""" % (outfilebase, parameters))
+    if profile:
+        writec(generateProfileStartCode())
+    writeNamespaces(writec, namespaces)
+    if profile:
+        writec(generateProfilePhaseCode("namespaces"))
+    if len(loadCode) > 0:
+        writec(loadCode)
+    if profile:
+        writec(generateProfileEndCode())
+    writec("return retVal;\n}")
 
+def generateNodeCalls(functionBase, nodes, phase, profile, generate_ns0=False):
+    """ Returns the calls of the begin functions of the written nodes, or of
+        their finish functions in reverse order. With profiling every call is
+        measured for the class of its node.
+    """
+    order = list(enumerate(nodes))
+    if phase == "finish":
+        order.reverse()
+    calls = []
+    for i, node in order:
+        function = "function_" + functionBase + "_" + str(i) + "_" + phase
+        if profile:
+            calls.append(generateProfileCallCode(function, node, phase, generate_ns0))
+        else:
+            calls.append("retVal |= " + function + "(server, ns);")
+    return calls
+
+class NodeCode(object):
+    """ The generated code of a node, which is kept in the spool until the node
+        is written. begin and finish are the positions of the code in the spool,
+        they are None if the node was ignored. The hash identifies the code in
+        the code cache.
+    """
+    __slots__ = ("node", "spool", "begin", "finish", "hash")
+
+    def __init__(self, node, spool, begin, finish, nodeHash=None):
+        self.node = node
+        self.spool = spool
+        self.hash = nodeHash
+        self.begin = None if begin is None else spool.store(begin)
+        self.finish = None if finish is None else spool.store(finish)
+
+    def size(self):
+        if self.begin is None:
+            return 0
+        return self.begin[1] + self.finish[1]
+
+    def write(self, writec, outfilebase, functionNumber):
+        """ Writes the begin and finish function of the node with the given
+            number. Returns False if the node was ignored.
+        """
+        node = self.node
+        writec("\n/* " + str(node.displayName) + " - " + str(node.id) + " */")
+        if self.begin is None:
+            writec("/* Ignored. No parent */")
+            return False
+        writec("\nstatic UA_StatusCode function_" + outfilebase + "_" + str(functionNumber) + "_begin(UA_Server *server, UA_UInt16* ns) {\n")
+        if isinstance(node, MethodNode):
+            writec("#ifdef UA_ENABLE_METHODCALLS")
+        writec(self.spool.loadText(self.begin))
+        writec("return retVal;")
+        if isinstance(node, MethodNode):
+            writec("#else")
+            writec("return UA_STATUSCODE_GOOD;")
+            writec("#endif /* UA_ENABLE_METHODCALLS */")
+        writec("}");
+
+        writec("\nstatic UA_StatusCode function_" + outfilebase + "_" + str(functionNumber) + "_finish(UA_Server *server, UA_UInt16* ns) {\n")
+        if isinstance(node, MethodNode):
+            writec("#ifdef UA_ENABLE_METHODCALLS")
+        writec("return " + self.spool.loadText(self.finish))
+        if isinstance(node, MethodNode):
+            writec("#else")
+            writec("return UA_STATUSCODE_GOOD;")
+            writec("#endif /* UA_ENABLE_METHODCALLS */")
+        writec("}");
+        return True
+
+def usesReferenceBatch(nodeCode):
+    # The helpers are only written into files which add references
+    return any(code.begin is not None and len(code.node.printRefs) > 0 for code in nodeCode)
+
+def shardFileName(outfilename, index):
+    return outfilename + "_shard" + str(index) + ".c"
+
+def removeStaleShards(outfilename, shards):
+    # Shards of an earlier run with more shards would still be compiled
+    index = shards
+    while os.path.isfile(shardFileName(outfilename, index)):
+        os.remove(shardFileName(outfilename, index))
+        index = index + 1
+
+# A kept shard may grow to this multiple of its share of the code before the
+# shards are split again
+SHARD_GROWTH = 2.0
+
+def keepShards(nodeCode, boundaries):
+    """ Splits the ordered node code before the nodes which started the shards
+        of the previous run, so an edit of a node only changes its shard.
+        Returns None if one of these nodes is gone or a shard grew too much.
+    """
+    starts = set(boundaries)
+    parts = [[]]
+    for code in nodeCode:
+        if str(code.node.id) in starts and len(parts[-1]) > 0:
+            parts.append([])
+        parts[-1].append(code)
+    if len(parts) != len(boundaries) + 1:
+        return None
+    limit = SHARD_GROWTH * sum(code.size() for code in nodeCode) / len(parts)
+    for part in parts:
+        if sum(code.size() for code in part) > limit:
+            return None
+    return parts
+
+def splitShards(nodeCode, shards):
+    """ Splits the ordered node code into at most shards contiguous parts of
+        about the same code size. The order of the nodes is kept, so the
+        dependencies between the shards only point to earlier shards.
+    """
+    total = sum(code.size() for code in nodeCode)
+    parts = [[]]
+    size = 0
+    for code in nodeCode:
+        # Start the next shard once this one holds its share of the code
+        if size >= total * len(parts) / float(shards) and len(parts) < shards and len(parts[-1]) > 0:
+            parts.append([])
+        parts[-1].append(code)
+        size = size + code.size()
+    return parts
+
+def writeShards(nodeCode, outfilename, outfilebase, shards, namespaces, writec, strings, profile=False,
+                generate_ns0=False, cache=None):
+    """ Writes the node functions into the shards <outfilename>_shard<N>.c. Each
+        shard numbers its functions from 0 and exports a begin and a finish
+        function, so a shard only changes if the code of its nodes changes. The
+        main function, written with writec, calls the shards in order and
+        defines the string pool of the shards. With the code cache the shards
+        of the previous run are kept and unchanged shards are not written.
+        Returns the hashes and the first node ids of the shards.
+    """
+    parts = None
+    if cache is not None and len(cache.shards) == shards:
+        parts = keepShards(nodeCode, cache.boundaries)
+    if parts is None:
+        parts = splitShards(nodeCode, shards)
+    shardHashes = []
+    for index, part in enumerate(parts):
+        shardHashes.append(hashShard(part, outfilebase, profile, len(strings) > 0))
+        if cache is not None and cache.shardUnchanged(index, shardHashes[-1], shardFileName(outfilename, index)):
+            continue
+        with StreamWriter(shardFileName(outfilename, index)) as writeshard:
+            shardbase = outfilebase + "_shard" + str(index)
+            writeshard(generatedFilePreamble(outfilebase))
+            if profile:
+                writeshard(generateProfileHelperCode(outfilebase))
+            if len(strings) > 0:
+                writeSharedStringDeclaration(writeshard, outfilebase)
+            if usesReferenceBatch(part):
+                writeshard(referenceBatchCode)
+            written = []
+            for code in part:
+                if code.write(writeshard, shardbase, len(written)):
+                    written.append(code.node)
+
+            for phase in ["begin", "finish"]:
+                writeshard("\nUA_StatusCode %s_%s(UA_Server *server, UA_UInt16* ns) {" % (shardbase, phase))
+                writeshard("UA_StatusCode retVal = UA_STATUSCODE_GOOD;")
+                for call in generateNodeCalls(shardbase, written, phase, profile, generate_ns0):
+                    writeshard(call)
+                writeshard("return retVal;\n}")
+
+    removeStaleShards(outfilename, len(parts))
+
+    strings.write(writec, outfilebase, True)
+    for index in range(len(parts)):
+        writec("UA_StatusCode %s_shard%d_begin(UA_Server *server, UA_UInt16* ns);" % (outfilebase, index))
+        writec("UA_StatusCode %s_shard%d_finish(UA_Server *server, UA_UInt16* ns);" % (outfilebase, index))
+    # The nodes of a shard may depend on the nodes of all earlier shards
+    calls = []
+    for index in range(len(parts)):
+        calls.append("retVal |= %s_shard%d_begin(server, ns);" % (outfilebase, index))
+    if profile:
+        calls.append(generateProfilePhaseCode("begin"))
+    for index in reversed(range(len(parts))):
+        calls.append("retVal |= %s_shard%d_finish(server, ns);" % (outfilebase, index))
+    if profile:
+        calls.append(generateProfilePhaseCode("finish"))
+    writeNodesetFunction(writec, outfilebase, "UA_Server *server", namespaces, "\n".join(calls), profile)
+    return (shardHashes, [str(part[0].node.id) for part in parts[1:]])
+
+def generateOpen62541Code(nodeset, outfilename, generate_ns0=False, internal_headers=False, typesArray=[], max_string_length=0, order_cache=None, shards=1, backend="functions", profile=False, code_cache=None):
+    """ Writes the nodeset to <outfilename>.h and <outfilename>.c. The code is
+        streamed to the files, the compiler only keeps the code of the nodes
+        in memory until it is written. With code_cache the function backend
+        reuses the code of the unchanged nodes of the previous run.
+    """
+    with StreamWriter(outfilename + ".h") as writeh:
+        with StreamWriter(outfilename + ".c") as writec:
+            writeOpen62541Code(nodeset, outfilename, writeh, writec, generate_ns0, internal_headers, typesArray,
+                               max_string_length, order_cache, shards, backend, profile, code_cache)
+
+def writeOpen62541Code(nodeset, outfilename, writeh, writec, generate_ns0, internal_headers, typesArray,
+                       max_string_length, order_cache, shards, backend, profile, code_cache):
+    outfilebase = basename(outfilename)
     additionalHeaders = ""
     if len(typesArray) > 0:
         for arr in set(typesArray):
@@ -228,7 +536,28 @@ UA_findDataTypeByBinary(const UA_NodeId *typeId);
         writeh("""
 #include "open62541.h"
 """)
-    writeh("""
+    if profile:
+        writeh(generateProfileHeaderCode(outfilebase))
+    if backend == "snapshot":
+        # The snapshot is inserted directly into the nodestore, which cannot be
+        # reached from the server with the public API
+        writeh("""
+#define %s_SNAPSHOT
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+extern UA_StatusCode %s(UA_Server *server, UA_Nodestore *nodestore);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif /* %s_H_ */""" % \
+               (outfilebase.upper(), outfilebase, outfilebase.upper()))
+    else:
+        writeh("""
 #ifdef __cplusplus
 extern "C" {
 #endif
@@ -240,85 +569,109 @@ extern UA_StatusCode %s(UA_Server *server);
 #endif
 
 #endif /* %s_H_ */""" % \
-           (outfilebase, outfilebase.upper()))
+               (outfilebase, outfilebase.upper()))
 
-    writec("""/* WARNING: This is a generated file.
- * Any manual changes will be overwritten. */
+    writec(generatedFilePreamble(outfilebase))
+    if profile:
+        writec(generateProfileHelperCode(outfilebase))
+        writec(generateProfileLogCode(outfilebase))
 
-#include "%s.h"
-""" % (outfilebase))
-
-    parentrefs = getSubTypesOf(nodeset, nodeset.getNodeByBrowseName("HierarchicalReferences"))
-    parentrefs = list(map(lambda x: x.id, parentrefs))
+    parentrefs = nodeset.getSubTypeIds(nodeset.getNodeByBrowseName("HierarchicalReferences").id)
 
     # Loop over the sorted nodes
     logger.info("Reordering nodes for minimal dependencies during printing")
-    sorted_nodes = reorderNodesMinDependencies(nodeset)
+    if order_cache is None:
+        sorted_nodes = reorderNodesMinDependencies(nodeset)
+    else:
+        sorted_nodes = reorderNodesCached(nodeset, order_cache)
     logger.info("Writing code for nodes and references")
-    
-    functionNumber = 0
-
-    for node in sorted_nodes:
-        # Print node
-        if not node.hidden:
-            writec("\n/* " + str(node.displayName) + " - " + str(node.id) + " */")
-            code = generateNodeCode_begin(node, nodeset, max_string_length, generate_ns0, parentrefs)
-            if code is None:
-                writec("/* Ignored. No parent */")
-                nodeset.hide_node(node.id)
-                continue
-            else:
-                writec("\nstatic UA_StatusCode function_" + outfilebase + "_" + str(functionNumber) + "_begin(UA_Server *server, UA_UInt16* ns) {\n")
-                if isinstance(node, MethodNode):
-                    writec("#ifdef UA_ENABLE_METHODCALLS")
-                writec(code)
-
-        # Print inverse references leading to this node
-        for ref in node.printRefs:
-            writec(generateReferenceCode(ref))
-            
-        writec("return retVal;")
-        if isinstance(node, MethodNode):
-            writec("#else")
-            writec("return UA_STATUSCODE_GOOD;")
-            writec("#endif /* UA_ENABLE_METHODCALLS */")
-        writec("}");
-
-        writec("\nstatic UA_StatusCode function_" + outfilebase + "_" + str(functionNumber) + "_finish(UA_Server *server, UA_UInt16* ns) {\n")
-        if isinstance(node, MethodNode):
-            writec("#ifdef UA_ENABLE_METHODCALLS")
-        code = generateNodeCode_finish(node)
-        writec("return " + code)
-        if isinstance(node, MethodNode):
-            writec("#else")
-            writec("return UA_STATUSCODE_GOOD;")
-            writec("#endif /* UA_ENABLE_METHODCALLS */")
-        writec("}");
-
-        functionNumber = functionNumber + 1
 
-    writec("""
-UA_StatusCode %s(UA_Server *server) {
-UA_StatusCode retVal = UA_STATUSCODE_GOOD;""" % (outfilebase))
-    # Generate namespaces (don't worry about duplicates)
-    writec("/* Use namespace ids generated by the server */")
-    writec("UA_UInt16 ns[" + str(len(nodeset.namespaces)) + "];")
-    for i, nsid in enumerate(nodeset.namespaces):
-        nsid = nsid.replace("\"", "\\\"")
-        writec("ns[" + str(i) + "] = UA_Server_addNamespace(server, \"" + nsid + "\");")
-
-    for i in range(0, functionNumber):
-        writec("retVal |= function_" + outfilebase + "_" + str(i) + "_begin(server, ns);")
-
-
-    for i in reversed(range(0, functionNumber)):
-        writec("retVal |= function_" + outfilebase + "_" + str(i) + "_finish(server, ns);")
-
-    writec("return retVal;\n}")
-    outfileh.close()
-    fullCode = outfilec.getvalue()
-    outfilec.close()
-
-    outfilec = codecs.open(outfilename + ".c", r"w+", encoding='utf-8')
-    outfilec.write(fullCode)
-    outfilec.close()
+    if backend == "tables":
+        removeStaleShards(outfilename, 0)
+        loadCode = generateNodeTables(nodeset, sorted_nodes, writec, outfilebase, max_string_length, generate_ns0,
+                                      parentrefs, profile)
+        writeNodesetFunction(writec, outfilebase, "UA_Server *server", nodeset.namespaces, loadCode, profile)
+    elif backend == "snapshot":
+        removeStaleShards(outfilename, 0)
+        loadCode = generateNodeSnapshot(nodeset, sorted_nodes, writec, outfilebase, max_string_length, generate_ns0,
+                                        parentrefs, profile)
+        writeNodesetFunction(writec, outfilebase, "UA_Server *server, UA_Nodestore *nodestore",
+                             nodeset.namespaces, loadCode, profile)
+    else:
+        # The code of every node is kept apart in the spool, the function numbers
+        # are assigned when the nodes are written to the .c file or to their
+        # shard. The ordering contains no hidden nodes. With the code cache the
+        # spool becomes the cache of the next run. The nodes without a parent
+        # are ignored and do not count for the string pool.
+        strings = StringPool([node for node in sorted_nodes if hasNodeParent(node, generate_ns0, parentrefs)],
+                             max_string_length)
+        strings.logSavings(outfilebase)
+        cache = None
+        if code_cache is not None:
+            cache = CodeCache(code_cache, hashCodeContext(nodeset, generate_ns0, max_string_length))
+        try:
+            with CodeSpool(None if cache is None else code_cache + ".dat.tmp") as spool:
+                nodeCode = []
+                cached = 0
+                for node in sorted_nodes:
+                    nodeHash = None
+                    if cache is not None:
+                        nodeHash = hashNodeCode(node, cache.context, strings, max_string_length)
+                        code = cache.lookup(nodeHash)
+                        if code is not None:
+                            # The parent and type definition references are still
+                            # removed from the references of the node
+                            getNodeBeginArguments(node, generate_ns0, parentrefs)
+                            if code[0] is None:
+                                nodeset.hide_node(node.id)
+                            nodeCode.append(NodeCode(node, spool, code[0], code[1], nodeHash))
+                            cached = cached + 1
+                            continue
+
+                    # The value is only decoded for the code of its node
+                    if isinstance(node, VariableNode):
+                        node.allocateValue(nodeset)
+                    code = generateNodeCode_begin(node, nodeset, max_string_length, generate_ns0, parentrefs, strings)
+                    if isinstance(node, VariableNode):
+                        node.releaseValue()
+                    if code is None:
+                        nodeCode.append(NodeCode(node, spool, None, None, nodeHash))
+                        nodeset.hide_node(node.id)
+                        continue
+
+                    # Print inverse references leading to this node
+                    beginCode = [code]
+                    if len(node.printRefs) > 0:
+                        beginCode.append(generateReferenceBatchCode(node.printRefs))
+                    nodeCode.append(NodeCode(node, spool, "\n".join(beginCode), generateNodeCode_finish(node), nodeHash))
+                if cache is not None:
+                    logger.info("Took the code of %d of %d nodes from the code cache" % (cached, len(nodeCode)))
+
+                shardHashes = []
+                boundaries = []
+                if shards > 1:
+                    (shardHashes, boundaries) = writeShards(nodeCode, outfilename, outfilebase, shards,
+                                                            nodeset.namespaces, writec, strings, profile,
+                                                            generate_ns0, cache)
+                else:
+                    removeStaleShards(outfilename, 0)
+                    strings.write(writec, outfilebase, False)
+                    if usesReferenceBatch(nodeCode):
+                        writec(referenceBatchCode)
+                    written = []
+                    for code in nodeCode:
+                        if code.write(writec, outfilebase, len(written)):
+                            written.append(code.node)
+
+                    calls = generateNodeCalls(outfilebase, written, "begin", profile, generate_ns0)
+                    if profile:
+                        calls.append(generateProfilePhaseCode("begin"))
+                    calls.extend(generateNodeCalls(outfilebase, written, "finish", profile, generate_ns0))
+                    if profile:
+                        calls.append(generateProfilePhaseCode("finish"))
+                    writeNodesetFunction(writec, outfilebase, "UA_Server *server", nodeset.namespaces, "\n".join(calls), profile)
+                if cache is not None:
+                    cache.save(spool, nodeCode, shardHashes, boundaries)
+        finally:
+            if cache is not None:
+                cache.close()
@@ -0,0 +1,198 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+import os
+import glob
+import json
+import hashlib
+from datatypes import etree, LocalizedText, QualifiedName
+from nodes import DataTypeNode, ReferenceTypeNode
+from backend_open62541_stream import CodeSpool
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+##############
+# Code Cache #
+##############
+
+# The code of every node of the function backend is stored in
+# <outputFile>.code.dat, indexed by a hash of the node in <outputFile>.code.json.
+# The hash covers the attributes, the value and the references of the node,
+# the references it adds at its position in the ordering and the code of its
+# strings. The context hash covers the sources of the compiler, the options and
+# the data and reference type nodes, so a change of one of them regenerates all
+# nodes. A later run takes the code of the unchanged nodes from the cache. The
+# shards keep their boundaries and a shard whose nodes did not change is not
+# written again.
+
+# Increment if the cache format changes
+CODE_CACHE_VERSION = 1
+
+def formatNodeValue(value):
+    """ Returns the attribute value of a node as text. """
+    valueType = type(value)
+    if valueType is float:
+        return unicode(repr(value))
+    if valueType is LocalizedText:
+        return u"(%s:%s)" % (value.locale, value.text)
+    if valueType is QualifiedName:
+        return u"%d:%s" % (value.ns, value.name)
+    if valueType is list or valueType is tuple:
+        return u"[" + u", ".join(formatNodeValue(v) for v in value) + u"]"
+    if etree.iselement(value):
+        value = etree.tostring(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return unicode(value)
+
+def formatReference(ref):
+    return str(ref.source) + " " + str(ref.referenceType) + " " + str(ref.target) + (" >" if ref.isForward else " <")
+
+# The hashed attributes of every node class
+nodeSlots = {}
+
+def getNodeSlots(nodeClass):
+    slots = nodeSlots.get(nodeClass)
+    if slots is None:
+        slots = []
+        for cls in nodeClass.__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if slot not in ["references", "inverseReferences", "printRefs", "value"]:
+                    slots.append(slot)
+        nodeSlots[nodeClass] = slots
+    return slots
+
+def formatNode(node):
+    """ Returns the attributes and the references of the node as lines. The
+        value of a variable is taken from its XML definition.
+    """
+    lines = [unicode(node.__class__.__name__)]
+    for slot in getNodeSlots(type(node)):
+        lines.append(slot + u"=" + formatNodeValue(getattr(node, slot, None)))
+    lines.extend(sorted(formatReference(ref) for ref in node.references | node.inverseReferences))
+    return lines
+
+def updateHash(h, lines):
+    h.update((u"\n".join(unicode(line) for line in lines) + u"\n").encode("utf-8"))
+
+def hashCodeContext(nodeset, generate_ns0, max_string_length):
+    """ Returns the hash of everything outside of a node its code depends on. """
+    h = hashlib.sha1()
+    updateHash(h, ["version %d %d %d" % (CODE_CACHE_VERSION, generate_ns0, max_string_length)])
+    for filename in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(filename, "rb") as f:
+            h.update(f.read())
+    for node in nodeset.nodes.values():
+        if isinstance(node, DataTypeNode) or isinstance(node, ReferenceTypeNode):
+            updateHash(h, formatNode(node))
+    return h.hexdigest()
+
+def hashNodeCode(node, context, strings, max_string_length):
+    """ Returns the hash of the code of the node. Must be called before the
+        code of the node is generated, which removes the parent reference.
+    """
+    h = hashlib.sha1(context.encode("utf-8"))
+    lines = formatNode(node)
+    lines.extend(formatReference(ref) for ref in node.printRefs)
+    lines.extend(strings.literal(value, max_string_length) for value in
+                 [node.displayName.text, node.description.text, node.browseName.name])
+    updateHash(h, lines)
+    return h.hexdigest()
+
+def hashShard(nodeCode, outfilebase, profile, pooled):
+    """ Returns the hash of a shard with the node code. """
+    h = hashlib.sha1(("%s %d %d\n" % (outfilebase, profile, pooled)).encode("utf-8"))
+    for code in nodeCode:
+        h.update(("%s %d\n" % (code.hash, code.begin is None)).encode("utf-8"))
+    return h.hexdigest()
+
+class CodeCache(object):
+    """ The node code of the previous run. The code is only read from the data
+        file when a node is looked up.
+    """
+
+    def __init__(self, filename, context):
+        self.filename = filename
+        self.context = context
+        self.nodes = {}
+        self.shards = []
+        self.boundaries = []
+        self.spool = None
+        try:
+            with open(filename + ".json", "r") as f:
+                index = json.load(f)
+        except (IOError, ValueError):
+            return
+        if index.get("version") != CODE_CACHE_VERSION or index.get("context") != context or \
+           not os.path.isfile(filename + ".dat"):
+            return
+        self.nodes = index["nodes"]
+        self.shards = index["shards"]
+        self.boundaries = index["boundaries"]
+        self.spool = CodeSpool.open(filename + ".dat")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def lookup(self, nodeHash):
+        """ Returns the tuple (begin, finish) of the node code, which are None
+            if the node was ignored, or None if the node is not in the cache.
+        """
+        if self.spool is None or nodeHash not in self.nodes:
+            return None
+        positions = self.nodes[nodeHash]
+        if positions is None:
+            return (None, None)
+        return (self.spool.load(positions[0]), self.spool.load(positions[1]))
+
+    def shardUnchanged(self, index, shardHash, shardfile):
+        return index < len(self.shards) and self.shards[index] == shardHash and os.path.isfile(shardfile)
+
+    def save(self, spool, nodeCode, shards, boundaries):
+        """ Keeps the spool with the code of this run as the data file and
+            writes the index.
+        """
+        nodes = {}
+        for code in nodeCode:
+            nodes[code.hash] = None if code.begin is None else [code.begin, code.finish]
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+        spool.save(self.filename + ".dat")
+        index = {
+            "version": CODE_CACHE_VERSION,
+            "context": self.context,
+            "nodes": nodes,
+            "shards": shards,
+            "boundaries": boundaries,
+        }
+        with open(self.filename + ".json", "w") as f:
+            json.dump(index, f)
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
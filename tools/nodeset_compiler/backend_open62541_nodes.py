@@ -447,14 +447,72 @@ def getNodeTypeDefinition(node):
             return ref.target
     return None
 
-def generateSubtypeOfDefinitionCode(node):
+def getNodeSubtypeOfDefinition(node):
     for ref in node.inverseReferences:
         # 45 = HasSubtype
         if ref.referenceType.i == 45:
-            return generateNodeIdCode(ref.target)
-    return "UA_NODEID_NULL"
+            return ref.target
+    return None
+
+def generateSubtypeOfDefinitionCode(node):
+    subtypeOf = getNodeSubtypeOfDefinition(node)
+    if subtypeOf is None:
+        return "UA_NODEID_NULL"
+    return generateNodeIdCode(subtypeOf)
+
+def isDataTypeEncodingNode(node):
+    typeDef = getNodeTypeDefinition(node)
+    return typeDef is not None and typeDef.ns == 0 and typeDef.i == 76
+
+def hasNodeParent(node, generate_ns0, parentrefs):
+    """Returns whether getNodeBeginArguments accepts the node. No reference is
+    removed from the node.
+
+    """
+    # Object nodes of type DataTypeEncoding do not have any parent
+    if generate_ns0 or isDataTypeEncodingNode(node):
+        return True
+    return any(ref.referenceType in parentrefs for ref in node.inverseReferences)
+
+def getNodeBeginArguments(node, generate_ns0, parentrefs):
+    """Returns the tuple (parent, parentReference, typeDefinition) passed to
+    UA_Server_addNode_begin, or None if the node has no parent. The
+    typeDefinition is None for UA_NODEID_NULL. The parent reference and the
+    HasTypeDefinition reference are removed from the references to be printed.
+
+    """
+    typeDef = getNodeTypeDefinition(node)
+    # Object nodes of type DataTypeEncoding do not have any parent
+    if not generate_ns0 and not isDataTypeEncodingNode(node):
+        (parentNode, parentRef) = extractNodeParent(node, parentrefs)
+        if parentNode is None or parentRef is None:
+            return None
+    else:
+        (parentNode, parentRef) = (NodeId(), NodeId())
+
+    if isinstance(node, VariableTypeNode):
+        # we need the HasSubtype reference
+        return (parentNode, parentRef, getNodeSubtypeOfDefinition(node))
+    elif isinstance(node, VariableNode) or isinstance(node, ObjectNode):
+        # remove hasTypeDef reference from list to be printed
+        for ref in node.printRefs:
+            if ref.referenceType.i == 40:
+                if (ref.isForward and ref.source == node.id) or (not ref.isForward and ref.target == node.id):
+                    node.printRefs.remove(ref)
+        return (parentNode, parentRef, typeDef)
+    return (parentNode, parentRef, None)
+
+def generateNodeCode_begin(node, nodeset, max_string_length, generate_ns0, parentrefs, strings=None):
+    """Returns the code which adds the node, or None if the node has no parent.
+    With a StringPool the names and the description refer to the pool.
+
+    """
+    # The pool only holds the strings of the nodes with a parent
+    beginArguments = getNodeBeginArguments(node, generate_ns0, parentrefs)
+    if beginArguments is None:
+        return None
+    (parentNode, parentRef, typeDef) = beginArguments
 
-def generateNodeCode_begin(node, nodeset, max_string_length, generate_ns0, parentrefs):
     code = []
     code.append("UA_StatusCode retVal = UA_STATUSCODE_GOOD;")
 
@@ -481,39 +539,25 @@ def generateNodeCode_begin(node, nodeset, max_string_length, generate_ns0, paren
     elif isinstance(node, ViewNode):
         code.extend(generateViewNodeCode(node))
 
-    code.append("attr.displayName = " + generateLocalizedTextCode(node.displayName, alloc=False, max_string_length=max_string_length) + ";")
-    code.append("attr.description = " + generateLocalizedTextCode(node.description, alloc=False, max_string_length=max_string_length) + ";")
+    if strings is None:
+        code.append("attr.displayName = " + generateLocalizedTextCode(node.displayName, alloc=False, max_string_length=max_string_length) + ";")
+        code.append("attr.description = " + generateLocalizedTextCode(node.description, alloc=False, max_string_length=max_string_length) + ";")
+    else:
+        code.append("attr.displayName = " + strings.localizedText(node.displayName, max_string_length) + ";")
+        code.append("attr.description = " + strings.localizedText(node.description, max_string_length) + ";")
     code.append("attr.writeMask = %d;" % node.writeMask)
     code.append("attr.userWriteMask = %d;" % node.userWriteMask)
 
-    typeDef = getNodeTypeDefinition(node)
-    isDataTypeEncodingType = typeDef is not None and typeDef.ns == 0 and typeDef.i == 76
-    # Object nodes of type DataTypeEncoding do not have any parent
-    if not generate_ns0 and not isDataTypeEncodingType:
-        (parentNode, parentRef) = extractNodeParent(node, parentrefs)
-        if parentNode is None or parentRef is None:
-            return None
-    else:
-        (parentNode, parentRef) = (NodeId(), NodeId())
-
     code.append("retVal |= UA_Server_addNode_begin(server, UA_NODECLASS_{},".format(node.__class__.__name__.upper().replace("NODE" ,"")))
     code.append(generateNodeIdCode(node.id) + ",")
     code.append(generateNodeIdCode(parentNode) + ",")
     code.append(generateNodeIdCode(parentRef) + ",")
-    code.append(generateQualifiedNameCode(node.browseName, max_string_length=max_string_length) + ",")
-    if isinstance(node, VariableTypeNode):
-        # we need the HasSubtype reference
-        code.append(generateSubtypeOfDefinitionCode(node) + ",")
-    elif isinstance(node, VariableNode) or isinstance(node, ObjectNode):
-        typeDefCode = "UA_NODEID_NULL" if typeDef is None else generateNodeIdCode(typeDef)
-        code.append(typeDefCode + ",")
-        # remove hasTypeDef reference from list to be printed
-        for ref in node.printRefs:
-            if ref.referenceType.i == 40:
-                if (ref.isForward and ref.source == node.id) or (not ref.isForward and ref.target == node.id):
-                    node.printRefs.remove(ref)
+    if strings is None:
+        code.append(generateQualifiedNameCode(node.browseName, max_string_length=max_string_length) + ",")
     else:
-        code.append("UA_NODEID_NULL,")
+        code.append(strings.qualifiedName(node.browseName, max_string_length) + ",")
+    typeDefCode = "UA_NODEID_NULL" if typeDef is None else generateNodeIdCode(typeDef)
+    code.append(typeDefCode + ",")
     code.append("(const UA_NodeAttributes*)&attr, &UA_TYPES[UA_TYPES_{}ATTRIBUTES],NULL, NULL);".format(node.__class__.__name__.upper().replace("NODE" ,"")))
     code.extend(codeCleanup)
 
@@ -0,0 +1,206 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+from nodes import ObjectNode, VariableNode, VariableTypeNode
+from backend_open62541_nodes import isDataTypeEncodingNode
+
+######################
+# Start-up Profiling #
+######################
+
+# With profiling the generated nodeset function measures its phases and every
+# node with UA_DateTime_nowMonotonic. The results are kept in the global
+# <outfilebase>_profile, which the caller can read or log with
+# <outfilebase>_logProfile after the nodeset was loaded. The loaders of the
+# table and snapshot backends contain the same measurements, which are only
+# compiled with NODESET_PROFILING. All backends count the same references of a
+# node, see countProfileReferences.
+
+# The types are shared by the headers of all nodesets
+profileTypesCode = """
+#ifndef NODESET_PROFILE_TYPES
+#define NODESET_PROFILE_TYPES
+
+/* Indexed by the bit of the UA_NodeClass */
+#define NODESET_PROFILE_CLASSES 8
+
+typedef struct {
+    size_t nodes;
+    size_t references;       /* References added with the nodes, including
+                              * the ones to the parent and the type
+                              * definition, each counted once */
+    UA_DateTime beginTime;   /* Adding the nodes and their references */
+    UA_DateTime finishTime;  /* Type checks and constructors of the nodes */
+    UA_DateTime maxTime;     /* Slowest single begin or finish of a node */
+} NodesetProfileClass;
+
+typedef struct {
+    UA_DateTime totalTime;
+    UA_DateTime namespacesTime;
+    UA_DateTime beginTime;
+    UA_DateTime finishTime;
+    NodesetProfileClass classes[NODESET_PROFILE_CLASSES];
+} NodesetProfile;
+
+#endif /* NODESET_PROFILE_TYPES */
+"""
+
+# The helpers are written into the main file and into every shard
+profileHelperCode = """
+#define NODESET_PROFILING
+#define NODESET_PROFILE_DATA (&%s_profile)
+#define NODESET_PROFILE_BEGIN 0
+#define NODESET_PROFILE_FINISH 1
+
+static UA_INLINE void
+nodesetProfilePhase(UA_DateTime *phaseTime, UA_DateTime *start) {
+    UA_DateTime now = UA_DateTime_nowMonotonic();
+    *phaseTime += now - *start;
+    *start = now;
+}
+
+static UA_INLINE void
+nodesetProfileNode(UA_NodeClass nodeClass, int phase, UA_DateTime start, size_t references) {
+    UA_DateTime duration = UA_DateTime_nowMonotonic() - start;
+    NodesetProfileClass *c;
+    size_t i = 0;
+    while(i < NODESET_PROFILE_CLASSES - 1 && !((UA_UInt32)nodeClass & (1u << i)))
+        i++;
+    c = &NODESET_PROFILE_DATA->classes[i];
+    if(phase == NODESET_PROFILE_BEGIN) {
+        c->nodes++;
+        c->references += references;
+        c->beginTime += duration;
+    } else {
+        c->finishTime += duration;
+    }
+    if(duration > c->maxTime)
+        c->maxTime = duration;
+}
+
+static UA_INLINE UA_StatusCode
+nodesetProfileCall(UA_StatusCode (*function)(UA_Server *server, UA_UInt16 *ns),
+                   UA_Server *server, UA_UInt16 *ns, UA_NodeClass nodeClass,
+                   int phase, size_t references) {
+    UA_DateTime start = UA_DateTime_nowMonotonic();
+    UA_StatusCode retVal = function(server, ns);
+    nodesetProfileNode(nodeClass, phase, start, references);
+    return retVal;
+}
+"""
+
+profileLogCode = """
+NodesetProfile %(base)s_profile;
+
+#define NODESET_PROFILE_MS(t) ((double)(t) / UA_DATETIME_MSEC)
+
+void %(base)s_logProfile(UA_Logger logger) {
+    static const char *classNames[NODESET_PROFILE_CLASSES] = {
+        "Object", "Variable", "Method", "ObjectType",
+        "VariableType", "ReferenceType", "DataType", "View"};
+    const NodesetProfile *p = &%(base)s_profile;
+    size_t i;
+    UA_LOG_INFO(logger, UA_LOGCATEGORY_SERVER,
+                "Nodeset %(base)s loaded in %%.3f ms (namespaces %%.3f ms, begin %%.3f ms, finish %%.3f ms)",
+                NODESET_PROFILE_MS(p->totalTime), NODESET_PROFILE_MS(p->namespacesTime),
+                NODESET_PROFILE_MS(p->beginTime), NODESET_PROFILE_MS(p->finishTime));
+    for(i = 0; i < NODESET_PROFILE_CLASSES; i++) {
+        const NodesetProfileClass *c = &p->classes[i];
+        if(c->nodes == 0)
+            continue;
+        UA_LOG_INFO(logger, UA_LOGCATEGORY_SERVER,
+                    "Nodeset %(base)s: %%lu %%s nodes with %%lu references, begin %%.3f ms, "
+                    "finish %%.3f ms, slowest node %%.3f ms",
+                    (unsigned long)c->nodes, classNames[i], (unsigned long)c->references,
+                    NODESET_PROFILE_MS(c->beginTime), NODESET_PROFILE_MS(c->finishTime),
+                    NODESET_PROFILE_MS(c->maxTime));
+    }
+}
+"""
+
+def generateProfileHeaderCode(outfilebase):
+    return profileTypesCode + """
+#define %s_PROFILE
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+/* Filled by every call of %s */
+extern NodesetProfile %s_profile;
+
+/* Logs the profile of the last call of %s */
+void %s_logProfile(UA_Logger logger);
+
+#ifdef __cplusplus
+}
+#endif
+""" % (outfilebase.upper(), outfilebase, outfilebase, outfilebase, outfilebase)
+
+def generateProfileHelperCode(outfilebase):
+    return profileHelperCode % outfilebase
+
+def generateProfileLogCode(outfilebase):
+    return profileLogCode % {"base": outfilebase}
+
+def generateProfileStartCode():
+    return """UA_DateTime profileStart = UA_DateTime_nowMonotonic();
+UA_DateTime profilePhase = profileStart;
+memset(NODESET_PROFILE_DATA, 0, sizeof(NodesetProfile));"""
+
+def generateProfilePhaseCode(phase):
+    return "nodesetProfilePhase(&NODESET_PROFILE_DATA->%sTime, &profilePhase);" % phase
+
+def generateProfileEndCode():
+    return "NODESET_PROFILE_DATA->totalTime = UA_DateTime_nowMonotonic() - profileStart;"
+
+def countProfileReferences(node, generate_ns0):
+    """ Returns the number of references which are added with the node. These
+        are the references to the parent and to the type definition, which
+        UA_Server_addNode_begin adds, and the references in printRefs, which
+        must not contain the parent and type definition references anymore.
+        Every reference is counted once and not once per direction, so the
+        count is the same with all backends.
+    """
+    count = len(node.printRefs)
+    # Only the nodes with a parent are added, except with generate_ns0 and
+    # the objects of type DataTypeEncoding
+    if not generate_ns0 and not isDataTypeEncodingNode(node):
+        count = count + 1
+    if isinstance(node, ObjectNode) or (isinstance(node, VariableNode) and not isinstance(node, VariableTypeNode)):
+        count = count + 1
+    return count
+
+def writeProfileReferences(writec, name, counts):
+    """ Writes the reference counts of the nodes for the loaders of the table
+        and snapshot backends.
+    """
+    writec("\nstatic const UA_UInt32 %s[%d] = {" % (name, max(len(counts), 1)))
+    for i in range(0, len(counts), 32):
+        writec(",".join(str(count) for count in counts[i:i + 32]) + ",")
+    if len(counts) == 0:
+        writec("0")
+    writec("};")
+
+def generateProfileCallCode(function, node, phase, generate_ns0):
+    """ Returns the call of a begin or finish function of the node, which is
+        measured for the class of the node.
+    """
+    nodeClass = "UA_NODECLASS_" + node.__class__.__name__.upper().replace("NODE", "")
+    if phase == "begin":
+        return "retVal |= nodesetProfileCall(%s, server, ns, %s, NODESET_PROFILE_BEGIN, %d);" % \
+            (function, nodeClass, countProfileReferences(node, generate_ns0))
+    return "retVal |= nodesetProfileCall(%s, server, ns, %s, NODESET_PROFILE_FINISH, 0);" % \
+        (function, nodeClass)
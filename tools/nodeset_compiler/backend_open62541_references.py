@@ -0,0 +1,195 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+from collections import OrderedDict
+from backend_open62541_datatypes import generateNodeIdCode, generateExpandedNodeIdCode
+
+######################
+# Batched References #
+######################
+
+# UA_Server_addReference looks up the source and the target node and adds one
+# reference to each of them, the source node is reallocated and searched for a
+# duplicate for every reference. The generated code instead adds all references
+# of a source node with one edit of the node and one reallocation per reference
+# type and direction. The targets still get one edit per reference.
+
+# Adds the one-way references to a node, shared with the snapshot loader
+addReferencesCode = """
+/* Copies the targets of the references into the node. The references are
+ * grouped by reference type and direction. Only the targets which the node had
+ * before are checked for duplicates. */
+static UA_StatusCode
+nodesetAddReferences(UA_Node *node, const UA_AddReferencesItem *refs, size_t refsSize) {
+    size_t i = 0, j, k, existing;
+    while(i < refsSize) {
+        UA_NodeReferenceKind *rk = NULL;
+        UA_ExpandedNodeId *targets;
+        for(j = i + 1; j < refsSize; j++) {
+            if(refs[j].isForward != refs[i].isForward ||
+               !UA_NodeId_equal(&refs[j].referenceTypeId, &refs[i].referenceTypeId))
+                break;
+        }
+        for(k = 0; k < node->referencesSize; k++) {
+            if(node->references[k].isInverse != refs[i].isForward &&
+               UA_NodeId_equal(&node->references[k].referenceTypeId, &refs[i].referenceTypeId)) {
+                rk = &node->references[k];
+                break;
+            }
+        }
+        if(!rk) {
+            rk = (UA_NodeReferenceKind *)UA_realloc(node->references, sizeof(UA_NodeReferenceKind) *
+                                                    (node->referencesSize + 1));
+            if(!rk)
+                return UA_STATUSCODE_BADOUTOFMEMORY;
+            node->references = rk;
+            rk = &node->references[node->referencesSize];
+            memset(rk, 0, sizeof(UA_NodeReferenceKind));
+            rk->isInverse = !refs[i].isForward;
+            if(UA_NodeId_copy(&refs[i].referenceTypeId, &rk->referenceTypeId) != UA_STATUSCODE_GOOD)
+                return UA_STATUSCODE_BADOUTOFMEMORY;
+            node->referencesSize++;
+        }
+        targets = (UA_ExpandedNodeId *)UA_realloc(rk->targetIds, sizeof(UA_ExpandedNodeId) *
+                                                  (rk->targetIdsSize + j - i));
+        if(!targets)
+            return UA_STATUSCODE_BADOUTOFMEMORY;
+        rk->targetIds = targets;
+        existing = rk->targetIdsSize;
+        for(; i < j; i++) {
+            for(k = 0; k < existing; k++) {
+                if(UA_ExpandedNodeId_equal(&targets[k], &refs[i].targetNodeId))
+                    break;
+            }
+            if(k < existing)
+                continue;
+            if(UA_ExpandedNodeId_copy(&refs[i].targetNodeId, &targets[rk->targetIdsSize]) != UA_STATUSCODE_GOOD)
+                return UA_STATUSCODE_BADOUTOFMEMORY;
+            rk->targetIdsSize++;
+        }
+    }
+    return UA_STATUSCODE_GOOD;
+}
+"""
+
+# Adds the references of a source node in one batch with the server API
+referenceBatchCode = addReferencesCode + """
+/* Declared in ua_server_internal.h, which is not part of the public API of
+ * open62541. The session is only passed on to the callback. */
+typedef UA_StatusCode (*nodesetEditNodeCallback)(UA_Server *server, void *session,
+                                                 UA_Node *node, void *data);
+UA_StatusCode
+UA_Server_editNode(UA_Server *server, void *session, const UA_NodeId *nodeId,
+                   nodesetEditNodeCallback callback, void *data);
+
+typedef struct {
+    const UA_AddReferencesItem *refs;
+    size_t refsSize;
+} NodesetReferenceBatch;
+
+static UA_StatusCode
+nodesetAddReferenceBatchCallback(UA_Server *server, void *session, UA_Node *node, void *data) {
+    const NodesetReferenceBatch *batch = (const NodesetReferenceBatch *)data;
+    (void)server;
+    (void)session;
+    return nodesetAddReferences(node, batch->refs, batch->refsSize);
+}
+
+static UA_StatusCode
+nodesetAddInverseReference(UA_Server *server, void *session, UA_Node *node, void *data) {
+    UA_StatusCode retVal = UA_Node_addReference(node, (const UA_AddReferencesItem *)data);
+    (void)server;
+    (void)session;
+    if(retVal == UA_STATUSCODE_BADDUPLICATEREFERENCENOTALLOWED)
+        return UA_STATUSCODE_GOOD;
+    return retVal;
+}
+
+/* The item does not own the NodeIds */
+static void
+nodesetReference(UA_AddReferencesItem *item, const UA_NodeId referenceTypeId,
+                 const UA_ExpandedNodeId targetId, UA_Boolean isForward) {
+    UA_AddReferencesItem_init(item);
+    item->referenceTypeId = referenceTypeId;
+    item->targetNodeId = targetId;
+    item->isForward = isForward;
+}
+
+/* Adds the references of the source node. The inverse references are added to
+ * the targets first, the references whose target is missing are skipped. Then
+ * the remaining references are added to the source node with one edit. The
+ * skipped items are overwritten. */
+static UA_StatusCode
+nodesetAddReferenceBatch(UA_Server *server, const UA_NodeId source,
+                         UA_AddReferencesItem *refs, size_t refsSize) {
+    UA_StatusCode retVal = UA_STATUSCODE_GOOD, res;
+    NodesetReferenceBatch batch;
+    size_t i, added = 0;
+    for(i = 0; i < refsSize; i++) {
+        UA_AddReferencesItem inverse;
+        UA_AddReferencesItem_init(&inverse);
+        inverse.referenceTypeId = refs[i].referenceTypeId;
+        inverse.isForward = !refs[i].isForward;
+        inverse.targetNodeId.nodeId = source;
+        res = UA_Server_editNode(server, NULL, &refs[i].targetNodeId.nodeId,
+                                 nodesetAddInverseReference, &inverse);
+        if(res != UA_STATUSCODE_GOOD) {
+            retVal |= res;
+            continue;
+        }
+        refs[added++] = refs[i];
+    }
+    batch.refs = refs;
+    batch.refsSize = added;
+    if(added > 0)
+        retVal |= UA_Server_editNode(server, NULL, &source, nodesetAddReferenceBatchCallback, &batch);
+    return retVal;
+}
+"""
+
+def groupReferences(references):
+    """ Returns the references grouped by source node, and per source by
+        reference type and direction. The groups are ordered by their first
+        reference, the references of a group keep their order.
+    """
+    groups = OrderedDict()
+    for ref in references:
+        groups.setdefault((ref.source, ref.referenceType, ref.isForward), []).append(ref)
+    bySource = OrderedDict()
+    for key, refs in groups.items():
+        bySource.setdefault(key[0], []).extend(refs)
+    return bySource
+
+def orderReferences(references):
+    """ Returns the references in the order of groupReferences. """
+    ordered = []
+    for refs in groupReferences(references).values():
+        ordered.extend(refs)
+    return ordered
+
+def generateReferenceBatchCode(references):
+    """ Returns the code which adds the references in one batch per source
+        node. The begin function of a node declares retVal and ns.
+    """
+    code = []
+    for source, refs in groupReferences(references).items():
+        code.append("{\nUA_AddReferencesItem references[%d];" % len(refs))
+        for i, ref in enumerate(refs):
+            code.append("nodesetReference(&references[%d], %s, %s, %s);" %
+                        (i, generateNodeIdCode(ref.referenceType), generateExpandedNodeIdCode(ref.target),
+                         "true" if ref.isForward else "false"))
+        code.append("retVal |= nodesetAddReferenceBatch(server, %s, references, %d);\n}" %
+                    (generateNodeIdCode(source), len(refs)))
+    return "\n".join(code)
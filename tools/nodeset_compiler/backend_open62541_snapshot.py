@@ -0,0 +1,557 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+from nodes import *
+from backend_open62541_tables import describeNode, NODESET_VALUE_NONE, NODESET_VALUE_ARRAY, \
+    NODESET_ISABSTRACT, NODESET_SYMMETRIC, NODESET_HISTORIZING, NODESET_EXECUTABLE, \
+    NODESET_USEREXECUTABLE, NODESET_CONTAINSNOLOOPS
+from backend_open62541_references import addReferencesCode
+from backend_open62541_stream import CodeSpool
+from backend_open62541_profile import countProfileReferences, writeProfileReferences
+from collections import OrderedDict
+import datetime
+import struct
+import re
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+#############################
+# Binary Address Space Blob #
+#############################
+
+# The snapshot backend encodes the whole address space with the OPC UA binary
+# encoding into one const byte array. The loader below decodes it with
+# UA_decodeBinary and puts the nodes directly into the nodestore. Every node is
+# inserted once with all its references, so the loader skips the per node
+# checks and the per reference node edits of UA_Server_addNode_begin and
+# UA_Server_addReference. The blob is the sequence
+#
+#   UInt32 nodesSize
+#   nodesSize times: AddNodesItem, UInt32 referencesSize, AddReferencesItem[]
+#   UInt32 existingSize
+#   existingSize times: NodeId, UInt32 referencesSize, AddReferencesItem[]
+#
+# The references are one-way and belong to the preceding node, their source is
+# left empty. The second part adds the references to nodes which already exist
+# in the server (e.g. the objects folder). All NodeIds use the namespace
+# indices of the nodeset, the loader maps them with the ns array.
+
+# The binary encoding ids of the attribute structures
+attributeEncodingIds = {
+    ObjectNode: 354,
+    VariableNode: 357,
+    MethodNode: 360,
+    ObjectTypeNode: 363,
+    VariableTypeNode: 366,
+    ReferenceTypeNode: 369,
+    DataTypeNode: 372,
+    ViewNode: 375
+}
+
+# The builtin type ids of the values the snapshot can encode
+snapshotTypeIds = {
+    "Boolean": 1, "SByte": 2, "Byte": 3, "Int16": 4, "UInt16": 5, "Int32": 6, "UInt32": 7,
+    "Int64": 8, "UInt64": 9, "Float": 10, "Double": 11, "String": 12, "DateTime": 13,
+    "ByteString": 15, "XmlElement": 16, "LocalizedText": 21
+}
+
+snapshotNumericFormats = {
+    "SByte": "<b", "Byte": "<B", "Int16": "<h", "UInt16": "<H", "Int32": "<i", "UInt32": "<I",
+    "Int64": "<q", "UInt64": "<Q", "Float": "<f", "Double": "<d"
+}
+
+# UA_DATETIME_UNIX_EPOCH in 100 nanosecond ticks
+DATETIME_UNIX_EPOCH = 11644473600 * 10000000
+
+loaderCode = """
+/* Declared in ua_types_encoding_binary.h, which is not part of the public
+ * API of open62541 */
+UA_StatusCode
+UA_decodeBinary(const UA_ByteString *src, size_t *offset, void *dst,
+                const UA_DataType *type, size_t customTypesSize,
+                const UA_DataType *customTypes);
+
+static UA_StatusCode
+nodesetDecodeSize(const UA_ByteString *snapshot, size_t *offset, size_t *size) {
+    UA_UInt32 value = 0;
+    UA_StatusCode retVal = UA_decodeBinary(snapshot, offset, &value,
+                                           &UA_TYPES[UA_TYPES_UINT32], 0, NULL);
+    *size = value;
+    return retVal;
+}
+
+/* Decodes the one-way references of a node and maps their NodeIds */
+static UA_StatusCode
+nodesetDecodeReferences(const UA_ByteString *snapshot, size_t *offset, const UA_UInt16 *ns,
+                        UA_AddReferencesItem **refs, size_t *refsSize) {
+    size_t i;
+    UA_StatusCode retVal = nodesetDecodeSize(snapshot, offset, refsSize);
+    *refs = NULL;
+    if(retVal != UA_STATUSCODE_GOOD || *refsSize == 0)
+        return retVal;
+    *refs = (UA_AddReferencesItem *)UA_Array_new(*refsSize, &UA_TYPES[UA_TYPES_ADDREFERENCESITEM]);
+    if(!*refs)
+        return UA_STATUSCODE_BADOUTOFMEMORY;
+    for(i = 0; i < *refsSize && retVal == UA_STATUSCODE_GOOD; i++) {
+        retVal = UA_decodeBinary(snapshot, offset, &(*refs)[i],
+                                 &UA_TYPES[UA_TYPES_ADDREFERENCESITEM], 0, NULL);
+        (*refs)[i].referenceTypeId.namespaceIndex = ns[(*refs)[i].referenceTypeId.namespaceIndex];
+        (*refs)[i].targetNodeId.nodeId.namespaceIndex = ns[(*refs)[i].targetNodeId.nodeId.namespaceIndex];
+    }
+    return retVal;
+}
+
+""" + addReferencesCode + """
+/* Takes the value and the data type from the variable type if the node has
+ * none, like UA_Server_addNode_begin does */
+static UA_StatusCode
+nodesetUseVariableTypeAttributes(UA_Nodestore *nodestore, UA_VariableNode *node,
+                                 const UA_AddNodesItem *item) {
+    const UA_VariableAttributes *attr = (const UA_VariableAttributes *)
+        item->nodeAttributes.content.decoded.data;
+    const UA_NodeId *typeDefinition = &item->typeDefinition.nodeId;
+    const UA_VariableTypeNode *vt;
+    UA_StatusCode retVal = UA_STATUSCODE_GOOD;
+
+    if(node->nodeClass == UA_NODECLASS_VARIABLETYPE)
+        typeDefinition = &item->parentNodeId.nodeId;
+    vt = (const UA_VariableTypeNode *)nodestore->getNode(nodestore->context, typeDefinition);
+    if(!vt || vt->nodeClass != UA_NODECLASS_VARIABLETYPE) {
+        if(vt)
+            nodestore->releaseNode(nodestore->context, (const UA_Node *)vt);
+        return UA_STATUSCODE_BADTYPEMISMATCH;
+    }
+    if(!attr->value.type && vt->valueSource == UA_VALUESOURCE_DATA &&
+       vt->value.data.value.hasValue)
+        retVal = UA_Variant_copy(&vt->value.data.value.value, &node->value.data.value.value);
+    if(retVal == UA_STATUSCODE_GOOD && UA_NodeId_isNull(&node->dataType))
+        retVal = UA_NodeId_copy(&vt->dataType, &node->dataType);
+    nodestore->releaseNode(nodestore->context, (const UA_Node *)vt);
+    return retVal;
+}
+
+/* references is the number of references counted for the profile */
+static UA_StatusCode
+nodesetInsertNode(UA_Nodestore *nodestore, const UA_UInt16 *ns, const UA_ByteString *snapshot,
+                  size_t *offset, UA_NodeId *nodeId, UA_UInt32 references) {
+    UA_AddNodesItem item;
+    UA_AddReferencesItem *refs = NULL;
+    size_t refsSize = 0;
+    UA_Node *node = NULL;
+#ifdef NODESET_PROFILING
+    UA_DateTime profileStart = UA_DateTime_nowMonotonic();
+#else
+    (void)references;
+#endif
+    UA_StatusCode retVal = UA_decodeBinary(snapshot, offset, &item,
+                                           &UA_TYPES[UA_TYPES_ADDNODESITEM], 0, NULL);
+    if(retVal != UA_STATUSCODE_GOOD)
+        return retVal;
+    if(item.nodeAttributes.encoding != UA_EXTENSIONOBJECT_DECODED) {
+        retVal = UA_STATUSCODE_BADNODEATTRIBUTESINVALID;
+        goto cleanup;
+    }
+    item.requestedNewNodeId.nodeId.namespaceIndex = ns[item.requestedNewNodeId.nodeId.namespaceIndex];
+    item.parentNodeId.nodeId.namespaceIndex = ns[item.parentNodeId.nodeId.namespaceIndex];
+    item.typeDefinition.nodeId.namespaceIndex = ns[item.typeDefinition.nodeId.namespaceIndex];
+    item.browseName.namespaceIndex = ns[item.browseName.namespaceIndex];
+    if(item.nodeClass == UA_NODECLASS_VARIABLE || item.nodeClass == UA_NODECLASS_VARIABLETYPE) {
+        UA_VariableAttributes *attr = (UA_VariableAttributes *)item.nodeAttributes.content.decoded.data;
+        attr->dataType.namespaceIndex = ns[attr->dataType.namespaceIndex];
+    }
+    retVal = nodesetDecodeReferences(snapshot, offset, ns, &refs, &refsSize);
+    if(retVal != UA_STATUSCODE_GOOD)
+        goto cleanup;
+#ifndef UA_ENABLE_METHODCALLS
+    if(item.nodeClass == UA_NODECLASS_METHOD)
+        goto cleanup;
+#endif
+
+    node = nodestore->newNode(nodestore->context, item.nodeClass);
+    if(!node) {
+        retVal = UA_STATUSCODE_BADOUTOFMEMORY;
+        goto cleanup;
+    }
+    node->nodeId = item.requestedNewNodeId.nodeId;
+    UA_NodeId_init(&item.requestedNewNodeId.nodeId);
+    node->browseName = item.browseName;
+    UA_QualifiedName_init(&item.browseName);
+    retVal = UA_Node_setAttributes(node, item.nodeAttributes.content.decoded.data,
+                                   item.nodeAttributes.content.decoded.type);
+    if(retVal == UA_STATUSCODE_GOOD &&
+       (item.nodeClass == UA_NODECLASS_VARIABLE || item.nodeClass == UA_NODECLASS_VARIABLETYPE))
+        retVal = nodesetUseVariableTypeAttributes(nodestore, (UA_VariableNode *)node, &item);
+    if(retVal == UA_STATUSCODE_GOOD)
+        retVal = nodesetAddReferences(node, refs, refsSize);
+    if(retVal == UA_STATUSCODE_GOOD)
+        retVal = UA_NodeId_copy(&node->nodeId, nodeId);
+    if(retVal != UA_STATUSCODE_GOOD) {
+        nodestore->deleteNode(nodestore->context, node);
+        goto cleanup;
+    }
+    /* The node is deleted if the insertion fails */
+    retVal = nodestore->insertNode(nodestore->context, node, NULL);
+#ifdef NODESET_PROFILING
+    nodesetProfileNode(item.nodeClass, NODESET_PROFILE_BEGIN, profileStart, references);
+#endif
+
+ cleanup:
+    UA_Array_delete(refs, refsSize, &UA_TYPES[UA_TYPES_ADDREFERENCESITEM]);
+    UA_AddNodesItem_deleteMembers(&item);
+    return retVal;
+}
+
+/* Adds the references to a node which was not inserted from the snapshot */
+static UA_StatusCode
+nodesetEditNode(UA_Nodestore *nodestore, const UA_UInt16 *ns, const UA_ByteString *snapshot,
+                size_t *offset) {
+    UA_NodeId nodeId;
+    UA_AddReferencesItem *refs = NULL;
+    size_t refsSize = 0;
+    UA_Node *node;
+    UA_StatusCode retVal = UA_decodeBinary(snapshot, offset, &nodeId,
+                                           &UA_TYPES[UA_TYPES_NODEID], 0, NULL);
+    if(retVal != UA_STATUSCODE_GOOD)
+        return retVal;
+    nodeId.namespaceIndex = ns[nodeId.namespaceIndex];
+    retVal = nodesetDecodeReferences(snapshot, offset, ns, &refs, &refsSize);
+    if(retVal != UA_STATUSCODE_GOOD)
+        goto cleanup;
+
+    if(nodestore->inPlaceEditAllowed) {
+        node = (UA_Node *)(uintptr_t)nodestore->getNode(nodestore->context, &nodeId);
+        if(!node) {
+            retVal = UA_STATUSCODE_BADNODEIDUNKNOWN;
+            goto cleanup;
+        }
+        retVal = nodesetAddReferences(node, refs, refsSize);
+        nodestore->releaseNode(nodestore->context, node);
+    } else {
+        retVal = nodestore->getNodeCopy(nodestore->context, &nodeId, &node);
+        if(retVal != UA_STATUSCODE_GOOD)
+            goto cleanup;
+        retVal = nodesetAddReferences(node, refs, refsSize);
+        if(retVal == UA_STATUSCODE_GOOD)
+            retVal = nodestore->replaceNode(nodestore->context, node);
+        else
+            nodestore->deleteNode(nodestore->context, node);
+    }
+
+ cleanup:
+    UA_Array_delete(refs, refsSize, &UA_TYPES[UA_TYPES_ADDREFERENCESITEM]);
+    UA_NodeId_deleteMembers(&nodeId);
+    return retVal;
+}
+
+/* profileReferences holds the references counted for the profile of every
+ * node, NULL without profiling */
+static UA_StatusCode
+nodesetLoadSnapshot(UA_Server *server, UA_Nodestore *nodestore, const UA_UInt16 *ns,
+                    const UA_ByteString *snapshot, const UA_UInt32 *profileReferences) {
+    UA_NodeId *nodeIds = NULL;
+    size_t offset = 0, nodesSize = 0, existingSize = 0, inserted = 0, i;
+#ifdef NODESET_PROFILING
+    UA_DateTime profilePhase = UA_DateTime_nowMonotonic();
+    UA_DateTime profileStart;
+    UA_NodeClass nodeClass;
+#endif
+    UA_StatusCode retVal = nodesetDecodeSize(snapshot, &offset, &nodesSize);
+    if(retVal != UA_STATUSCODE_GOOD)
+        return retVal;
+    if(nodesSize > 0) {
+        nodeIds = (UA_NodeId *)UA_Array_new(nodesSize, &UA_TYPES[UA_TYPES_NODEID]);
+        if(!nodeIds)
+            return UA_STATUSCODE_BADOUTOFMEMORY;
+    }
+
+    /* Insert the nodes with their references, then add the references to the
+     * existing nodes */
+    for(i = 0; i < nodesSize && retVal == UA_STATUSCODE_GOOD; i++) {
+        retVal = nodesetInsertNode(nodestore, ns, snapshot, &offset, &nodeIds[inserted],
+                                   profileReferences ? profileReferences[i] : 0);
+        if(!UA_NodeId_isNull(&nodeIds[inserted]))
+            inserted++;
+    }
+    if(retVal == UA_STATUSCODE_GOOD)
+        retVal = nodesetDecodeSize(snapshot, &offset, &existingSize);
+    for(i = 0; i < existingSize && retVal == UA_STATUSCODE_GOOD; i++)
+        retVal = nodesetEditNode(nodestore, ns, snapshot, &offset);
+#ifdef NODESET_PROFILING
+    nodesetProfilePhase(&NODESET_PROFILE_DATA->beginTime, &profilePhase);
+#endif
+
+    /* Instantiate the nodes and call the constructors in reverse order */
+    for(i = inserted; i > 0 && retVal == UA_STATUSCODE_GOOD; i--) {
+#ifdef NODESET_PROFILING
+        if(UA_Server_readNodeClass(server, nodeIds[i - 1], &nodeClass) != UA_STATUSCODE_GOOD)
+            nodeClass = UA_NODECLASS_UNSPECIFIED;
+        profileStart = UA_DateTime_nowMonotonic();
+#endif
+        retVal = UA_Server_addNode_finish(server, nodeIds[i - 1]);
+#ifdef NODESET_PROFILING
+        nodesetProfileNode(nodeClass, NODESET_PROFILE_FINISH, profileStart, 0);
+#endif
+    }
+#ifdef NODESET_PROFILING
+    nodesetProfilePhase(&NODESET_PROFILE_DATA->finishTime, &profilePhase);
+#endif
+
+    UA_Array_delete(nodeIds, nodesSize, &UA_TYPES[UA_TYPES_NODEID]);
+    return retVal;
+}
+"""
+
+class SnapshotReferences(object):
+    """ The one-way references of the snapshot, grouped by the node they belong
+        to and by reference type and direction. Duplicates are dropped.
+    """
+
+    def __init__(self):
+        self.references = OrderedDict()
+
+    def addOneWay(self, source, referenceType, target, isForward):
+        kinds = self.references.setdefault(source, OrderedDict())
+        kinds.setdefault((referenceType, isForward), OrderedDict())[target] = None
+
+    def add(self, source, referenceType, target, isForward):
+        self.addOneWay(source, referenceType, target, isForward)
+        self.addOneWay(target, referenceType, source, not isForward)
+
+    def pop(self, nodeId):
+        return self.references.pop(nodeId, {})
+
+def encodeUInt32(value):
+    return struct.pack("<I", value)
+
+def encodeInt32(value):
+    return struct.pack("<i", value)
+
+def encodeBoolean(value):
+    return b"\x01" if value else b"\x00"
+
+def encodeString(value):
+    if value is None:
+        return encodeInt32(-1)
+    if not isinstance(value, bytes):
+        value = value.encode("utf-8")
+    return encodeInt32(len(value)) + value
+
+def encodeLocalizedText(locale, text):
+    # Like UA_LOCALIZEDTEXT, locale and text are always set
+    return b"\x03" + encodeString(locale) + encodeString(text)
+
+def encodeNodeId(value):
+    if value is None:
+        return b"\x00\x00"
+    if value.i != None:
+        if value.ns == 0 and value.i <= 0xff:
+            return struct.pack("<BB", 0, value.i)
+        if value.ns <= 0xff and value.i <= 0xffff:
+            return struct.pack("<BBH", 1, value.ns, value.i)
+        return struct.pack("<BHI", 2, value.ns, value.i)
+    elif value.s != None:
+        return struct.pack("<BH", 3, value.ns) + encodeString(value.s)
+    raise Exception(str(value) + " no NodeID generation for bytestring and guid..")
+
+def isNullNodeId(value):
+    return value is None or (value.ns == 0 and value.i == 0)
+
+def encodeScalarValue(value):
+    typeName = value.__class__.__name__
+    if typeName == "Boolean":
+        return encodeBoolean(value.value == "true")
+    elif typeName in snapshotNumericFormats:
+        return struct.pack(snapshotNumericFormats[typeName], value.value)
+    elif typeName in ["String", "XmlElement"]:
+        return encodeString(value.value)
+    elif typeName == "ByteString":
+        if not value.value:
+            return encodeString(None)
+        # replace whitespaces between tags and remove newlines
+        return encodeString(re.sub(r">\s*<", "><", re.sub(r"[\r\n]+", "", value.value)))
+    elif typeName == "LocalizedText":
+        return encodeLocalizedText(value.locale, value.text)
+    elif typeName == "DateTime":
+        epoch = datetime.datetime.utcfromtimestamp(0)
+        mSecsSinceEpoch = int((value.value - epoch).total_seconds() * 1000.0)
+        return struct.pack("<q", mSecsSinceEpoch * 10000 + DATETIME_UNIX_EPOCH)
+    raise Exception("No snapshot encoding for values of type " + typeName)
+
+def encodeVariant(node, value):
+    """Returns the variant with the value, which the tables backend has
+    described for the node, or None if it cannot be encoded.
+
+    """
+    if value.kind == NODESET_VALUE_NONE:
+        return b"\x00"
+    if value.typeName not in snapshotTypeIds or not value.typesArray.startswith("&UA_TYPES["):
+        return None
+    encoding = snapshotTypeIds[value.typeName]
+    if value.values is None:
+        # Only the type is set, the data is NULL
+        return struct.pack("<Bi", encoding | 0x80, -1)
+    values = node.value.value
+    if value.kind == NODESET_VALUE_ARRAY:
+        return struct.pack("<Bi", encoding | 0x80, len(values)) + b"".join(encodeScalarValue(v) for v in values)
+    return struct.pack("<B", encoding) + encodeScalarValue(values[0])
+
+def encodeAttributes(table, variant):
+    node = table.node
+    body = [encodeUInt32(0),
+            encodeLocalizedText(node.displayName.locale, node.displayName.text),
+            encodeLocalizedText(node.description.locale, node.description.text),
+            encodeUInt32(node.writeMask), encodeUInt32(node.userWriteMask)]
+    flags = table.flags
+    if isinstance(node, ReferenceTypeNode):
+        # An empty encoding mask if the inverse name is not set
+        inverseName = b"\x00"
+        if table.inverseName is not None:
+            inverseName = encodeLocalizedText("", table.inverseName)
+        body += [encodeBoolean(flags & NODESET_ISABSTRACT), encodeBoolean(flags & NODESET_SYMMETRIC), inverseName]
+    elif isinstance(node, ObjectNode):
+        body.append(struct.pack("<B", table.eventNotifier))
+    elif isinstance(node, VariableTypeNode):
+        body += [variant, encodeNodeId(table.dataType), encodeInt32(table.valueRank), encodeInt32(-1),
+                 encodeBoolean(flags & NODESET_ISABSTRACT)]
+    elif isinstance(node, VariableNode):
+        # The array dimensions are zero like in the tables backend
+        dimensions = encodeInt32(-1)
+        if table.valueRank > 0:
+            dimensions = encodeInt32(table.valueRank) + encodeUInt32(0) * table.valueRank
+        body += [variant, encodeNodeId(table.dataType), encodeInt32(table.valueRank), dimensions,
+                 struct.pack("<BBd", table.accessLevel, table.userAccessLevel, table.minimumSamplingInterval),
+                 encodeBoolean(flags & NODESET_HISTORIZING)]
+    elif isinstance(node, MethodNode):
+        body += [encodeBoolean(flags & NODESET_EXECUTABLE), encodeBoolean(flags & NODESET_USEREXECUTABLE)]
+    elif isinstance(node, ObjectTypeNode) or isinstance(node, DataTypeNode):
+        body.append(encodeBoolean(flags & NODESET_ISABSTRACT))
+    elif isinstance(node, ViewNode):
+        body += [encodeBoolean(flags & NODESET_CONTAINSNOLOOPS), struct.pack("<B", table.eventNotifier)]
+    body = b"".join(body)
+    return encodeNodeId(NodeId("i=" + str(attributeEncodingIds[node.__class__]))) + b"\x01" + \
+        encodeInt32(len(body)) + body
+
+def encodeAddNodesItem(table, variant):
+    node = table.node
+    # The parent is only evaluated for variable types, see
+    # nodesetUseVariableTypeAttributes
+    return b"".join([encodeNodeId(table.parent), encodeNodeId(table.parentRef), encodeNodeId(node.id),
+                     struct.pack("<H", node.browseName.ns), encodeString(node.browseName.name),
+                     encodeInt32(nodeClassValues[node.__class__]), encodeAttributes(table, variant),
+                     encodeNodeId(table.typeDef)])
+
+def encodeReferences(kinds):
+    refs = []
+    for (referenceType, isForward), targets in kinds.items():
+        for target in targets:
+            refs.append(b"".join([encodeNodeId(None), encodeNodeId(referenceType), encodeBoolean(isForward),
+                                  encodeString(None), encodeNodeId(target), encodeInt32(0)]))
+    return encodeUInt32(len(refs)) + b"".join(refs)
+
+# The values of the UA_NodeClass enumeration
+nodeClassValues = {
+    ObjectNode: 1,
+    VariableNode: 2,
+    MethodNode: 4,
+    ObjectTypeNode: 8,
+    VariableTypeNode: 16,
+    ReferenceTypeNode: 32,
+    DataTypeNode: 64,
+    ViewNode: 128
+}
+
+def addSnapshotReferences(table, references):
+    """Adds the references of the node, including the references to the parent
+    and to the type definition, which UA_Server_addNode_begin would add.
+
+    """
+    node = table.node
+    if not isNullNodeId(table.parent):
+        parentRef = table.parentRef
+        if isNullNodeId(parentRef) and node.__class__ in [VariableTypeNode, ObjectTypeNode,
+                                                          ReferenceTypeNode, DataTypeNode]:
+            parentRef = NodeId("i=45")
+        references.add(node.id, parentRef, table.parent, False)
+    if isinstance(node, ObjectNode) or (isinstance(node, VariableNode) and not isinstance(node, VariableTypeNode)):
+        if isNullNodeId(table.typeDef):
+            # The most permissive default of the server
+            table.typeDef = NodeId("i=58" if isinstance(node, ObjectNode) else "i=63")
+        references.add(node.id, NodeId("i=40"), table.typeDef, True)
+    for ref in table.references:
+        references.add(ref.source, ref.referenceType, ref.target, ref.isForward)
+
+def writeSnapshot(writec, name, blob):
+    """Writes the blob from the spool with 32 bytes per line."""
+    writec("\nstatic const UA_Byte %s[%d] = {" % (name, blob.size))
+    # The chunks of the spool are a multiple of the line length
+    for chunk in blob.chunks():
+        data = bytearray(chunk)
+        for i in range(0, len(data), 32):
+            writec(",".join(str(b) for b in data[i:i + 32]) + ",")
+    writec("};")
+
+def generateNodeSnapshot(nodeset, sorted_nodes, writec, outfilebase, max_string_length, generate_ns0, parentrefs,
+                         profile=False):
+    """Writes the loader and the snapshot of the ordered nodes. Returns the code
+    of the main function, which loads the snapshot. With profiling the
+    reference counts of the nodes are written too.
+
+    """
+    writec(loaderCode)
+
+    # The encoded nodes are spooled, their references are only complete once
+    # all nodes are encoded
+    with CodeSpool() as encoded:
+        with CodeSpool() as blob:
+            items = []
+            profileReferences = []
+            references = SnapshotReferences()
+            for node in sorted_nodes:
+                # The value is only decoded for the encoding of its node
+                if isinstance(node, VariableNode):
+                    node.allocateValue(nodeset)
+                table = describeNode(node, nodeset, generate_ns0, parentrefs, max_string_length)
+                if table is None:
+                    writec("/* " + str(node.displayName) + " - " + str(node.id) + ": Ignored. No parent */")
+                    nodeset.hide_node(node.id)
+                else:
+                    variant = encodeVariant(node, table.value)
+                    if table.begin is not None or variant is None:
+                        raise Exception("The value of node " + str(node.id) + " cannot be encoded in the snapshot, "
+                                        "use another backend")
+                    addSnapshotReferences(table, references)
+                    profileReferences.append(countProfileReferences(node, generate_ns0))
+                    items.append((node.id, encoded.store(encodeAddNodesItem(table, variant))))
+                if isinstance(node, VariableNode):
+                    node.releaseValue()
+
+            blob.store(encodeUInt32(len(items)))
+            for (nodeId, item) in items:
+                blob.store(encoded.load(item))
+                blob.store(encodeReferences(references.pop(nodeId)))
+            blob.store(encodeUInt32(len(references.references)))
+            for nodeId, kinds in references.references.items():
+                blob.store(encodeNodeId(nodeId))
+                blob.store(encodeReferences(kinds))
+            logger.info("The snapshot of %d nodes has %d bytes" % (len(items), blob.size))
+
+            writeSnapshot(writec, "snapshot_" + outfilebase, blob)
+            if profile:
+                writeProfileReferences(writec, "profileReferences_" + outfilebase, profileReferences)
+    return """UA_ByteString snapshot = {sizeof(snapshot_%s), (UA_Byte *)(uintptr_t)snapshot_%s};
+retVal |= nodesetLoadSnapshot(server, nodestore, ns, &snapshot, %s);""" % \
+        (outfilebase, outfilebase, "profileReferences_" + outfilebase if profile else "NULL")
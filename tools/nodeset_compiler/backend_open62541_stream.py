@@ -0,0 +1,177 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+import os
+import tempfile
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+##################
+# Output Streams #
+##################
+
+# The generated files are not kept in memory. The lines are collected in
+# chunks of STREAM_CHUNK_SIZE bytes, which are written to a temporary file next
+# to the output file. The output file is only replaced if the content changed,
+# so the build system does not recompile unchanged files. Sections whose
+# position depends on code which is generated later are kept in a CodeSpool.
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+def filesEqual(filename1, filename2):
+    """ Compares two files chunk by chunk. """
+    if not os.path.isfile(filename2) or os.path.getsize(filename1) != os.path.getsize(filename2):
+        return False
+    with open(filename1, "rb") as f1:
+        with open(filename2, "rb") as f2:
+            while True:
+                chunk1 = f1.read(STREAM_CHUNK_SIZE)
+                if chunk1 != f2.read(STREAM_CHUNK_SIZE):
+                    return False
+                if not chunk1:
+                    return True
+
+class StreamWriter(object):
+    """ Writes the lines of a generated file. The writer is called with one
+        line. Used in a with statement, the file is closed at the end of the
+        block, or the partial output is discarded if the block raised.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.tempname = filename + ".tmp"
+        self.file = open(self.tempname, "wb")
+        self.chunk = []
+        self.chunkSize = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    def __call__(self, line):
+        self.write(unicode(line) + u"\n")
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.chunk.append(data)
+        self.chunkSize = self.chunkSize + len(data)
+        if self.chunkSize >= STREAM_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.file.write(b"".join(self.chunk))
+        self.chunk = []
+        self.chunkSize = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        if filesEqual(self.tempname, self.filename):
+            os.remove(self.tempname)
+            return
+        # Windows cannot rename onto an existing file
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+        os.rename(self.tempname, self.filename)
+
+    def discard(self):
+        self.file.close()
+        if os.path.isfile(self.tempname):
+            os.remove(self.tempname)
+
+class CodeSpool(object):
+    """ Keeps generated code or data in a temporary file. store returns the
+        position of the data, which is read back with load. A spool with a
+        filename can be kept with save.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        if filename is None:
+            self.file = tempfile.TemporaryFile()
+        else:
+            self.file = open(filename, "w+b")
+        self.size = 0
+
+    @classmethod
+    def open(cls, filename):
+        """ Opens a saved spool for reading. """
+        spool = cls.__new__(cls)
+        spool.filename = None
+        spool.file = open(filename, "rb")
+        spool.size = os.path.getsize(filename)
+        return spool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def store(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        self.file.seek(self.size)
+        self.file.write(data)
+        position = (self.size, len(data))
+        self.size = self.size + len(data)
+        return position
+
+    def load(self, position):
+        (offset, length) = position
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def loadText(self, position):
+        return self.load(position).decode("utf-8")
+
+    def chunks(self):
+        """ Returns the whole content in chunks of STREAM_CHUNK_SIZE bytes. """
+        offset = 0
+        while offset < self.size:
+            length = min(STREAM_CHUNK_SIZE, self.size - offset)
+            yield self.load((offset, length))
+            offset = offset + length
+
+    def writeLines(self, writer):
+        """ Writes the stored text, which ends with a newline, line by line. """
+        self.file.seek(0)
+        for line in self.file:
+            writer(line.decode("utf-8").rstrip(u"\n"))
+
+    def save(self, filename):
+        """ Closes the spool and keeps its content as filename. """
+        self.file.close()
+        if os.path.isfile(filename):
+            os.remove(filename)
+        os.rename(self.filename, filename)
+        self.filename = None
+
+    def close(self):
+        self.file.close()
+        # The file of an unsaved spool is removed
+        if self.filename is not None and os.path.isfile(self.filename):
+            os.remove(self.filename)
+            self.filename = None
@@ -0,0 +1,119 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+from collections import OrderedDict
+from backend_open62541_datatypes import splitStringLiterals
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+#######################
+# String Literal Pool #
+#######################
+
+# The browse names, display names and descriptions of the nodes repeat a lot,
+# e.g. the names of the sub-indices of a POWERLINK object. The function backend
+# writes a string which is used several times once into the array
+# strings_<outfilebase> and the node code refers to it by index. With shards
+# the array is defined in the main file and declared in the shards. Many
+# compilers already merge equal literals within an object file, the pool also
+# shares the strings between the shards and with compilers which do not.
+
+POOL_POINTER_SIZE = 8
+
+def stringReferenceCode(index):
+    return "NODESET_STRING(%d)" % index
+
+class StringPool(object):
+    """ The pooled strings of the generated node code in the order of their
+        first use. A string is only pooled if the pool makes the generated
+        code smaller, which needs a long string or many uses. The pool is
+        built from all nodes up front, so the code of a string does not depend
+        on which nodes were generated before.
+    """
+
+    def __init__(self, nodes, max_string_length):
+        counts = OrderedDict()
+        for node in nodes:
+            for value in [node.displayName.text, node.description.text, node.browseName.name]:
+                counts[value.strip()] = counts.get(value.strip(), 0) + 1
+        # literal -> (index, size in bytes, uses)
+        self.strings = OrderedDict()
+        for value, uses in counts.items():
+            literal = splitStringLiterals(value, max_string_length=max_string_length)
+            if literal == "\"\"" or literal in self.strings:
+                continue
+            reference = stringReferenceCode(len(self.strings))
+            # The array holds the literal and a separator
+            if uses * len(literal) > len(literal) + 2 + uses * len(reference):
+                self.strings[literal] = (len(self.strings), len(value.encode("utf-8")) + 1, uses)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def literal(self, value, max_string_length):
+        """ Returns the code of the string, which is an index into the pool or
+            a literal if the string is not pooled.
+        """
+        literal = splitStringLiterals(value, max_string_length=max_string_length)
+        entry = self.strings.get(literal)
+        if entry is None:
+            return literal
+        return stringReferenceCode(entry[0])
+
+    def localizedText(self, value, max_string_length):
+        return "UA_LOCALIZEDTEXT(\"%s\", %s)" % (value.locale, self.literal(value.text, max_string_length))
+
+    def qualifiedName(self, value, max_string_length):
+        return "UA_QUALIFIEDNAME(ns[%s], %s)" % (str(value.ns), self.literal(value.name, max_string_length))
+
+    def write(self, writec, outfilebase, shared):
+        """ Writes the array of the strings. A shared array is used by the
+            shards and has external linkage.
+        """
+        if len(self.strings) == 0:
+            return
+        writec("\n/* The strings of the nodes, every string is stored once */")
+        writec("%sconst char *const strings_%s[%d] = {" % ("" if shared else "static ", outfilebase, len(self.strings)))
+        last = len(self.strings) - 1
+        for literal, (index, size, uses) in self.strings.items():
+            writec(literal + ("};" if index == last else ","))
+        writeStringAccess(writec, outfilebase)
+
+    def logSavings(self, outfilebase):
+        """ Logs the size of the pooled strings in the generated code and in
+            the string data of the program, with and without the pool.
+        """
+        uses = codeBefore = codeAfter = dataBefore = dataAfter = 0
+        for literal, (index, size, count) in self.strings.items():
+            uses = uses + count
+            codeBefore = codeBefore + count * len(literal)
+            codeAfter = codeAfter + len(literal) + 2 + count * len(stringReferenceCode(index))
+            dataBefore = dataBefore + count * size
+            dataAfter = dataAfter + size + POOL_POINTER_SIZE
+        logger.info("The string pool of %s holds %d strings with %d uses. The code of the strings has %d "
+                    "instead of %d bytes, the string data %d instead of %d bytes." %
+                    (outfilebase, len(self.strings), uses, codeAfter, codeBefore, dataAfter, dataBefore))
+
+def writeStringAccess(writec, outfilebase):
+    writec("#define NODESET_STRING(i) ((char *)(uintptr_t)strings_%s[i])" % outfilebase)
+
+def writeSharedStringDeclaration(writec, outfilebase):
+    """ Declares the array of the strings in a shard. The size is left out, so
+        a new string does not change all shards.
+    """
+    writec("\nextern const char *const strings_%s[];" % outfilebase)
+    writeStringAccess(writec, outfilebase)
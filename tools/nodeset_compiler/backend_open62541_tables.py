@@ -0,0 +1,613 @@
+#!/usr/bin/env/python
+# -*- coding: utf-8 -*-
+
+###
+### This program was created for educational purposes and has been
+### contributed to the open62541 project by the author. All licensing
+### terms for this source is inherited by the terms and conditions
+### specified for by the open62541 project (see the projects readme
+### file for more information on the LGPL terms and restrictions).
+###
+### This program is not meant to be used in a production environment. The
+### author is not liable for any complications arising due to the use of
+### this program.
+###
+
+from nodes import *
+from backend_open62541_datatypes import *
+from backend_open62541_nodes import generateNodeCode_begin, getNodeBeginArguments, getTypesArrayForValue
+from backend_open62541_references import referenceBatchCode, orderReferences
+from backend_open62541_stream import CodeSpool
+from backend_open62541_profile import countProfileReferences, writeProfileReferences
+import re
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+##########################
+# Table Driven Node Code #
+##########################
+
+# Instead of two functions per node, the table backend prints one descriptor
+# per node and one entry per reference into const arrays. The generic loader
+# below walks the arrays in the order of the nodes. Values the tables cannot
+# describe (e.g. ExtensionObjects) are set up by a generated begin function of
+# the node, which is referenced from its descriptor.
+
+NODESET_ISABSTRACT = 0x01
+NODESET_SYMMETRIC = 0x02
+NODESET_HISTORIZING = 0x04
+NODESET_EXECUTABLE = 0x08
+NODESET_USEREXECUTABLE = 0x10
+NODESET_CONTAINSNOLOOPS = 0x20
+
+NODESET_VALUE_NONE = 0
+NODESET_VALUE_SCALAR = 1
+NODESET_VALUE_ARRAY = 2
+
+# The values of these types are printed as constant initializers
+tableNumericTypes = [Boolean, Byte, SByte, Int16, UInt16, Int32, UInt32, Int64, UInt64, Float, Double, DateTime]
+
+loaderCode = """
+#define NODESET_ISABSTRACT 0x01
+#define NODESET_SYMMETRIC 0x02
+#define NODESET_HISTORIZING 0x04
+#define NODESET_EXECUTABLE 0x08
+#define NODESET_USEREXECUTABLE 0x10
+#define NODESET_CONTAINSNOLOOPS 0x20
+
+#define NODESET_VALUE_NONE 0
+#define NODESET_VALUE_SCALAR 1
+#define NODESET_VALUE_ARRAY 2
+
+typedef struct {
+    UA_UInt16 nsIndex; /* Index into the ns array */
+    UA_UInt32 numeric;
+    const char *string; /* NULL for numeric NodeIds */
+} NodesetNodeId;
+
+typedef struct {
+    NodesetNodeId source;
+    NodesetNodeId referenceType;
+    NodesetNodeId target;
+    UA_Boolean isForward;
+} NodesetReference;
+
+typedef struct {
+    UA_NodeClass nodeClass;
+    NodesetNodeId id;
+    NodesetNodeId parent;
+    NodesetNodeId parentReference;
+    NodesetNodeId typeDefinition;
+    UA_UInt16 browseNameNsIndex;
+    const char *browseName;
+    const char *displayNameLocale;
+    const char *displayName;
+    const char *descriptionLocale;
+    const char *description;
+    const char *inverseName; /* NULL if not set */
+    UA_UInt32 writeMask;
+    UA_UInt32 userWriteMask;
+    UA_Byte flags;
+    UA_Byte eventNotifier;
+    UA_Byte accessLevel;
+    UA_Byte userAccessLevel;
+    UA_Double minimumSamplingInterval;
+    UA_Int32 valueRank;
+    const NodesetNodeId *dataType; /* NULL if not set */
+    UA_Byte valueKind;
+    const UA_DataType *valueType;
+    const void *value;
+    size_t valueSize;
+    /* Adds the node if the table cannot describe its attributes */
+    UA_StatusCode (*begin)(UA_Server *server, UA_UInt16 *ns);
+    size_t referencesSize;
+} NodesetNode;
+
+static UA_NodeId
+nodesetNodeId(const NodesetNodeId *id, const UA_UInt16 *ns) {
+    if(id->string)
+        return UA_NODEID_STRING(ns[id->nsIndex], (char *)(uintptr_t)id->string);
+    return UA_NODEID_NUMERIC(ns[id->nsIndex], id->numeric);
+}
+
+static UA_ExpandedNodeId
+nodesetExpandedNodeId(const NodesetNodeId *id, const UA_UInt16 *ns) {
+    if(id->string)
+        return UA_EXPANDEDNODEID_STRING(ns[id->nsIndex], (char *)(uintptr_t)id->string);
+    return UA_EXPANDEDNODEID_NUMERIC(ns[id->nsIndex], id->numeric);
+}
+
+static UA_Boolean
+nodesetNodeIdEqual(const NodesetNodeId *a, const NodesetNodeId *b) {
+    if(a->nsIndex != b->nsIndex || a->numeric != b->numeric)
+        return false;
+    if(!a->string || !b->string)
+        return a->string == b->string;
+    return strcmp(a->string, b->string) == 0;
+}
+
+static UA_LocalizedText
+nodesetLocalizedText(const char *locale, const char *text) {
+    return UA_LOCALIZEDTEXT((char *)(uintptr_t)locale, (char *)(uintptr_t)text);
+}
+
+static void
+nodesetSetValue(UA_Variant *value, const NodesetNode *n) {
+    if(n->valueKind == NODESET_VALUE_ARRAY)
+        UA_Variant_setArray(value, (void *)(uintptr_t)n->value, n->valueSize, n->valueType);
+    else if(n->valueKind == NODESET_VALUE_SCALAR)
+        UA_Variant_setScalar(value, (void *)(uintptr_t)n->value, n->valueType);
+}
+
+static UA_StatusCode
+nodesetAddNode_begin(UA_Server *server, UA_UInt16 *ns, const NodesetNode *n) {
+    union {
+        UA_NodeAttributes node;
+        UA_ObjectAttributes object;
+        UA_VariableAttributes variable;
+        UA_MethodAttributes method;
+        UA_ObjectTypeAttributes objectType;
+        UA_VariableTypeAttributes variableType;
+        UA_ReferenceTypeAttributes referenceType;
+        UA_DataTypeAttributes dataType;
+        UA_ViewAttributes view;
+    } attr;
+    const UA_DataType *attrType;
+    UA_StatusCode retVal;
+
+    if(n->begin)
+        return n->begin(server, ns);
+
+    switch(n->nodeClass) {
+    case UA_NODECLASS_OBJECT:
+        attr.object = UA_ObjectAttributes_default;
+        attr.object.eventNotifier = n->eventNotifier;
+        attrType = &UA_TYPES[UA_TYPES_OBJECTATTRIBUTES];
+        break;
+    case UA_NODECLASS_VARIABLE:
+        attr.variable = UA_VariableAttributes_default;
+        attr.variable.historizing = (n->flags & NODESET_HISTORIZING) != 0;
+        attr.variable.minimumSamplingInterval = n->minimumSamplingInterval;
+        attr.variable.userAccessLevel = n->userAccessLevel;
+        attr.variable.accessLevel = n->accessLevel;
+        attr.variable.valueRank = n->valueRank;
+        if(n->valueRank > 0) {
+            attr.variable.arrayDimensionsSize = (size_t)n->valueRank;
+            attr.variable.arrayDimensions = (UA_UInt32 *)UA_Array_new((size_t)n->valueRank, &UA_TYPES[UA_TYPES_UINT32]);
+        }
+        if(n->dataType)
+            attr.variable.dataType = nodesetNodeId(n->dataType, ns);
+        nodesetSetValue(&attr.variable.value, n);
+        attrType = &UA_TYPES[UA_TYPES_VARIABLEATTRIBUTES];
+        break;
+    case UA_NODECLASS_METHOD:
+        attr.method = UA_MethodAttributes_default;
+        attr.method.executable = (n->flags & NODESET_EXECUTABLE) != 0;
+        attr.method.userExecutable = (n->flags & NODESET_USEREXECUTABLE) != 0;
+        attrType = &UA_TYPES[UA_TYPES_METHODATTRIBUTES];
+        break;
+    case UA_NODECLASS_OBJECTTYPE:
+        attr.objectType = UA_ObjectTypeAttributes_default;
+        attr.objectType.isAbstract = (n->flags & NODESET_ISABSTRACT) != 0;
+        attrType = &UA_TYPES[UA_TYPES_OBJECTTYPEATTRIBUTES];
+        break;
+    case UA_NODECLASS_VARIABLETYPE:
+        attr.variableType = UA_VariableTypeAttributes_default;
+        attr.variableType.isAbstract = (n->flags & NODESET_ISABSTRACT) != 0;
+        attr.variableType.valueRank = n->valueRank;
+        if(n->dataType)
+            attr.variableType.dataType = nodesetNodeId(n->dataType, ns);
+        nodesetSetValue(&attr.variableType.value, n);
+        attrType = &UA_TYPES[UA_TYPES_VARIABLETYPEATTRIBUTES];
+        break;
+    case UA_NODECLASS_REFERENCETYPE:
+        attr.referenceType = UA_ReferenceTypeAttributes_default;
+        attr.referenceType.isAbstract = (n->flags & NODESET_ISABSTRACT) != 0;
+        attr.referenceType.symmetric = (n->flags & NODESET_SYMMETRIC) != 0;
+        if(n->inverseName)
+            attr.referenceType.inverseName = nodesetLocalizedText("", n->inverseName);
+        attrType = &UA_TYPES[UA_TYPES_REFERENCETYPEATTRIBUTES];
+        break;
+    case UA_NODECLASS_DATATYPE:
+        attr.dataType = UA_DataTypeAttributes_default;
+        attr.dataType.isAbstract = (n->flags & NODESET_ISABSTRACT) != 0;
+        attrType = &UA_TYPES[UA_TYPES_DATATYPEATTRIBUTES];
+        break;
+    case UA_NODECLASS_VIEW:
+        attr.view = UA_ViewAttributes_default;
+        attr.view.containsNoLoops = (n->flags & NODESET_CONTAINSNOLOOPS) != 0;
+        attr.view.eventNotifier = n->eventNotifier;
+        attrType = &UA_TYPES[UA_TYPES_VIEWATTRIBUTES];
+        break;
+    default:
+        return UA_STATUSCODE_BADNODECLASSINVALID;
+    }
+
+    attr.node.displayName = nodesetLocalizedText(n->displayNameLocale, n->displayName);
+    attr.node.description = nodesetLocalizedText(n->descriptionLocale, n->description);
+    attr.node.writeMask = n->writeMask;
+    attr.node.userWriteMask = n->userWriteMask;
+
+    retVal = UA_Server_addNode_begin(server, n->nodeClass,
+                                     nodesetNodeId(&n->id, ns),
+                                     nodesetNodeId(&n->parent, ns),
+                                     nodesetNodeId(&n->parentReference, ns),
+                                     UA_QUALIFIEDNAME(ns[n->browseNameNsIndex], (char *)(uintptr_t)n->browseName),
+                                     nodesetNodeId(&n->typeDefinition, ns),
+                                     &attr, attrType, NULL, NULL);
+    /* The value points into the tables, the server keeps a copy */
+    if(n->nodeClass == UA_NODECLASS_VARIABLE && n->valueRank > 0)
+        UA_Array_delete(attr.variable.arrayDimensions, (size_t)n->valueRank, &UA_TYPES[UA_TYPES_UINT32]);
+    return retVal;
+}
+
+""" + referenceBatchCode + """
+/* The references of a node are grouped by source node, each group is added in
+ * one batch. profileReferences holds the references counted for the profile of
+ * every node, NULL without profiling. */
+static UA_StatusCode
+nodesetLoad(UA_Server *server, UA_UInt16 *ns, const NodesetNode *nodes, size_t nodesSize,
+            const NodesetReference *references, const UA_UInt32 *profileReferences) {
+    UA_StatusCode retVal = UA_STATUSCODE_GOOD;
+    const NodesetReference *ref = references;
+    UA_AddReferencesItem *items = NULL, *newItems;
+    size_t itemsSize = 0, i, j, k;
+#ifdef NODESET_PROFILING
+    UA_DateTime profilePhase = UA_DateTime_nowMonotonic();
+    UA_DateTime profileStart;
+#else
+    (void)profileReferences;
+#endif
+    for(i = 0; i < nodesSize; i++) {
+        const NodesetNode *n = &nodes[i];
+#ifndef UA_ENABLE_METHODCALLS
+        if(n->nodeClass == UA_NODECLASS_METHOD) {
+            ref += n->referencesSize;
+            continue;
+        }
+#endif
+#ifdef NODESET_PROFILING
+        profileStart = UA_DateTime_nowMonotonic();
+#endif
+        retVal |= nodesetAddNode_begin(server, ns, n);
+        if(n->referencesSize > itemsSize) {
+            newItems = (UA_AddReferencesItem *)UA_realloc(items, sizeof(UA_AddReferencesItem) *
+                                                          n->referencesSize);
+            if(!newItems) {
+                retVal |= UA_STATUSCODE_BADOUTOFMEMORY;
+                ref += n->referencesSize;
+                continue;
+            }
+            items = newItems;
+            itemsSize = n->referencesSize;
+        }
+        for(j = 0; j < n->referencesSize; j = k) {
+            for(k = j; k < n->referencesSize && nodesetNodeIdEqual(&ref[k].source, &ref[j].source); k++)
+                nodesetReference(&items[k - j], nodesetNodeId(&ref[k].referenceType, ns),
+                                 nodesetExpandedNodeId(&ref[k].target, ns), ref[k].isForward);
+            retVal |= nodesetAddReferenceBatch(server, nodesetNodeId(&ref[j].source, ns), items, k - j);
+        }
+        ref += n->referencesSize;
+#ifdef NODESET_PROFILING
+        nodesetProfileNode(n->nodeClass, NODESET_PROFILE_BEGIN, profileStart, profileReferences[i]);
+#endif
+    }
+    UA_free(items);
+#ifdef NODESET_PROFILING
+    nodesetProfilePhase(&NODESET_PROFILE_DATA->beginTime, &profilePhase);
+#endif
+    for(i = nodesSize; i > 0; i--) {
+        const NodesetNode *n = &nodes[i - 1];
+#ifdef NODESET_PROFILING
+        profileStart = UA_DateTime_nowMonotonic();
+#endif
+        if(n->nodeClass == UA_NODECLASS_METHOD) {
+#ifdef UA_ENABLE_METHODCALLS
+            retVal |= UA_Server_addMethodNode_finish(server, nodesetNodeId(&n->id, ns),
+                                                     NULL, 0, NULL, 0, NULL);
+#endif
+        } else {
+            retVal |= UA_Server_addNode_finish(server, nodesetNodeId(&n->id, ns));
+        }
+#ifdef NODESET_PROFILING
+        nodesetProfileNode(n->nodeClass, NODESET_PROFILE_FINISH, profileStart, 0);
+#endif
+    }
+#ifdef NODESET_PROFILING
+    nodesetProfilePhase(&NODESET_PROFILE_DATA->finishTime, &profilePhase);
+#endif
+    return retVal;
+}
+"""
+
+def generateTableNodeIdCode(value):
+    if not value:
+        return "{0, 0, NULL}"
+    if value.i != None:
+        return "{%s, %s, NULL}" % (value.ns, value.i)
+    elif value.s != None:
+        return "{%s, 0, %s}" % (value.ns, splitStringLiterals(value.s))
+    raise Exception(str(value) + " no NodeID generation for bytestring and guid..")
+
+def generateTableStringCode(value, max_string_length):
+    return splitStringLiterals(value, max_string_length=max_string_length)
+
+def generateTableUAStringCode(value, max_string_length):
+    """Returns a constant UA_String initializer. The length is taken from the
+    literal, so escaped and multibyte characters are counted correctly.
+
+    """
+    literal = splitStringLiterals(value, max_string_length=max_string_length)
+    return "{sizeof(%s) - 1, (UA_Byte *)%s}" % (literal, literal)
+
+def generateTableValueCode(value, max_string_length):
+    if type(value) in tableNumericTypes:
+        return generateNodeValueCode(value, None, max_string_length=max_string_length)
+    elif type(value) in [String, XmlElement]:
+        return generateTableUAStringCode(value.value, max_string_length)
+    elif type(value) == ByteString:
+        if not value.value:
+            return "{0, NULL}"
+        # replace whitespaces between tags and remove newlines
+        return generateTableUAStringCode(re.sub(r">\s*<", "><", re.sub(r"[\r\n]+", "", value.value)), max_string_length)
+    elif type(value) == LocalizedText:
+        return "{%s, %s}" % (generateTableUAStringCode(value.locale, max_string_length),
+                             generateTableUAStringCode(value.text, max_string_length))
+    return None
+
+def getNodeDataTypes(node, nodeset):
+    """Returns the tuple (dataType, baseDataType) with the data type nodes
+    of the variable or variable type node, like the function backend.
+
+    """
+    if isinstance(node.dataType, NodeId) and node.dataType.ns == 0 and node.dataType.i == 0:
+        #BaseDataType
+        return (nodeset.nodes[NodeId("i=24")], nodeset.nodes[NodeId("i=24")])
+    dataTypeNodeOpaque = nodeset.getDataTypeNode(node.dataType)
+    return (dataTypeNodeOpaque, nodeset.getBaseDataType(dataTypeNodeOpaque))
+
+class TableNodeValue(object):
+    """ The value of a variable or variable type node in the tables. The
+        values are None if the node has no value. If only the type is set, the
+        value is NULL like the dummy values of the function backend. The
+        typeName is the name of the type without the UA_ prefix.
+    """
+    __slots__ = ("kind", "typesArray", "typeName", "values")
+
+    def __init__(self, kind=NODESET_VALUE_NONE, typesArray=None, typeName=None, values=None):
+        self.kind = kind
+        self.typesArray = typesArray
+        self.typeName = typeName
+        self.values = values
+
+def describeNodeValue(node, dataTypeNode, nodeset, max_string_length):
+    """Returns the TableNodeValue of the node, or None if the value cannot be
+    printed into the tables.
+
+    """
+    if dataTypeNode is None or not dataTypeNode.isEncodable():
+        return TableNodeValue()
+
+    if node.value is None:
+        typeBrowseNode = dataTypeNode.browseName.name
+        if typeBrowseNode == "NumericRange":
+            # in the stack we define a separate structure for the numeric range, but the value itself is just a string
+            typeBrowseNode = "String"
+        typesArray = "&" + dataTypeNode.typesArray + "[" + dataTypeNode.typesArray + "_" + typeBrowseNode.upper() + "]"
+        if node.valueRank > 0:
+            return TableNodeValue(NODESET_VALUE_ARRAY, typesArray, typeBrowseNode)
+        return TableNodeValue(NODESET_VALUE_SCALAR, typesArray, typeBrowseNode)
+
+    values = node.value.value
+    if len(values) == 0 or not isinstance(values[0], Value):
+        return TableNodeValue()
+    code = [generateTableValueCode(v, max_string_length) for v in values]
+    if None in code:
+        return None
+
+    # Same semantics as generateValueCode of the function backend
+    typeName = values[0].__class__.__name__
+    if node.valueRank != -1 and (node.valueRank >= 0 or len(values) > 1):
+        return TableNodeValue(NODESET_VALUE_ARRAY, getTypesArrayForValue(nodeset, values[0]), typeName, code)
+    return TableNodeValue(NODESET_VALUE_SCALAR, getTypesArrayForValue(nodeset, values[0]), typeName, code[:1])
+
+class TableNode(object):
+    """ The descriptor of a node in the node table. """
+
+    def __init__(self, node):
+        self.node = node
+        self.parent = None
+        self.parentRef = None
+        self.typeDef = None
+        self.flags = 0
+        self.eventNotifier = 0
+        self.accessLevel = 0
+        self.userAccessLevel = 0
+        self.minimumSamplingInterval = 0.0
+        self.valueRank = 0
+        self.inverseName = None
+        self.dataType = None
+        self.value = TableNodeValue()
+        self.begin = None
+        self.references = []
+
+def describeNode(node, nodeset, generate_ns0, parentrefs, max_string_length):
+    """Returns the TableNode of the node with the attributes, or a TableNode
+    without attributes and the code of its begin function if the tables cannot
+    describe the node. Returns None if the node was ignored.
+
+    """
+    table = TableNode(node)
+    if isinstance(node, VariableNode):
+        # in order to be compatible with mostly OPC UA client
+        # force valueRank = -1 for scalar VariableNode
+        if not isinstance(node, VariableTypeNode) and node.valueRank == -2:
+            node.valueRank = -1
+        table.valueRank = node.valueRank
+        if node.dataType is not None:
+            (dataTypeNodeOpaque, dataTypeNode) = getNodeDataTypes(node, nodeset)
+            if dataTypeNode is not None:
+                if isinstance(node, VariableTypeNode):
+                    table.dataType = dataTypeNode.id
+                else:
+                    table.dataType = dataTypeNodeOpaque.id
+                table.value = describeNodeValue(node, dataTypeNode, nodeset, max_string_length)
+        if table.value is None:
+            code = generateNodeCode_begin(node, nodeset, max_string_length, generate_ns0, parentrefs)
+            if code is None:
+                return None
+            table.begin = code
+            table.value = TableNodeValue()
+            table.references = orderReferences(node.printRefs)
+            return table
+
+    beginArguments = getNodeBeginArguments(node, generate_ns0, parentrefs)
+    if beginArguments is None:
+        return None
+    (table.parent, table.parentRef, table.typeDef) = beginArguments
+    table.references = orderReferences(node.printRefs)
+
+    if isinstance(node, ReferenceTypeNode):
+        if node.isAbstract:
+            table.flags |= NODESET_ISABSTRACT
+        if node.symmetric:
+            table.flags |= NODESET_SYMMETRIC
+        if node.inverseName != "":
+            table.inverseName = node.inverseName
+    elif isinstance(node, ObjectNode):
+        if node.eventNotifier:
+            table.eventNotifier = 1
+    elif isinstance(node, VariableTypeNode):
+        if node.isAbstract:
+            table.flags |= NODESET_ISABSTRACT
+    elif isinstance(node, VariableNode):
+        if node.historizing:
+            table.flags |= NODESET_HISTORIZING
+        table.minimumSamplingInterval = node.minimumSamplingInterval
+        table.accessLevel = node.accessLevel
+        table.userAccessLevel = node.userAccessLevel
+    elif isinstance(node, MethodNode):
+        if node.executable:
+            table.flags |= NODESET_EXECUTABLE
+        if node.userExecutable:
+            table.flags |= NODESET_USEREXECUTABLE
+    elif isinstance(node, ObjectTypeNode) or isinstance(node, DataTypeNode):
+        if node.isAbstract:
+            table.flags |= NODESET_ISABSTRACT
+    elif isinstance(node, ViewNode):
+        if node.containsNoLoops:
+            table.flags |= NODESET_CONTAINSNOLOOPS
+        table.eventNotifier = int(node.eventNotifier)
+    return table
+
+def writeTableNode(table, index, writec, outfilebase, max_string_length):
+    """Writes the value and the begin function the descriptor of the node
+    refers to and returns the descriptor.
+
+    """
+    node = table.node
+    prefix = outfilebase + "_" + str(index)
+    writec("\n/* " + str(node.displayName) + " - " + str(node.id) + " */")
+
+    begin = "NULL"
+    if table.begin is not None:
+        begin = "function_" + prefix + "_begin"
+        writec("static UA_StatusCode " + begin + "(UA_Server *server, UA_UInt16* ns) {")
+        writec(table.begin)
+        writec("return retVal;\n}")
+
+    dataType = "NULL"
+    if table.dataType is not None:
+        dataType = "&dataType_" + prefix
+        writec("static const NodesetNodeId dataType_%s = %s;" % (prefix, generateTableNodeIdCode(table.dataType)))
+
+    value = table.value
+    valueCode = "NULL"
+    valueSize = 0
+    typesArray = "NULL"
+    if value.kind != NODESET_VALUE_NONE:
+        typesArray = value.typesArray
+        if value.values is not None:
+            valueCode = "value_" + prefix
+            valueSize = len(value.values)
+            writec("static const UA_%s %s[%d] = {%s};" % (value.typeName, valueCode, valueSize,
+                                                         ", ".join(value.values)))
+
+    inverseName = "NULL"
+    if table.inverseName is not None:
+        inverseName = generateTableStringCode(table.inverseName, max_string_length)
+
+    return "{UA_NODECLASS_%s, %s, %s, %s, %s,\n %s, %s, \"%s\", %s, \"%s\", %s, %s,\n %d, %d, 0x%02x, %d, %d, %d, %f, %d,\n %s, %d, %s, %s, %d, %s, %d}" % (
+        node.__class__.__name__.upper().replace("NODE", ""),
+        generateTableNodeIdCode(node.id),
+        generateTableNodeIdCode(table.parent),
+        generateTableNodeIdCode(table.parentRef),
+        generateTableNodeIdCode(table.typeDef),
+        str(node.browseName.ns),
+        generateTableStringCode(node.browseName.name, max_string_length),
+        node.displayName.locale,
+        generateTableStringCode(node.displayName.text, max_string_length),
+        node.description.locale,
+        generateTableStringCode(node.description.text, max_string_length),
+        inverseName,
+        node.writeMask, node.userWriteMask, table.flags, table.eventNotifier,
+        table.accessLevel, table.userAccessLevel, table.minimumSamplingInterval, table.valueRank,
+        dataType, value.kind, typesArray, valueCode, valueSize, begin, len(table.references))
+
+def generateReferenceTableCode(reference):
+    return "{%s, %s, %s, %s}" % (generateTableNodeIdCode(reference.source),
+                                 generateTableNodeIdCode(reference.referenceType),
+                                 generateTableNodeIdCode(reference.target),
+                                 "true" if reference.isForward else "false")
+
+def generateNodeTables(nodeset, sorted_nodes, writec, outfilebase, max_string_length, generate_ns0, parentrefs,
+                       profile=False):
+    """Writes the loader and the node and reference tables of the ordered
+    nodes. Returns the code of the main function, which loads the tables. With
+    profiling the reference counts of the nodes are written too.
+
+    """
+    writec(loaderCode)
+
+    # The entries of the tables are written after the code of all nodes
+    with CodeSpool() as nodeEntries:
+        with CodeSpool() as referenceEntries:
+            nodesSize = 0
+            referencesSize = 0
+            profileReferences = []
+            for node in sorted_nodes:
+                # The value is only decoded for the description of its node
+                if isinstance(node, VariableNode):
+                    node.allocateValue(nodeset)
+                table = describeNode(node, nodeset, generate_ns0, parentrefs, max_string_length)
+                if table is None:
+                    writec("\n/* " + str(node.displayName) + " - " + str(node.id) + " */")
+                    writec("/* Ignored. No parent */")
+                    nodeset.hide_node(node.id)
+                else:
+                    entry = writeTableNode(table, nodesSize, writec, outfilebase, max_string_length)
+                    nodeEntries.store((",\n" if nodesSize > 0 else "") + entry)
+                    nodesSize = nodesSize + 1
+                    profileReferences.append(countProfileReferences(node, generate_ns0))
+                    for ref in table.references:
+                        referenceEntries.store((",\n" if referencesSize > 0 else "") + generateReferenceTableCode(ref))
+                        referencesSize = referencesSize + 1
+                if isinstance(node, VariableNode):
+                    node.releaseValue()
+
+            # Arrays of size zero are not allowed in C
+            nodeEntries.store("{UA_NODECLASS_UNSPECIFIED}\n" if nodesSize == 0 else "\n")
+            referenceEntries.store("{{0, 0, NULL}}\n" if referencesSize == 0 else "\n")
+            writec("\nstatic const NodesetNode nodes_%s[%d] = {" % (outfilebase, max(nodesSize, 1)))
+            nodeEntries.writeLines(writec)
+            writec("};")
+            writec("\nstatic const NodesetReference references_%s[%d] = {" % (outfilebase, max(referencesSize, 1)))
+            referenceEntries.writeLines(writec)
+            writec("};")
+            if profile:
+                writeProfileReferences(writec, "profileReferences_" + outfilebase, profileReferences)
+
+    return "retVal |= nodesetLoad(server, ns, nodes_%s, %d, references_%s, %s);" % \
+        (outfilebase, nodesSize, outfilebase, "profileReferences_" + outfilebase if profile else "NULL")
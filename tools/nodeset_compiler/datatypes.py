@@ -21,7 +21,7 @@ import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
-import xml.dom.minidom as dom
+import xml.etree.ElementTree as etree
 
 from constants import *
 from base64 import *
@@ -34,13 +34,15 @@ if sys.version_info[0] >= 3:
         return s
 
 
-def getNextElementNode(xmlvalue):
-    if xmlvalue == None:
-        return None
-    xmlvalue = xmlvalue.nextSibling
-    while not xmlvalue == None and not xmlvalue.nodeType == xmlvalue.ELEMENT_NODE:
-        xmlvalue = xmlvalue.nextSibling
-    return xmlvalue
+def getLocalName(xmlelement):
+    # Strip the "{namespace}" prefix ElementTree adds to qualified tags
+    tag = xmlelement.tag
+    return tag[tag.rfind("}") + 1:]
+
+def getElementsByLocalName(xmlelement, name):
+    # ElementTree version of getElementsByTagName: all descendants, excluding
+    # the element itself, with the given local name in document order
+    return [el for el in xmlelement.iter() if el is not xmlelement and getLocalName(el) == name]
 
 def valueIsInternalType(valueTypeString):
     return valueTypeString.lower() in ['boolean', 'number', 'int32', 'uint32', 'int16', 'uint16',
@@ -49,6 +51,9 @@ def valueIsInternalType(valueTypeString):
                    'diagnosticinfo', 'nodeid', 'guid', 'datetime',
                    'qualifiedname', 'expandednodeid', 'xmlelement', 'integer', 'uinteger']
 
+# Attributes of a new instance of each Value class, see Value.__getstate__()
+_defaultValueStates = {}
+
 class Value(object):
     def __init__(self, xmlelement=None):
         self.value = None
@@ -61,6 +66,17 @@ class Value(object):
         if xmlelement:
             self.parseXML(xmlelement)
 
+    def __getstate__(self):
+        # Only the attributes which differ from a new instance are pickled
+        defaults = _defaultValueStates.get(type(self))
+        if defaults is None:
+            defaults = _defaultValueStates.setdefault(type(self), type(self)().__dict__)
+        return dict((k, v) for k, v in self.__dict__.items() if k not in defaults or defaults[k] != v)
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
     def getValueFieldByAlias(self, fieldname):
         if not isinstance(self.value, list):
             return None
@@ -130,7 +146,7 @@ class Value(object):
         return t
 
     def checkXML(self, xmlvalue):
-        if xmlvalue == None or xmlvalue.nodeType != xmlvalue.ELEMENT_NODE:
+        if xmlvalue is None or not etree.iselement(xmlvalue):
             logger.error("Expected XML Element, but got junk...")
             return
 
@@ -139,25 +155,21 @@ class Value(object):
 
     def parseXMLEncoding(self, xmlvalue, parentDataTypeNode, parent):
         self.checkXML(xmlvalue)
-        if not "value" in xmlvalue.localName.lower():
-            logger.error("Expected <Value> , but found " + xmlvalue.localName + \
+        if not "value" in getLocalName(xmlvalue).lower():
+            logger.error("Expected <Value> , but found " + getLocalName(xmlvalue) + \
                          " instead. Value will not be parsed.")
             return
 
-        if len(xmlvalue.childNodes) == 0:
+        if len(xmlvalue) == 0 and xmlvalue.text is None:
             logger.error("Expected childnodes for value, but none were found...")
             return
 
-        for n in xmlvalue.childNodes:
-            if n.nodeType == n.ELEMENT_NODE:
-                xmlvalue = n
-                break
+        if len(xmlvalue) > 0:
+            xmlvalue = xmlvalue[0]
 
-        if "ListOf" in xmlvalue.localName:
+        if "ListOf" in getLocalName(xmlvalue):
             self.value = []
-            for el in xmlvalue.childNodes:
-                if not el.nodeType == el.ELEMENT_NODE:
-                    continue
+            for el in xmlvalue:
                 val = self.__parseXMLSingleValue(el, parentDataTypeNode, parent)
                 if val is None:
                     self.value = []
@@ -189,8 +201,8 @@ class Value(object):
             if isinstance(enc[0], six.string_types):
                 # 0: 'BuiltinType'
                 if alias != None:
-                    if not xmlvalue.localName == alias and not xmlvalue.localName == enc[0]:
-                        logger.error(str(parent.id) + ": Expected XML element with tag " + alias + " but found " + xmlvalue.localName + " instead")
+                    if not getLocalName(xmlvalue) == alias and not getLocalName(xmlvalue) == enc[0]:
+                        logger.error(str(parent.id) + ": Expected XML element with tag " + alias + " but found " + getLocalName(xmlvalue) + " instead")
                         return None
                     else:
                         t = self.getTypeByString(enc[0], enc)
@@ -199,8 +211,8 @@ class Value(object):
                         t.valueRank = valueRank
                         return t
                 else:
-                    if not valueIsInternalType(xmlvalue.localName):
-                        logger.error(str(parent.id) + ": Expected XML describing builtin type " + enc[0] + " but found " + xmlvalue.localName + " instead")
+                    if not valueIsInternalType(getLocalName(xmlvalue)):
+                        logger.error(str(parent.id) + ": Expected XML describing builtin type " + enc[0] + " but found " + getLocalName(xmlvalue) + " instead")
                     else:
                         t = self.getTypeByString(enc[0], enc)
                         t.parseXML(xmlvalue)
@@ -230,58 +242,53 @@ class Value(object):
             #        OPCUA Namespace 0 nodeset.
             #        Consider moving this ExtensionObject specific parsing into the
             #        builtin type and only determining the multipart type at this stage.
-            if not xmlvalue.localName == "ExtensionObject":
-                logger.error(str(parent.id) + ": Expected XML tag <ExtensionObject> for multipart type, but found " + xmlvalue.localName + " instead.")
+            if not getLocalName(xmlvalue) == "ExtensionObject":
+                logger.error(str(parent.id) + ": Expected XML tag <ExtensionObject> for multipart type, but found " + getLocalName(xmlvalue) + " instead.")
                 return None
 
             extobj = ExtensionObject()
             extobj.encodingRule = enc
-            etype = xmlvalue.getElementsByTagName("TypeId")
+            etype = getElementsByLocalName(xmlvalue, "TypeId")
             if len(etype) == 0:
                 logger.error(str(parent.id) + ": Did not find <TypeId> for ExtensionObject")
                 return None
-            etype = etype[0].getElementsByTagName("Identifier")
+            etype = getElementsByLocalName(etype[0], "Identifier")
             if len(etype) == 0:
                 logger.error(str(parent.id) + ": Did not find <Identifier> for ExtensionObject")
                 return None
 
-            etype = NodeId(etype[0].firstChild.data.strip(' \t\n\r'))
+            etype = NodeId(etype[0].text.strip(' \t\n\r'))
             extobj.typeId = etype
 
-            ebody = xmlvalue.getElementsByTagName("Body")
+            ebody = getElementsByLocalName(xmlvalue, "Body")
             if len(ebody) == 0:
                 logger.error(str(parent.id) + ": Did not find <Body> for ExtensionObject")
                 return None
             ebody = ebody[0]
 
             # Body must contain an Object of type 'DataType' as defined in Variable
-            ebodypart = ebody.firstChild
-            if not ebodypart.nodeType == ebodypart.ELEMENT_NODE:
-                ebodypart = getNextElementNode(ebodypart)
-            if ebodypart == None:
+            if len(ebody) == 0:
                 logger.error(str(parent.id) + ": Expected ExtensionObject to hold a variable of type " + str(parentDataTypeNode.browseName) + " but found nothing.")
                 return None
+            ebodypart = ebody[0]
 
-            if not ebodypart.localName == parentDataTypeNode.browseName.name:
+            if not getLocalName(ebodypart) == parentDataTypeNode.browseName.name:
                 logger.error(str(parent.id) + ": Expected ExtensionObject to hold a variable of type " + str(parentDataTypeNode.browseName) + " but found " +
-                             str(ebodypart.localName) + " instead.")
+                             str(getLocalName(ebodypart)) + " instead.")
                 return None
-            extobj.alias = ebodypart.localName
+            extobj.alias = getLocalName(ebodypart)
 
-            ebodypart = ebodypart.firstChild
-            if not ebodypart.nodeType == ebodypart.ELEMENT_NODE:
-                ebodypart = getNextElementNode(ebodypart)
-            if ebodypart == None:
+            ebodyparts = list(ebodypart)
+            if len(ebodyparts) == 0:
                 logger.error(str(parent.id) + ": Description of dataType " + str(parentDataTypeNode.browseName) + " in ExtensionObject is empty/invalid.")
                 return None
 
             extobj.value = []
-            for e in enc:
-                if not ebodypart == None:
-                    extobj.value.append(extobj.__parseXMLSingleValue(ebodypart, parentDataTypeNode, parent, alias=None, encodingPart=e))
+            for i, e in enumerate(enc):
+                if i < len(ebodyparts):
+                    extobj.value.append(extobj.__parseXMLSingleValue(ebodyparts[i], parentDataTypeNode, parent, alias=None, encodingPart=e))
                 else:
                     logger.error(str(parent.id) + ": Expected encoding " + str(e) + " but found none in body.")
-                ebodypart = getNextElementNode(ebodypart)
             return extobj
 
     def __str__(self):
@@ -305,10 +312,10 @@ class Boolean(Value):
         # Expect <Boolean>value</Boolean> or
         #        <Aliasname>value</Aliasname>
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             self.value = "false"  # Catch XML <Boolean /> by setting the value to a default
         else:
-            if "false" in unicode(xmlvalue.firstChild.data).lower():
+            if "false" in unicode(xmlvalue.text).lower():
                 self.value = "false"
             else:
                 self.value = "true"
@@ -324,10 +331,10 @@ class Number(Value):
         # Expect <Int16>value</Int16> or any other valid number type, or
         #        <Aliasname>value</Aliasname>
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             self.value = 0  # Catch XML <Int16 /> by setting the value to a default
         else:
-            self.value = int(unicode(xmlvalue.firstChild.data))
+            self.value = int(unicode(xmlvalue.text))
 
 class Integer(Number):
     def __init__(self, xmlelement=None):
@@ -410,10 +417,10 @@ class Float(Number):
         # Expect <Float>value</Float> or
         #        <Aliasname>value</Aliasname>
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             self.value = 0.0  # Catch XML <Float /> by setting the value to a default
         else:
-            self.value = float(unicode(xmlvalue.firstChild.data))
+            self.value = float(unicode(xmlvalue.text))
 
 class Double(Float):
     def __init__(self, xmlelement=None):
@@ -437,14 +444,14 @@ class String(Value):
     def parseXML(self, xmlvalue):
         # Expect <String>value</String> or
         #        <Aliasname>value</Aliasname>
-        if not isinstance(xmlvalue, dom.Element):
+        if not etree.iselement(xmlvalue):
             self.value = xmlvalue
             return
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             self.value = ""  # Catch XML <String /> by setting the value to a default
         else:
-            self.value = unicode(xmlvalue.firstChild.data)
+            self.value = unicode(xmlvalue.text)
 
 class XmlElement(String):
     def __init__(self, xmlelement=None):
@@ -458,14 +465,14 @@ class ByteString(Value):
 
     def parseXML(self, xmlvalue):
         # Expect <ByteString>value</ByteString>
-        if not isinstance(xmlvalue, dom.Element):
+        if not etree.iselement(xmlvalue):
             self.value = xmlvalue
             return
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             self.value = []  # Catch XML <ByteString /> by setting the value to a default
         else:
-            self.value = b64decode(xmlvalue.firstChild.data).decode("utf-8")
+            self.value = b64decode(xmlvalue.text).decode("utf-8")
 
 class ExtensionObject(Value):
     def __init__(self, xmlelement=None):
@@ -494,16 +501,16 @@ class LocalizedText(Value):
         #          <Locale>xx_XX</Locale>
         #          <Text>TextText</Text>
         #        <LocalizedText> or </AliasName>
-        if not isinstance(xmlvalue, dom.Element):
+        if not etree.iselement(xmlvalue):
             self.text = xmlvalue
             return
         self.checkXML(xmlvalue)
-        tmp = xmlvalue.getElementsByTagName("Locale")
-        if len(tmp) > 0 and tmp[0].firstChild != None:
-            self.locale = tmp[0].firstChild.data.strip(' \t\n\r')
-        tmp = xmlvalue.getElementsByTagName("Text")
-        if len(tmp) > 0 and tmp[0].firstChild != None:
-            self.text = tmp[0].firstChild.data.strip(' \t\n\r')
+        tmp = getElementsByLocalName(xmlvalue, "Locale")
+        if len(tmp) > 0 and tmp[0].text is not None:
+            self.locale = tmp[0].text.strip(' \t\n\r')
+        tmp = getElementsByLocalName(xmlvalue, "Text")
+        if len(tmp) > 0 and tmp[0].text is not None:
+            self.text = tmp[0].text.strip(' \t\n\r')
 
     def __str__(self):
         if self.locale is not None and len(self.locale) > 0:
@@ -511,46 +518,107 @@ class LocalizedText(Value):
         else:
             return self.text
 
+# Shared NodeId instances, see internNodeId()
+_internedNodeIds = {}
+_internedIdStrings = {}
+
+def internNodeId(idstring):
+    """ Returns the shared NodeId for idstring. Each id string is only parsed
+        once and all identical NodeIds created through this function or
+        NodeId.withNamespace() are the same object.
+    """
+    nodeId = _internedIdStrings.get(idstring)
+    if nodeId is None:
+        nodeId = NodeId(idstring)
+        nodeId = _internedNodeIds.setdefault(nodeId, nodeId)
+        _internedIdStrings[idstring] = nodeId
+    return nodeId
+
 class NodeId(Value):
+    """ NodeIds are immutable. The identifier is set by the constructor (or when
+        a NodeId value is parsed from XML) and the hash is computed once from
+        the tuple (namespace, identifier type, identifier). Use withNamespace()
+        to get the same identifier in a different namespace.
+    """
+    __identifierFields = ("ns", "i", "b", "g", "s")
+
     def __init__(self, idstring=None):
         Value.__init__(self)
         self.numericRepresentation = BUILTINTYPE_TYPEID_NODEID
-        self.i = None
-        self.b = None
-        self.g = None
-        self.s = None
-        self.ns = 0
-        self.setFromIdString(idstring)
+        self.__setFromIdString(idstring)
+
+    def __setattr__(self, name, value):
+        if name in NodeId.__identifierFields:
+            raise AttributeError("NodeId " + str(self) + " is immutable, cannot set " + name)
+        Value.__setattr__(self, name, value)
+
+    def __setIdentifier(self, ns, i=None, b=None, g=None, s=None):
+        object.__setattr__(self, "ns", ns)
+        object.__setattr__(self, "i", i)
+        object.__setattr__(self, "b", b)
+        object.__setattr__(self, "g", g)
+        object.__setattr__(self, "s", s)
+        # Same order of preference as the string representation
+        if i is not None:
+            key = (ns, "i", i)
+        elif g is not None:
+            key = (ns, "g", g)
+        elif b is not None:
+            key = (ns, "b", b)
+        else:
+            key = (ns, "s", s)
+        object.__setattr__(self, "_NodeId__key", key)
+        object.__setattr__(self, "_NodeId__hash", hash(key))
+        object.__setattr__(self, "_NodeId__str", None)
+
+    def __getstate__(self):
+        # The cached hash depends on the string hash seed of the process, so it
+        # is recomputed when the NodeId is unpickled
+        state = Value.__getstate__(self)
+        for name in ("_NodeId__key", "_NodeId__hash", "_NodeId__str"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        Value.__setstate__(self, state)
+        self.__setIdentifier(self.ns, self.i, self.b, self.g, self.s)
 
-    def setFromIdString(self, idstring):
+    def __setFromIdString(self, idstring):
 
         if not idstring:
-            self.i = 0
+            self.__setIdentifier(0, i=0)
             return
 
         # The ID will encoding itself appropriatly as string. If multiple ID's
         # (numeric, string, guid) are defined, the order of preference for the ID
         # string is always numeric, guid, bytestring, string. Binary encoding only
         # applies to numeric values (UInt16).
+        ns = 0
+        i = b = g = s = None
         idparts = idstring.strip().split(";")
         for p in idparts:
             if p[:2] == "ns":
-                self.ns = int(p[3:])
+                ns = int(p[3:])
             elif p[:2] == "i=":
-                self.i = int(p[2:])
+                i = int(p[2:])
             elif p[:2] == "o=":
-                self.b = p[2:]
+                b = p[2:]
             elif p[:2] == "g=":
-                tmp = []
-                self.g = p[2:].split("-")
-                for i in self.g:
-                    i = "0x" + i
-                    tmp.append(int(i, 16))
-                self.g = tmp
+                g = tuple(int("0x" + part, 16) for part in p[2:].split("-"))
             elif p[:2] == "s=":
-                self.s = p[2:]
+                s = p[2:]
             else:
                 raise Exception("no valid nodeid: " + idstring)
+        self.__setIdentifier(ns, i, b, g, s)
+
+    def withNamespace(self, ns):
+        """ Returns the NodeId with the same identifier in namespace ns.
+        """
+        if ns == self.ns:
+            return self
+        nodeId = NodeId()
+        nodeId.__setIdentifier(ns, self.i, self.b, self.g, self.s)
+        return _internedNodeIds.setdefault(nodeId, nodeId)
 
     def parseXML(self, xmlvalue):
         # Expect <NodeId> or <Alias>
@@ -558,31 +626,40 @@ class NodeId(Value):
         #                ns=x;i=y or similar string representation of id()
         #           </Identifier>
         #        </NodeId> or </Alias>
-        if not isinstance(xmlvalue, dom.Element):
+        if not etree.iselement(xmlvalue):
             self.text = xmlvalue
             return
         self.checkXML(xmlvalue)
 
         if self.alias != None:
-            if not self.alias == xmlvalue.localName:
+            if not self.alias == getLocalName(xmlvalue):
                 logger.warn(
-                    "Expected an aliased XML field called " + self.alias + " but got " + xmlvalue.localName + " instead. This is a parsing error of Value.__parseXMLSingleValue(), will try to continue anyway.")
+                    "Expected an aliased XML field called " + self.alias + " but got " + getLocalName(xmlvalue) + " instead. This is a parsing error of Value.__parseXMLSingleValue(), will try to continue anyway.")
         else:
-            if not self.stringRepresentation == xmlvalue.localName:
+            if not self.stringRepresentation == getLocalName(xmlvalue):
                 logger.warn(
-                    "Expected XML field " + self.stringRepresentation + " but got " + xmlvalue.localName + " instead. This is a parsing error of Value.__parseXMLSingleValue(), will try to continue anyway.")
+                    "Expected XML field " + self.stringRepresentation + " but got " + getLocalName(xmlvalue) + " instead. This is a parsing error of Value.__parseXMLSingleValue(), will try to continue anyway.")
+
+        # Check if there is an <Identifier> tag. A compact
+        # <NodeId><Identifier>i=6</Identifier></NodeId> has no text itself.
+        identifiers = getElementsByLocalName(xmlvalue, "Identifier")
+        if len(identifiers) != 0:
+            xmlvalue = identifiers[0]
 
         # Catch XML <NodeId />
-        if xmlvalue.firstChild == None:
+        if len(xmlvalue) == 0 and xmlvalue.text is None:
             logger.error("No value is given, which is illegal for Node Types...")
             self.value = None
         else:
-            # Check if there is an <Identifier> tag
-            if len(xmlvalue.getElementsByTagName("Identifier")) != 0:
-                xmlvalue = xmlvalue.getElementsByTagName("Identifier")[0]
-            self.setFromIdString(unicode(xmlvalue.firstChild.data))
+            self.__setFromIdString(unicode(xmlvalue.text or ""))
 
     def __str__(self):
+        # The identifier is immutable, so the string is only built once
+        if self.__str is None:
+            object.__setattr__(self, "_NodeId__str", self.__formatIdString())
+        return self.__str
+
+    def __formatIdString(self):
         s = "ns=" + str(self.ns) + ";"
         # Order of preference is numeric, guid, bytestring, string
         if self.i != None:
@@ -601,13 +678,16 @@ class NodeId(Value):
             return s + "s=" + str(self.s)
 
     def __eq__(self, nodeId2):
-        return (str(self) == str(nodeId2))
+        return self is nodeId2 or (isinstance(nodeId2, NodeId) and self.__key == nodeId2.__key)
+
+    def __ne__(self, nodeId2):
+        return not self.__eq__(nodeId2)
 
     def __repr__(self):
         return str(self)
 
     def __hash__(self):
-        return hash(str(self))
+        return self.__hash
 
 class ExpandedNodeId(Value):
     def __init__(self, xmlelement=None):
@@ -632,11 +712,11 @@ class DateTime(Value):
         #        2013-08-13T21:00:05.0000L
         #        </DateTime> or </AliasName>
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             # Catch XML <DateTime /> by setting the value to a default
             self.value = datetime(2001, 1, 1)
         else:
-            timestr = unicode(xmlvalue.firstChild.data)
+            timestr = unicode(xmlvalue.text)
             # .NET tends to create this garbage %Y-%m-%dT%H:%M:%S.0000z
             # strip everything after the "." away for a posix time_struct
             if "." in timestr:
@@ -668,7 +748,7 @@ class QualifiedName(Value):
         #           <NamespaceIndex>Int16<NamespaceIndex>
         #           <Name>SomeString<Name>
         #        </QualifiedName> or </AliasName>
-        if not isinstance(xmlvalue, dom.Element):
+        if not etree.iselement(xmlvalue):
             colonindex = xmlvalue.find(":")
             if colonindex == -1:
                 self.name = xmlvalue
@@ -679,10 +759,10 @@ class QualifiedName(Value):
 
         self.checkXML(xmlvalue)
         # Is a namespace index passed?
-        if len(xmlvalue.getElementsByTagName("NamespaceIndex")) != 0:
-            self.ns = int(xmlvalue.getElementsByTagName("NamespaceIndex")[0].firstChild.data)
-        if len(xmlvalue.getElementsByTagName("Name")) != 0:
-            self.name = xmlvalue.getElementsByTagName("Name")[0].firstChild.data
+        if len(getElementsByLocalName(xmlvalue, "NamespaceIndex")) != 0:
+            self.ns = int(getElementsByLocalName(xmlvalue, "NamespaceIndex")[0].text)
+        if len(getElementsByLocalName(xmlvalue, "Name")) != 0:
+            self.name = getElementsByLocalName(xmlvalue, "Name")[0].text
 
     def __str__(self):
         return "ns=" + str(self.ns) + ";" + str(self.name)
@@ -712,10 +792,10 @@ class Guid(Value):
 
     def parseXML(self, xmlvalue):
         self.checkXML(xmlvalue)
-        if xmlvalue.firstChild == None:
+        if xmlvalue.text is None:
             self.value = [0, 0, 0, 0]  # Catch XML <Guid /> by setting the value to a default
         else:
-            self.value = unicode(xmlvalue.firstChild.data)
+            self.value = unicode(xmlvalue.text)
             self.value = self.value.replace("{", "")
             self.value = self.value.replace("}", "")
             self.value = self.value.split("-")
@@ -725,10 +805,10 @@ class Guid(Value):
                     tmp.append(int("0x" + g, 16))
                 except:
                     logger.error("Invalid formatting of Guid. Expected {01234567-89AB-CDEF-ABCD-0123456789AB}, got " + \
-                                 unicode(xmlvalue.firstChild.data))
+                                 unicode(xmlvalue.text))
                     tmp = [0, 0, 0, 0, 0]
             if len(tmp) != 5:
                 logger.error("Invalid formatting of Guid. Expected {01234567-89AB-CDEF-ABCD-0123456789AB}, got " + \
-                             unicode(xmlvalue.firstChild.data))
+                             unicode(xmlvalue.text))
                 tmp = [0, 0, 0, 0]
             self.value = tmp
@@ -28,8 +28,19 @@ if sys.version_info[0] >= 3:
     def unicode(s):
         return s
 
+# Shared defaults of the node attributes. A node only creates its own objects
+# for the attributes defined in the XML, so these must never be modified.
+_defaultNodeId = NodeId()
+_defaultQualifiedName = QualifiedName()
+_defaultLocalizedText = LocalizedText()
+_defaultString = String()
+
 class Reference(object):
     # all either nodeids or strings with an alias
+    # The hash is computed once from source, type, target and direction, so
+    # these must not be changed. Use replace() to get a modified reference.
+    __slots__ = ("source", "referenceType", "target", "isForward", "hidden", "inferred", "__hash")
+
     def __init__(self, source, referenceType, target, isForward=True, hidden=False, inferred=False):
         self.source = source
         self.referenceType = referenceType
@@ -37,6 +48,21 @@ class Reference(object):
         self.isForward = isForward
         self.hidden = hidden  # the reference is part of a nodeset that already exists
         self.inferred = inferred
+        self.__hash = hash((source, referenceType, target, isForward))
+
+    def __getstate__(self):
+        return (self.source, self.referenceType, self.target, self.isForward, self.hidden, self.inferred)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def replace(self, source, referenceType, target):
+        """ Returns the reference with the given source, type and target. The
+            reference itself is returned if nothing changes.
+        """
+        if source is self.source and referenceType is self.referenceType and target is self.target:
+            return self
+        return Reference(source, referenceType, target, self.isForward, self.hidden, self.inferred)
 
     def __str__(self):
         retval = str(self.source)
@@ -51,19 +77,33 @@ class Reference(object):
         return str(self)
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if self is other:
+            return True
+        if not isinstance(other, Reference) or self.__hash != other.__hash:
+            return False
+        return self.isForward == other.isForward and self.source == other.source and \
+            self.target == other.target and self.referenceType == other.referenceType
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(str(self))
+        return self.__hash
 
 class Node(object):
+    # Nodes use slots to keep large nodesets small, attributes which are not
+    # listed here cannot be added to a node
+    __slots__ = ("id", "browseName", "displayName", "description", "symbolicName", "writeMask",
+                 "userWriteMask", "eventNotifier", "references", "inverseReferences", "hidden",
+                 "modelUri", "typesArray", "printRefs")
+    nodeClass = NODE_CLASS_GENERERIC
+
     def __init__(self):
-        self.id = NodeId()
-        self.nodeClass = NODE_CLASS_GENERERIC
-        self.browseName = QualifiedName()
-        self.displayName = LocalizedText()
-        self.description = LocalizedText()
-        self.symbolicName = String()
+        self.id = _defaultNodeId
+        self.browseName = _defaultQualifiedName
+        self.displayName = _defaultLocalizedText
+        self.description = _defaultLocalizedText
+        self.symbolicName = _defaultString
         self.writeMask = 0
         self.userWriteMask = 0
         self.references = set()
@@ -82,10 +122,10 @@ class Node(object):
 
     def parseXML(self, xmlelement):
         for idname in ['NodeId', 'NodeID', 'nodeid']:
-            if xmlelement.hasAttribute(idname):
-                self.id = NodeId(xmlelement.getAttribute(idname))
+            if xmlelement.get(idname) is not None:
+                self.id = internNodeId(xmlelement.get(idname))
 
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "BrowseName":
                 self.browseName = QualifiedName(av)
             elif at == "DisplayName":
@@ -101,35 +141,33 @@ class Node(object):
             elif at == "SymbolicName":
                 self.symbolicName = String(av)
 
-        for x in xmlelement.childNodes:
-            if x.nodeType != x.ELEMENT_NODE:
+        for x in xmlelement:
+            localName = getLocalName(x)
+            if localName == "References":
+                self.parseXMLReferences(x)
+            elif x.text is None:
                 continue
-            if x.firstChild:
-                if x.localName == "BrowseName":
-                    self.browseName = QualifiedName(x.firstChild.data)
-                elif x.localName == "DisplayName":
-                    self.displayName = LocalizedText(x.firstChild.data)
-                elif x.localName == "Description":
-                    self.description = LocalizedText(x.firstChild.data)
-                elif x.localName == "WriteMask":
-                    self.writeMask = int(unicode(x.firstChild.data))
-                elif x.localName == "UserWriteMask":
-                    self.userWriteMask = int(unicode(x.firstChild.data))
-                if x.localName == "References":
-                    self.parseXMLReferences(x)
+            elif localName == "BrowseName":
+                self.browseName = QualifiedName(x.text)
+            elif localName == "DisplayName":
+                self.displayName = LocalizedText(x.text)
+            elif localName == "Description":
+                self.description = LocalizedText(x.text)
+            elif localName == "WriteMask":
+                self.writeMask = int(unicode(x.text))
+            elif localName == "UserWriteMask":
+                self.userWriteMask = int(unicode(x.text))
 
     def parseXMLReferences(self, xmlelement):
-        for ref in xmlelement.childNodes:
-            if ref.nodeType != ref.ELEMENT_NODE:
-                continue
-            source = NodeId(str(self.id))  # deep-copy of the nodeid
-            target = NodeId(ref.firstChild.data)
+        for ref in xmlelement:
+            source = self.id
+            target = internNodeId(ref.text)
             reftype = None
             forward = True
-            for (at, av) in ref.attributes.items():
+            for (at, av) in ref.attrib.items():
                 if at == "ReferenceType":
                     if '=' in av:
-                        reftype = NodeId(av)
+                        reftype = internNodeId(av)
                     else:
                         reftype = av  # alias, such as "HasSubType"
                 elif at == "IsForward":
@@ -140,63 +178,56 @@ class Node(object):
                 self.inverseReferences.add(Reference(source, reftype, target, forward))
 
     def replaceAliases(self, aliases):
-        if str(self.id) in aliases:
-            self.id = NodeId(aliases[self.id])
-        new_refs = set()
-        for ref in self.references:
-            if str(ref.source) in aliases:
-                ref.source = NodeId(aliases[ref.source])
-            if str(ref.target) in aliases:
-                ref.target = NodeId(aliases[ref.target])
-            if str(ref.referenceType) in aliases:
-                ref.referenceType = NodeId(aliases[ref.referenceType])
-            new_refs.add(ref)
-        self.references = new_refs
-        new_inv_refs = set()
-        for ref in self.inverseReferences:
-            if str(ref.source) in aliases:
-                ref.source = NodeId(aliases[ref.source])
-            if str(ref.target) in aliases:
-                ref.target = NodeId(aliases[ref.target])
-            if str(ref.referenceType) in aliases:
-                ref.referenceType = NodeId(aliases[ref.referenceType])
-            new_inv_refs.add(ref)
-        self.inverseReferences = new_inv_refs
+        def resolve(nodeId):
+            if str(nodeId) in aliases:
+                return internNodeId(aliases[str(nodeId)])
+            return nodeId
+
+        self.id = resolve(self.id)
+        self.replaceReferences(resolve)
 
     def replaceNamespaces(self, nsMapping):
-        self.id.ns = nsMapping[self.id.ns]
-        self.browseName.ns = nsMapping[self.browseName.ns]
+        def resolve(nodeId):
+            return nodeId.withNamespace(nsMapping[nodeId.ns])
+
+        self.id = resolve(self.id)
+        # The namespace 0 is never mapped, so the shared default is not modified
+        if nsMapping[self.browseName.ns] != self.browseName.ns:
+            self.browseName.ns = nsMapping[self.browseName.ns]
         if hasattr(self, 'dataType') and isinstance(self.dataType, NodeId):
-            self.dataType.ns = nsMapping[self.dataType.ns]
-
-        new_refs = set()
-        for ref in self.references:
-            ref.source.ns = nsMapping[ref.source.ns]
-            ref.target.ns = nsMapping[ref.target.ns]
-            ref.referenceType.ns = nsMapping[ref.referenceType.ns]
-            new_refs.add(ref)
-        self.references = new_refs
-        new_inv_refs = set()
-        for ref in self.inverseReferences:
-            ref.source.ns = nsMapping[ref.source.ns]
-            ref.target.ns = nsMapping[ref.target.ns]
-            ref.referenceType.ns = nsMapping[ref.referenceType.ns]
-            new_inv_refs.add(ref)
-        self.inverseReferences = new_inv_refs
+            self.dataType = resolve(self.dataType)
+        self.replaceReferences(resolve)
+
+    def replaceReferences(self, resolve):
+        """ Apply resolve to the NodeIds of all references. The reference sets
+            are only rebuilt if a reference was actually changed.
+        """
+        def rebuild(refs):
+            replaced = [ref.replace(resolve(ref.source), resolve(ref.referenceType), resolve(ref.target))
+                        for ref in refs]
+            for ref, new in zip(refs, replaced):
+                if ref is not new:
+                    return set(replaced)
+            return refs
+
+        self.references = rebuild(self.references)
+        self.inverseReferences = rebuild(self.inverseReferences)
 
 class ReferenceTypeNode(Node):
+    __slots__ = ("isAbstract", "symmetric", "inverseName")
+    nodeClass = NODE_CLASS_REFERENCETYPE
+
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_REFERENCETYPE
         self.isAbstract = False
         self.symmetric = False
         self.inverseName = ""
-        if xmlelement:
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "Symmetric":
                 self.symmetric = "false" not in av.lower()
             elif at == "InverseName":
@@ -204,30 +235,34 @@ class ReferenceTypeNode(Node):
             elif at == "IsAbstract":
                 self.isAbstract = "false" not in av.lower()
 
-        for x in xmlelement.childNodes:
-            if x.nodeType == x.ELEMENT_NODE:
-                if x.localName == "InverseName" and x.firstChild:
-                    self.inverseName = str(unicode(x.firstChild.data))
+        for x in xmlelement:
+            if getLocalName(x) == "InverseName" and x.text is not None:
+                self.inverseName = str(unicode(x.text))
 
 class ObjectNode(Node):
+    __slots__ = ()
+    nodeClass = NODE_CLASS_OBJECT
+
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_OBJECT
         self.eventNotifier = 0
-        if xmlelement:
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "EventNotifier":
                 self.eventNotifier = int(av)
 
 class VariableNode(Node):
+    __slots__ = ("dataType", "valueRank", "arrayDimensions", "accessLevel", "userAccessLevel",
+                 "minimumSamplingInterval", "historizing", "value", "xmlValueDef")
+    nodeClass = NODE_CLASS_VARIABLE
+
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_VARIABLE
-        self.dataType = NodeId()
+        self.dataType = _defaultNodeId
         self.valueRank = -2
         self.arrayDimensions = []
         # Set access levels to read by default
@@ -237,12 +272,12 @@ class VariableNode(Node):
         self.historizing = False
         self.value = None
         self.xmlValueDef = None
-        if xmlelement:
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "ValueRank":
                 self.valueRank = int(av)
             elif at == "AccessLevel":
@@ -253,29 +288,29 @@ class VariableNode(Node):
                 self.minimumSamplingInterval = float(av)
             elif at == "DataType":
                 if "=" in av:
-                    self.dataType = NodeId(av)
+                    self.dataType = internNodeId(av)
                 else:
                     self.dataType = av
 
-        for x in xmlelement.childNodes:
-            if x.nodeType != x.ELEMENT_NODE:
-                continue
-            if x.localName == "Value":
-                self.xmlValueDef = x
-            elif x.localName == "DataType":
-                self.dataType = NodeId(str(x))
-            elif x.localName == "ValueRank":
-                self.valueRank = int(unicode(x.firstChild.data))
-            elif x.localName == "ArrayDimensions":
-                self.arrayDimensions = int(unicode(x.firstChild.data))
-            elif x.localName == "AccessLevel":
-                self.accessLevel = int(unicode(x.firstChild.data))
-            elif x.localName == "UserAccessLevel":
-                self.userAccessLevel = int(unicode(x.firstChild.data))
-            elif x.localName == "MinimumSamplingInterval":
-                self.minimumSamplingInterval = float(unicode(x.firstChild.data))
-            elif x.localName == "Historizing":
-                self.historizing = "false" not in x.lower()
+        for x in xmlelement:
+            localName = getLocalName(x)
+            if localName == "Value":
+                # Only the XML text is kept, it is parsed by allocateValue()
+                self.xmlValueDef = etree.tostring(x)
+            elif localName == "DataType":
+                self.dataType = internNodeId(unicode(x.text))
+            elif localName == "ValueRank":
+                self.valueRank = int(unicode(x.text))
+            elif localName == "ArrayDimensions":
+                self.arrayDimensions = int(unicode(x.text))
+            elif localName == "AccessLevel":
+                self.accessLevel = int(unicode(x.text))
+            elif localName == "UserAccessLevel":
+                self.userAccessLevel = int(unicode(x.text))
+            elif localName == "MinimumSamplingInterval":
+                self.minimumSamplingInterval = float(unicode(x.text))
+            elif localName == "Historizing":
+                self.historizing = "false" not in x.text.lower()
 
     def allocateValue(self, nodeset):
         dataTypeNode = nodeset.getDataTypeNode(self.dataType)
@@ -288,7 +323,7 @@ class VariableNode(Node):
             return False
 
         self.value = Value()
-        self.value.parseXMLEncoding(self.xmlValueDef, dataTypeNode, self)
+        self.value.parseXMLEncoding(etree.fromstring(self.xmlValueDef), dataTypeNode, self)
 
         # Array Dimensions must accurately represent the value and will be patched
         # reflect the exaxt dimensions attached binary stream.
@@ -299,34 +334,45 @@ class VariableNode(Node):
             self.arrayDimensions = [len(self.value.value)]
         return True
 
+    def releaseValue(self):
+        """ Frees the value and its XML definition once the code of the node
+            was generated.
+        """
+        self.value = None
+        self.xmlValueDef = None
+
 
 class VariableTypeNode(VariableNode):
+    __slots__ = ("isAbstract",)
+    nodeClass = NODE_CLASS_VARIABLETYPE
+
     def __init__(self, xmlelement=None):
         VariableNode.__init__(self)
-        self.nodeClass = NODE_CLASS_VARIABLETYPE
         self.isAbstract = False
-        if xmlelement:
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "IsAbstract":
                 self.isAbstract = "false" not in av.lower()
 
 class MethodNode(Node):
+    __slots__ = ("executable", "userExecutable", "methodDeclaration")
+    nodeClass = NODE_CLASS_METHOD
+
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_METHOD
         self.executable = True
         self.userExecutable = True
-        self.methodDecalaration = None
-        if xmlelement:
+        self.methodDeclaration = None
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "Executable":
                 self.executable = "false" not in av.lower()
             if at == "UserExecutable":
@@ -335,16 +381,18 @@ class MethodNode(Node):
                 self.methodDeclaration = str(av)
 
 class ObjectTypeNode(Node):
+    __slots__ = ("isAbstract",)
+    nodeClass = NODE_CLASS_OBJECTTYPE
+
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_OBJECTTYPE
         self.isAbstract = False
-        if xmlelement:
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "IsAbstract":
                 self.isAbstract = "false" not in av.lower()
 
@@ -373,16 +421,12 @@ class DataTypeNode(Node):
 
         If encodable, the encoding can be retrieved using getEncoding().
     """
-    __isEnum__     = False
-    __xmlDefinition__ = None
-    __baseTypeEncoding__ = []
-    __encodable__ = False
-    __encodingBuilt__ = False
-    __definition__ = []
+    __slots__ = ("isAbstract", "__isEnum__", "__xmlDefinition__", "__baseTypeEncoding__", "__encodable__",
+                 "__encodingBuilt__", "__definition__")
+    nodeClass = NODE_CLASS_DATATYPE
 
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_DATATYPE
         self.isAbstract = False
         self.__xmlDefinition__ = None
         self.__baseTypeEncoding__ = []
@@ -390,19 +434,18 @@ class DataTypeNode(Node):
         self.__encodingBuilt__ = False
         self.__definition__ = []
         self.__isEnum__     = False
-        if xmlelement:
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "IsAbstract":
                 self.isAbstract = "false" not in av.lower()
 
-        for x in xmlelement.childNodes:
-            if x.nodeType == x.ELEMENT_NODE:
-                if x.localName == "Definition":
-                    self.__xmlDefinition__ = x
+        for x in xmlelement:
+            if getLocalName(x) == "Definition":
+                self.__xmlDefinition__ = x
 
     def isEncodable(self):
         """ Will return True if buildEncoding() was able to determine which builtin
@@ -528,62 +571,61 @@ class DataTypeNode(Node):
         typeDict = []
 
         # An XML Definition is provided and will be parsed... now
-        for x in self.__xmlDefinition__.childNodes:
-            if x.nodeType == x.ELEMENT_NODE:
-                fname  = ""
-                fdtype = ""
-                enumVal = ""
-                valueRank = None
-                for at,av in x.attributes.items():
-                    if at == "DataType":
-                        fdtype = str(av)
-                        if fdtype in nodeset.aliases:
-                            fdtype = nodeset.aliases[fdtype]
-                        isEnum = False
-                    elif at == "Name":
-                        fname = str(av)
-                    elif at == "Value":
-                        enumVal = int(av)
-                        isSubType = False
-                    elif at == "ValueRank":
-                        valueRank = int(av)
-                    else:
-                        logger.warn("Unknown Field Attribute " + str(at))
-                # This can either be an enumeration OR a structure, not both.
-                # Figure out which of the dictionaries gets the newly read value pair
-                if isEnum == isSubType:
-                    # This is an error
-                    logger.warn("DataType contains both enumeration and subtype (or neither)")
+        for x in self.__xmlDefinition__:
+            fname  = ""
+            fdtype = ""
+            enumVal = ""
+            valueRank = None
+            for at,av in x.attrib.items():
+                if at == "DataType":
+                    fdtype = str(av)
+                    if fdtype in nodeset.aliases:
+                        fdtype = nodeset.aliases[fdtype]
+                    isEnum = False
+                elif at == "Name":
+                    fname = str(av)
+                elif at == "Value":
+                    enumVal = int(av)
+                    isSubType = False
+                elif at == "ValueRank":
+                    valueRank = int(av)
+                else:
+                    logger.warn("Unknown Field Attribute " + str(at))
+            # This can either be an enumeration OR a structure, not both.
+            # Figure out which of the dictionaries gets the newly read value pair
+            if isEnum == isSubType:
+                # This is an error
+                logger.warn("DataType contains both enumeration and subtype (or neither)")
+                self.__encodable__ = False
+                break
+            elif isEnum:
+                # This is an enumeration
+                enumDict.append((fname, enumVal))
+                continue
+            else:
+                if fdtype == "":
+                    # If no datatype given use base datatype
+                    fdtype = "i=24"
+
+                # This might be a subtype... follow the node defined as datatype to find out
+                # what encoding to use
+                fdTypeNodeId = internNodeId(fdtype)
+                fdTypeNodeId = fdTypeNodeId.withNamespace(nodeset.namespaceMapping[self.modelUri][fdTypeNodeId.ns])
+                if not fdTypeNodeId in nodeset.nodes:
+                    raise Exception("Node {} not found in nodeset".format(fdTypeNodeId))
+                dtnode = nodeset.nodes[fdTypeNodeId]
+                # The node in the datatype element was found. we inherit its encoding,
+                # but must still ensure that the dtnode is itself validly encodable
+                typeDict.append([fname, dtnode])
+                fdtype = str(dtnode.browseName.name)
+                logger.debug( prefix + fname + " : " + fdtype + " -> " + str(dtnode.id))
+                subenc = dtnode.buildEncoding(nodeset=nodeset, indent=indent+1)
+                self.__baseTypeEncoding__ = self.__baseTypeEncoding__ + [[fname, subenc, valueRank]]
+                if not dtnode.isEncodable():
+                    # If we inherit an encoding from an unencodable not, this node is
+                    # also not encodable
                     self.__encodable__ = False
                     break
-                elif isEnum:
-                    # This is an enumeration
-                    enumDict.append((fname, enumVal))
-                    continue
-                else:
-                    if fdtype == "":
-                        # If no datatype given use base datatype
-                        fdtype = "i=24"
-
-                    # This might be a subtype... follow the node defined as datatype to find out
-                    # what encoding to use
-                    fdTypeNodeId = NodeId(fdtype)
-                    fdTypeNodeId.ns = nodeset.namespaceMapping[self.modelUri][fdTypeNodeId.ns]
-                    if not fdTypeNodeId in nodeset.nodes:
-                        raise Exception("Node {} not found in nodeset".format(fdTypeNodeId))
-                    dtnode = nodeset.nodes[fdTypeNodeId]
-                    # The node in the datatype element was found. we inherit its encoding,
-                    # but must still ensure that the dtnode is itself validly encodable
-                    typeDict.append([fname, dtnode])
-                    fdtype = str(dtnode.browseName.name)
-                    logger.debug( prefix + fname + " : " + fdtype + " -> " + str(dtnode.id))
-                    subenc = dtnode.buildEncoding(nodeset=nodeset, indent=indent+1)
-                    self.__baseTypeEncoding__ = self.__baseTypeEncoding__ + [[fname, subenc, valueRank]]
-                    if not dtnode.isEncodable():
-                        # If we inherit an encoding from an unencodable not, this node is
-                        # also not encodable
-                        self.__encodable__ = False
-                        break
 
         # If we used inheritance to determine an encoding without alias, there is a
         # the possibility that lists got double-nested despite of only one element
@@ -610,17 +652,19 @@ class DataTypeNode(Node):
         return self.__baseTypeEncoding__
 
 class ViewNode(Node):
+    __slots__ = ("containsNoLoops",)
+    nodeClass = NODE_CLASS_VIEW
+
     def __init__(self, xmlelement=None):
         Node.__init__(self)
-        self.nodeClass = NODE_CLASS_VIEW
-        self.containsNoLoops == False
-        self.eventNotifier == False
-        if xmlelement:
+        self.containsNoLoops = False
+        self.eventNotifier = False
+        if xmlelement is not None:
             self.parseXML(xmlelement)
 
     def parseXML(self, xmlelement):
         Node.parseXML(self, xmlelement)
-        for (at, av) in xmlelement.attributes.items():
+        for (at, av) in xmlelement.attrib.items():
             if at == "ContainsNoLoops":
                 self.containsNoLoops = "false" not in av.lower()
             if at == "eventNotifier":
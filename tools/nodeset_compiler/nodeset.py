@@ -18,79 +18,98 @@
 
 from __future__ import print_function
 import sys
-import xml.dom.minidom as dom
+import gc
+import multiprocessing
+try:
+    import xml.etree.cElementTree as etree
+except ImportError:
+    import xml.etree.ElementTree as etree
 from struct import pack as structpack
 from time import struct_time, strftime, strptime, mktime
 import logging
-import codecs
-import re
 
 logger = logging.getLogger(__name__)
 
 from nodes import *
 from opaque_type_mapping import opaque_type_mapping
-import codecs
 
 ####################
 # Helper Functions #
 ####################
 
+def parseNodeSetFile(filename, hidden=False):
+    """ Parses the nodeset file with the given name, see NodeSet.parseNodeSet().
+        This is the task of the worker processes of parseNodeSetFiles().
+    """
+    with open(filename, "rb") as xmlfile:
+        return NodeSet().parseNodeSet(xmlfile, hidden)
+
+def _parseNodeSetFileTask(task):
+    return parseNodeSetFile(*task)
+
+def parseNodeSetFiles(tasks, jobs):
+    """ Parses the nodeset files given as list of (filename, hidden) tuples in
+        up to jobs worker processes. Returns the batches in the order of the
+        tasks. The files are parsed in this process if there is only one job or
+        the platform cannot fork the workers.
+    """
+    # The batches hold no reference cycles. Without the garbage collector
+    # passes over the growing number of objects, the unpickling of the batches
+    # is several times faster. The forked workers inherit the disabled collector.
+    gcEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _parseNodeSetFiles(tasks, jobs)
+    finally:
+        if gcEnabled:
+            gc.enable()
+
+def _parseNodeSetFiles(tasks, jobs):
+    pool = None
+    if jobs > 1 and len(tasks) > 1:
+        # Spawned workers would import and run nodeset_compiler.py again
+        try:
+            context = multiprocessing.get_context("fork")
+        except AttributeError:
+            # Python 2 forks the workers on all platforms but Windows
+            context = multiprocessing if sys.platform != "win32" else None
+        except ValueError:
+            context = None
+        if context is None:
+            logger.warn("Cannot fork worker processes, parsing the nodesets serially")
+        else:
+            pool = context.Pool(min(jobs, len(tasks)))
+    if pool is None:
+        return [parseNodeSetFile(*task) for task in tasks]
+    try:
+        return pool.map(_parseNodeSetFileTask, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
 hassubtype = NodeId("ns=0;i=45")
 
 def getSubTypesOf(nodeset, node, skipNodes=[]):
     if node in skipNodes:
         return []
+    if len(skipNodes) == 0:
+        return [nodeset.nodes[i] for i in nodeset.getSubTypeIds(node.id)]
     re = [node]
     for ref in node.references:
         if ref.referenceType == hassubtype and ref.isForward:
-            re = re + getSubTypesOf(nodeset, nodeset.nodes[ref.target], skipNodes=skipNodes)
+            re.extend(getSubTypesOf(nodeset, nodeset.nodes[ref.target], skipNodes=skipNodes))
     return re
 
-def extractNamespaces(xmlfile):
-    # Extract a list of namespaces used. The first namespace is always
-    # "http://opcfoundation.org/UA/". minidom gobbles up
-    # <NamespaceUris></NamespaceUris> elements, without a decent way to reliably
-    # access this dom2 <uri></uri> elements (only attribute xmlns= are accessible
-    # using minidom). We need them for dereferencing though... This function
-    # attempts to do just that.
-
-    namespaces = ["http://opcfoundation.org/UA/"]
-    infile = codecs.open(xmlfile.name, encoding='utf-8')
-    foundURIs = False
-    nsline = ""
-    line = infile.readline()
-    for line in infile:
-        if "<namespaceuris>" in line.lower():
-            foundURIs = True
-        elif "</namespaceuris>" in line.lower():
-            foundURIs = False
-            nsline = nsline + line
-            break
-        if foundURIs:
-            nsline = nsline + line
-
-    if len(nsline) > 0:
-        ns = dom.parseString(nsline).getElementsByTagName("NamespaceUris")
-        for uri in ns[0].childNodes:
-            if uri.nodeType != uri.ELEMENT_NODE:
-                continue
-            if uri.firstChild.data in namespaces:
-                continue
-            namespaces.append(uri.firstChild.data)
-    infile.close()
-    return namespaces
-
 def buildAliasList(xmlelement):
     """Parses the <Alias> XML Element present in must XML NodeSet definitions.
        Contents the Alias element are stored in a dictionary for further
        dereferencing during pointer linkage (see linkOpenPointer())."""
     aliases = {}
-    for al in xmlelement.childNodes:
-        if al.nodeType == al.ELEMENT_NODE:
-            if al.hasAttribute("Alias"):
-                aliasst = al.getAttribute("Alias")
-                aliasnd = unicode(al.firstChild.data)
-                aliases[aliasst] = aliasnd
+    for al in xmlelement:
+        if al.get("Alias") is not None:
+            aliasst = al.get("Alias")
+            aliasnd = unicode(al.text)
+            aliases[aliasst] = aliasnd
     return aliases
 
 class NodeSet(object):
@@ -109,6 +128,15 @@ class NodeSet(object):
         self.aliases = {}
         self.namespaces = ["http://opcfoundation.org/UA/"]
         self.namespaceMapping = {};
+        # Secondary indexes, kept up to date by addNode() and removeNodeById().
+        # The name indexes map a name to the list of nodes with that name, most
+        # names are unique. The class index maps a class to a dict NodeId -> node.
+        self.browseNameIndex = {}
+        self.nodeClassIndex = {}
+        self.symbolicNameIndex = {}
+        # HasSubtype hierarchy of the type nodes, built on first use and
+        # dropped whenever a node is added or removed
+        self.typeHierarchy = None
 
     def sanitize(self):
         for n in self.nodes.values():
@@ -137,20 +165,155 @@ class NodeSet(object):
             m[index] = self.namespaces.index(name)
         return m
 
+    def addNode(self, node):
+        """ Adds the node to the nodeset and its secondary indexes.
+        """
+        if node.id in self.nodes:
+            raise Exception("XMLElement with duplicate ID " + str(node.id))
+        self.nodes[node.id] = node
+        self.typeHierarchy = None
+        self.nodeClassIndex.setdefault(node.__class__, {})[node.id] = node
+        for index, key in self.nameIndexKeys(node):
+            index.setdefault(key, []).append(node)
+
+    def removeNodeById(self, nodeId):
+        """ Removes the node from the nodeset and its secondary indexes. All
+            references of other nodes pointing to the removed node are deleted
+            as well.
+
+            Returns False if the nodeset does not contain the node.
+        """
+        if not isinstance(nodeId, NodeId):
+            nodeId = NodeId(nodeId.strip())
+        node = self.nodes.pop(nodeId, None)
+        if node is None:
+            return False
+        logger.debug("Removing nodeId " + str(nodeId))
+        self.typeHierarchy = None
+        del self.nodeClassIndex[node.__class__][node.id]
+        for index, key in self.nameIndexKeys(node):
+            entries = index[key]
+            entries.remove(node)
+            if len(entries) == 0:
+                del index[key]
+        # The inverse references of a node mirror the references of the nodes
+        # it is connected to, so only those nodes have to be updated
+        for ref in node.references | node.inverseReferences:
+            neighbour = self.nodes.get(ref.target)
+            if neighbour is None:
+                continue
+            neighbour.references = set(r for r in neighbour.references if r.target != nodeId)
+            neighbour.inverseReferences = set(r for r in neighbour.inverseReferences if r.target != nodeId)
+        return True
+
+    def nameIndexKeys(self, node):
+        keys = [(self.browseNameIndex, node.browseName.name)]
+        if node.symbolicName.value is not None:
+            keys.append((self.symbolicNameIndex, node.symbolicName.value))
+        return keys
+
     def getNodeByBrowseName(self, idstring):
-        return next((n for n in self.nodes.values() if idstring == n.browseName.name), None)
+        nodes = self.browseNameIndex.get(idstring)
+        if not nodes:
+            return None
+        return nodes[0]
+
+    def getNodeBySymbolicName(self, name):
+        nodes = self.symbolicNameIndex.get(name)
+        if not nodes:
+            return None
+        return nodes[0]
+
+    def getNodesByClass(self, nodeClass):
+        """ Returns all nodes which are instances of the given Node subclass.
+        """
+        nodes = []
+        for cls, entries in self.nodeClassIndex.items():
+            if issubclass(cls, nodeClass):
+                nodes.extend(entries.values())
+        return nodes
+
+    def getTypeHierarchy(self):
+        """ Returns the HasSubtype hierarchy of the reference, data, object and
+            variable types as a dict with the entries
+              subTypes: NodeId -> list of the NodeIds of the direct subtypes
+              superType: NodeId -> NodeId of the supertype
+              descendants: NodeId -> frozenset of the NodeId and all its subtypes
+              ancestors: NodeId -> tuple of the NodeId and all its supertypes
+            The closures are filled in on demand by getSubTypeIds() and
+            getSuperTypeIds().
+        """
+        if self.typeHierarchy is not None:
+            return self.typeHierarchy
+        subTypes = {}
+        superType = {}
+        for cls in (ReferenceTypeNode, DataTypeNode, ObjectTypeNode, VariableTypeNode):
+            for node in self.getNodesByClass(cls):
+                for ref in node.references:
+                    if ref.referenceType == hassubtype and ref.isForward and ref.target in self.nodes:
+                        subTypes.setdefault(node.id, []).append(ref.target)
+                        superType[ref.target] = node.id
+        self.typeHierarchy = {"subTypes": subTypes, "superType": superType,
+                              "descendants": {}, "ancestors": {}}
+        return self.typeHierarchy
+
+    def getSubTypeIds(self, nodeId):
+        """ Returns a frozenset with the nodeId and the NodeIds of all its
+            direct and indirect subtypes.
+        """
+        hierarchy = self.getTypeHierarchy()
+        descendants = hierarchy["descendants"]
+        if nodeId in descendants:
+            return descendants[nodeId]
+        subTypes = hierarchy["subTypes"]
+        closure = set()
+        stack = [nodeId]
+        while stack:
+            current = stack.pop()
+            if current in closure:
+                continue
+            if current in descendants:
+                closure.update(descendants[current])
+                continue
+            closure.add(current)
+            stack.extend(subTypes.get(current, ()))
+        descendants[nodeId] = frozenset(closure)
+        return descendants[nodeId]
+
+    def getSuperTypeIds(self, nodeId):
+        """ Returns a tuple with the nodeId followed by its supertypes, the
+            root of the type hierarchy comes last.
+        """
+        hierarchy = self.getTypeHierarchy()
+        ancestors = hierarchy["ancestors"]
+        if nodeId in ancestors:
+            return ancestors[nodeId]
+        chain = [nodeId]
+        superType = hierarchy["superType"]
+        while chain[-1] in superType and superType[chain[-1]] not in chain:
+            parent = superType[chain[-1]]
+            if parent in ancestors:
+                chain.extend(ancestors[parent])
+                break
+            chain.append(parent)
+        ancestors[nodeId] = tuple(chain)
+        return ancestors[nodeId]
+
+    def isSubTypeOf(self, nodeId, superTypeId):
+        return superTypeId in self.getSuperTypeIds(nodeId)
 
     def getNodeById(self, namespace, id):
-        nodeId = NodeId()
-        nodeId.ns = namespace
-        nodeId.i = id
+        nodeId = NodeId("i=" + str(id)).withNamespace(namespace)
         return self.nodes[nodeId]
 
+    def getNodeByIDString(self, idstring):
+        return self.nodes.get(NodeId(idstring.strip()))
+
     def getRoot(self):
         return self.getNodeByBrowseName("Root")
 
     def createNode(self, xmlelement, modelUri, hidden=False):
-        ndtype = xmlelement.localName.lower()
+        ndtype = getLocalName(xmlelement).lower()
         if ndtype[:2] == "ua":
             ndtype = ndtype[2:]
 
@@ -209,71 +372,95 @@ class NodeSet(object):
         return result
 
     def addNodeSet(self, xmlfile, hidden=False, typesArray="UA_TYPES"):
-        # Extract NodeSet DOM
-
-        fileContent = xmlfile.read()
-        # Remove BOM since the dom parser cannot handle it on python 3 windows
-        if fileContent.startswith( codecs.BOM_UTF8 ):
-            fileContent = fileContent.lstrip( codecs.BOM_UTF8 )
-        if (sys.version_info >= (3, 0)):
-            fileContent = fileContent.decode("utf-8")
-
-        # Remove the uax namespace from tags. UaModeler adds this namespace to some elements
-        fileContent = re.sub(r"<([/]?)uax:(\w+)([/]?)>", "<\g<1>\g<2>\g<3>>", fileContent)
+        self.mergeNodeSet(self.parseNodeSet(xmlfile, hidden), typesArray)
 
-        nodesets = dom.parseString(fileContent).getElementsByTagName("UANodeSet")
-        if len(nodesets) == 0 or len(nodesets) > 1:
-            raise Exception(self, self.originXML + " contains no or more then 1 nodeset")
-        nodeset = nodesets[0]
-
-
-        # Extract the modelUri
+    def parseNodeSet(self, xmlfile, hidden=False):
+        """ Parses the nodeset XML file into a batch of nodes without adding them
+            to this nodeset. The batch is the tuple (namespaces, modelUri,
+            aliases, nodes) as it is defined in the file, it is passed to
+            mergeNodeSet() to resolve the aliases and namespaces.
+        """
+        # Stream the children of <UANodeSet>. Every UA* element is turned into a
+        # node as soon as its end tag is read and is dropped from the tree
+        # afterwards, so only one node definition is held in memory at a time.
+        # The file is parsed as is: expat skips a UTF-8 BOM and all tags are
+        # matched by their local name, so value elements with a uax: or any
+        # other namespace prefix need no rewriting.
+        orig_namespaces = ["http://opcfoundation.org/UA/"]  # List of namespaces used in the xml file
+        namespacesFound = False
         modelUri = None
-        try:
-            modelTag = nodeset.getElementsByTagName("Models")[0].getElementsByTagName("Model")[0]
-            modelUri = modelTag.attributes["ModelUri"].nodeValue
-        except:
-            # Ignore exception and try to use namespace array
-            modelUri = None
+        modelsFound = False
+        aliases = {}
+        newnodes = []
+        root = None
+        depth = 0
+        for event, element in etree.iterparse(xmlfile, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                    if getLocalName(root) != "UANodeSet":
+                        raise Exception(self, xmlfile.name + " contains no or more then 1 nodeset")
+                depth = depth + 1
+                continue
 
+            depth = depth - 1
+            if depth != 1:
+                continue
+
+            ndtype = getLocalName(element).lower()
+            if ndtype == "namespaceuris":
+                # The first namespace is always "http://opcfoundation.org/UA/"
+                if not namespacesFound:
+                    namespacesFound = True
+                    for uri in element:
+                        if uri.text not in orig_namespaces:
+                            orig_namespaces.append(uri.text)
+            elif ndtype == "models":
+                # Extract the modelUri of the first model
+                if not modelsFound:
+                    modelsFound = True
+                    models = getElementsByLocalName(element, "Model")
+                    if len(models) > 0:
+                        modelUri = models[0].get("ModelUri")
+            elif 'aliases' in ndtype:
+                aliases = self.merge_dicts(aliases, buildAliasList(element))
+            else:
+                node = self.createNode(element, modelUri, hidden)
+                if node:
+                    newnodes.append(node)
+            element.clear()
+            root.clear()
 
-        # Create the namespace mapping
-        orig_namespaces = extractNamespaces(xmlfile)  # List of namespaces used in the xml file
         if modelUri is None and len(orig_namespaces) > 0:
             modelUri = orig_namespaces[0]
 
         if modelUri is None:
-            raise Exception(self, self.originXML + " does not define the nodeset URI in Models/Model/ModelUri or NamespaceUris array.")
+            raise Exception(self, xmlfile.name + " does not define the nodeset URI in Models/Model/ModelUri or NamespaceUris array.")
 
+        return (orig_namespaces, modelUri, aliases, newnodes)
+
+    def mergeNodeSet(self, batch, typesArray="UA_TYPES"):
+        """ Adds a batch of nodes returned by parseNodeSet() to this nodeset.
+            The batches must be merged in the order of the files, since the
+            namespace indices are assigned in that order.
+        """
+        orig_namespaces, modelUri, aliases, newnodes = batch
+
+        # Create the namespace mapping
         for ns in orig_namespaces:
             self.addNamespace(ns)
         self.namespaceMapping[modelUri] = self.createNamespaceMapping(orig_namespaces)
 
-        # Extract the aliases
-        for nd in nodeset.childNodes:
-            if nd.nodeType != nd.ELEMENT_NODE:
-                continue
-            ndtype = nd.localName.lower()
-            if 'aliases' in ndtype:
-                self.aliases = self.merge_dicts(self.aliases, buildAliasList(nd))
+        self.aliases = self.merge_dicts(self.aliases, aliases)
 
-        # Instantiate nodes
-        newnodes = []
-        for nd in nodeset.childNodes:
-            if nd.nodeType != nd.ELEMENT_NODE:
-                continue
-            node = self.createNode(nd, modelUri, hidden)
-            if not node:
-                continue
+        # The aliases and namespaces may be declared after the first nodes, so the
+        # nodes are only resolved once the whole file was read
+        for node in newnodes:
+            node.modelUri = modelUri
             node.replaceAliases(self.aliases)
             node.replaceNamespaces(self.namespaceMapping[modelUri])
             node.typesArray = typesArray
-
-            # Add the node the the global dict
-            if node.id in self.nodes:
-                raise Exception("XMLElement with duplicate ID " + str(node.id))
-            self.nodes[node.id] = node
-            newnodes.append(node)
+            self.addNode(node)
 
         # add inverse references
         for node in newnodes:
@@ -309,27 +496,24 @@ class NodeSet(object):
             No return value
         """
         stat = {True: 0, False: 0}
-        for n in self.nodes.values():
-            if isinstance(n, DataTypeNode):
-                n.buildEncoding(self)
-                stat[n.isEncodable()] = stat[n.isEncodable()] + 1
+        for n in self.getNodesByClass(DataTypeNode):
+            n.buildEncoding(self)
+            stat[n.isEncodable()] = stat[n.isEncodable()] + 1
         logger.debug("Type definitions built/passed: " +  str(stat))
 
 
     def allocateVariables(self):
-        for n in self.nodes.values():
-            if isinstance(n, VariableNode):
-                n.allocateValue(self)
+        for n in self.getNodesByClass(VariableNode):
+            n.allocateValue(self)
 
 
     def getBaseDataType(self, node):
         if node is None:
             return None
-        if node.browseName.name not in opaque_type_mapping:
-            return node
-        for ref in node.inverseReferences:
-            if ref.referenceType.i == 45:
-                return self.getBaseDataType(self.nodes[ref.target])
+        for typeId in self.getSuperTypeIds(node.id):
+            node = self.nodes[typeId]
+            if node.browseName.name not in opaque_type_mapping:
+                break
         return node
                 
     def getDataTypeNode(self, dataType):
@@ -351,11 +535,5 @@ class NodeSet(object):
         return None
 
     def getRelevantOrderingReferences(self):
-        relevant_types = getSubTypesOf(self,
-                                       self.getNodeByBrowseName("HierarchicalReferences"),
-                                       [])
-        relevant_types += getSubTypesOf(self,
-                                        self.getNodeByBrowseName("HasEncoding"),
-                                        [])
-        relevant_types = map(lambda x: x.id, relevant_types)
-        return list(relevant_types)
+        return self.getSubTypeIds(self.getNodeByBrowseName("HierarchicalReferences").id) | \
+               self.getSubTypeIds(self.getNodeByBrowseName("HasEncoding").id)
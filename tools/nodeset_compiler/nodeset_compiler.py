@@ -88,11 +88,49 @@ parser.add_argument('--max-string-length',
                     default=0,
                     help='Maximum allowed length of a string literal. If longer, it will be set to an empty string')
 
+parser.add_argument('-j', '--jobs',
+                    type=int,
+                    dest="jobs",
+                    default=1,
+                    help='Number of worker processes which parse the --existing and --xml files in parallel (default: 1)')
+
+parser.add_argument('--order-cache',
+                    action='store_true',
+                    dest="order_cache",
+                    help='Store the dependency ordering of the nodes in <outputFile>.order.json and reuse it if the nodeset did not change')
+
+parser.add_argument('--code-cache',
+                    action='store_true',
+                    dest="code_cache",
+                    help='Store the code of the nodes in <outputFile>.code.json/.dat and reuse the code of unchanged nodes (functions backend only)')
+
+parser.add_argument('--shards',
+                    type=int,
+                    dest="shards",
+                    default=1,
+                    help='Split the node functions into N files <outputFile>_shard<i>.c of about the same size, which can be compiled in parallel (default: 1)')
+
+parser.add_argument('--backend',
+                    choices=["functions", "tables", "snapshot"],
+                    dest="backend",
+                    default="functions",
+                    help='Generate two functions per node, const tables of node and reference descriptors which are walked by a generic loader, or a binary encoded snapshot of the nodes which is loaded directly into the nodestore. The generated function of the snapshot backend takes the nodestore of the server config as second argument (default: functions)')
+
+parser.add_argument('--profile',
+                    action='store_true',
+                    dest="profile",
+                    help='Measure the phases of the generated function and the nodes per node class. The results are kept in <outputFile>_profile and can be logged with <outputFile>_logProfile')
+
 parser.add_argument('-v', '--verbose', action='count',
                     help='Make the script more verbose. Can be applied up to 4 times')
 
 args = parser.parse_args()
 
+if args.backend != "functions" and args.shards > 1:
+    parser.error("--shards can only be used with the functions backend")
+if args.backend == "snapshot" and args.generate_ns0:
+    parser.error("--generate-ns0 cannot be used with the snapshot backend")
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -123,14 +161,26 @@ def getTypesArray(nsIdx):
     else:
         return "UA_TYPES"
 
-for xmlfile in args.existing:
-    logger.info("Preprocessing (existing) " + str(xmlfile.name))
-    ns.addNodeSet(xmlfile, True, typesArray=getTypesArray(nsCount))
-    nsCount +=1
-for xmlfile in args.infiles:
-    logger.info("Preprocessing " + str(xmlfile.name))
-    ns.addNodeSet(xmlfile, typesArray=getTypesArray(nsCount))
-    nsCount +=1
+if args.jobs > 1:
+    # The files are parsed in parallel. The namespaces and aliases are resolved
+    # when the batches are merged in the order of the files.
+    tasks = [(xmlfile.name, True) for xmlfile in args.existing] + \
+            [(xmlfile.name, False) for xmlfile in args.infiles]
+    for xmlfile in args.existing + args.infiles:
+        xmlfile.close()
+    logger.info("Preprocessing " + str(len(tasks)) + " nodesets in " + str(args.jobs) + " jobs")
+    for batch in parseNodeSetFiles(tasks, args.jobs):
+        ns.mergeNodeSet(batch, typesArray=getTypesArray(nsCount))
+        nsCount +=1
+else:
+    for xmlfile in args.existing:
+        logger.info("Preprocessing (existing) " + str(xmlfile.name))
+        ns.addNodeSet(xmlfile, True, typesArray=getTypesArray(nsCount))
+        nsCount +=1
+    for xmlfile in args.infiles:
+        logger.info("Preprocessing " + str(xmlfile.name))
+        ns.addNodeSet(xmlfile, typesArray=getTypesArray(nsCount))
+        nsCount +=1
 
 # # We need to notify the open62541 server of the namespaces used to be able to use i.e. ns=3
 # namespaceArrayNames = preProc.getUsedNamespaceArrayNames()
@@ -147,7 +197,7 @@ for blacklist in args.blacklistFiles:
         if ns.getNodeByIDString(id) == None:
             logger.info("Can't blacklist node, namespace does currently not contain a node with id " + str(id))
         else:
-            ns.removeNodeById(line)
+            ns.removeNodeById(id)
     blacklist.close()
 
 # Set the nodes from the ignore list to hidden. This removes them from dependency calculation
@@ -175,13 +225,14 @@ ns.sanitize()
 #     rpm is encoded as a double
 ns.buildEncodingRules()
 
-# Allocate/Parse the data values. In order to do this, we must have run
-# buidEncodingRules.
-ns.allocateVariables()
+# The data values are parsed when the code of their node is generated, which
+# must happen after buidEncodingRules.
 
 #printDependencyGraph(ns)
 
 # Create the C code with the open62541 backend of the compiler
 logger.info("Generating Code")
-generateOpen62541Code(ns, args.outputFile, args.generate_ns0, args.internal_headers, args.typesArray, args.max_string_length)
+orderCache = args.outputFile + ".order.json" if args.order_cache else None
+codeCache = args.outputFile + ".code" if args.code_cache else None
+generateOpen62541Code(ns, args.outputFile, args.generate_ns0, args.internal_headers, args.typesArray, args.max_string_length, orderCache, args.shards, args.backend, args.profile, codeCache)
 logger.info("NodeSet generation code successfully printed")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###
+### Tests of the XML parsing of the nodeset compiler data types. Run with
+### python -m unittest discover tools/nodeset_compiler/tests
+###
+
+import os
+import sys
+import unittest
+import xml.etree.ElementTree as etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from datatypes import NodeId
+
+NAMESPACE = "http://opcfoundation.org/UA/2008/02/Types.xsd"
+
+
+class NodeIdParseXMLTest(unittest.TestCase):
+
+    def parse(self, xml):
+        # Like an aliased field of Value.__parseXMLSingleValue
+        nodeId = NodeId()
+        nodeId.alias = "NodeId"
+        nodeId.parseXML(etree.fromstring(xml))
+        return nodeId
+
+    def test_compact_identifier(self):
+        nodeId = self.parse("<NodeId><Identifier>i=6</Identifier></NodeId>")
+        self.assertEqual(str(nodeId), "ns=0;i=6")
+
+    def test_compact_identifier_with_namespace(self):
+        nodeId = self.parse("<NodeId xmlns=\"%s\"><Identifier>ns=1;s=Name</Identifier></NodeId>" % NAMESPACE)
+        self.assertEqual(str(nodeId), "ns=1;s=Name")
+
+    def test_indented_identifier(self):
+        nodeId = self.parse("<NodeId>\n  <Identifier>i=6</Identifier>\n</NodeId>")
+        self.assertEqual(str(nodeId), "ns=0;i=6")
+
+    def test_text(self):
+        nodeId = self.parse("<NodeId>ns=2;i=42</NodeId>")
+        self.assertEqual(str(nodeId), "ns=2;i=42")
+
+    def test_empty(self):
+        nodeId = self.parse("<NodeId />")
+        self.assertIsNone(nodeId.value)
+
+
+if __name__ == "__main__":
+    unittest.main()
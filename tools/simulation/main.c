@@ -0,0 +1,410 @@
+/**
+********************************************************************************
+\file   main.c
+
+\brief  Main file of the host-only gateway simulation
+
+This file contains the main file of the opcua2powerlink simulation. It runs
+the generated application (app.c) and the generated nodeset together with the
+OPC UA server, while the POWERLINK process image is provided by the simulation
+in oplksim.c. No POWERLINK hardware or openPOWERLINK library is needed.
+
+At the end of a run the achieved cycle rate, the CPU usage and the latency of
+the OPC UA updates are reported.
+
+\ingroup module_opcua2powerlink_sim
+*******************************************************************************/
+
+/*------------------------------------------------------------------------------
+Copyright (c) 2019, B&R Industrial Automation GmbH
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the copyright holders nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL COPYRIGHT HOLDERS BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+------------------------------------------------------------------------------*/
+
+//------------------------------------------------------------------------------
+// includes
+//------------------------------------------------------------------------------
+#include <opcua/open62541.h>
+#include <opcua/nodeset.h>
+
+#include <app/app.h>
+
+#include "oplksim.h"
+
+#include <sys/resource.h>
+#include <pthread.h>
+#include <unistd.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+//============================================================================//
+//            P R I V A T E   D E F I N I T I O N S                           //
+//============================================================================//
+
+//------------------------------------------------------------------------------
+// const defines
+//------------------------------------------------------------------------------
+#define CYCLE_LEN           1000                // simulated cycle length in us
+#define DURATION            10                  // duration of a run in s
+#define OPCUA_PORT          4840
+#define OPCUA_INTERVAL      5                   // OPC UA update interval in ms
+
+//------------------------------------------------------------------------------
+// local types
+//------------------------------------------------------------------------------
+typedef struct
+{
+    UINT32          cycleLen;
+    UINT32          duration;
+    UINT32          interval;
+    UINT16          port;
+} tOptions;
+
+//------------------------------------------------------------------------------
+// local vars
+//------------------------------------------------------------------------------
+static UA_Boolean           running_l = true;
+static tOplkSimTimeStat     callbackTime_l = {0, (UINT64)-1, 0, 0};
+static tOptions             opts_l;
+
+//------------------------------------------------------------------------------
+// local function prototypes
+//------------------------------------------------------------------------------
+static int   getOptions(int argc_p,
+                        char* const argv_p[],
+                        tOptions* pOpts_p);
+static void  callbackSim(UA_Server* server_p, void* pData_p);
+static void* opcuaThread(void* pArg_p);
+static void  printStat(const char* name_p, const tOplkSimTimeStat* pStat_p);
+static void  printReport(UINT64 wallTime_p, const struct rusage* pUsage_p);
+
+//============================================================================//
+//            P U B L I C   F U N C T I O N S                                 //
+//============================================================================//
+
+//------------------------------------------------------------------------------
+/**
+\brief  main function
+
+This is the main function of the host-only gateway simulation.
+
+\param[in]      argc                Number of arguments
+\param[in]      argv                Pointer to argument strings
+
+\return Returns an exit code
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+int main(int argc, char* argv[])
+{
+    tOplkError      ret;
+    pthread_t       thread;
+    UINT64          startTime;
+    UINT64          endTime;
+    UINT64          stopTime;
+    struct rusage   startUsage;
+    struct rusage   endUsage;
+
+    if (getOptions(argc, argv, &opts_l) < 0)
+        return 1;
+
+    ret = oplksim_init(opts_l.cycleLen);
+    if (ret != kErrorOk)
+    {
+        fprintf(stderr, "Invalid cycle length %u\n", opts_l.cycleLen);
+        return 1;
+    }
+
+    ret = initApp();
+    if (ret != kErrorOk)
+        goto Exit;
+
+    setupInputs();
+    setStatus_OPCUA("Simulation");
+
+    if (pthread_create(&thread, NULL, opcuaThread, NULL) != 0)
+    {
+        fprintf(stderr, "Error creating the OPCUA Server!\n");
+        ret = kErrorNoResource;
+        goto Exit;
+    }
+
+    printf("Running simulation: cycle %u us, duration %u s, OPC UA interval %u ms\n",
+           opts_l.cycleLen,
+           opts_l.duration,
+           opts_l.interval);
+
+    getrusage(RUSAGE_SELF, &startUsage);
+    startTime = oplksim_getTimeNs();
+    endTime = startTime + (UINT64)opts_l.duration * 1000000000ULL;
+
+    while (oplksim_getTimeNs() < endTime)
+    {
+        ret = processSync();
+        if (ret != kErrorOk)
+        {
+            fprintf(stderr, "processSync() failed with 0x%04X\n", ret);
+            break;
+        }
+    }
+
+    getrusage(RUSAGE_SELF, &endUsage);
+    stopTime = oplksim_getTimeNs();
+    endUsage.ru_utime.tv_sec -= startUsage.ru_utime.tv_sec;
+    endUsage.ru_utime.tv_usec -= startUsage.ru_utime.tv_usec;
+    endUsage.ru_stime.tv_sec -= startUsage.ru_stime.tv_sec;
+    endUsage.ru_stime.tv_usec -= startUsage.ru_stime.tv_usec;
+
+    oplksim_stop();
+    running_l = false;
+    pthread_join(thread, NULL);
+
+    printReport(stopTime - startTime, &endUsage);
+
+Exit:
+    shutdownApp();
+    oplksim_exit();
+
+    return (ret == kErrorOk) ? 0 : 1;
+}
+
+//============================================================================//
+//            P R I V A T E   F U N C T I O N S                               //
+//============================================================================//
+/// \name Private Functions
+/// \{
+
+//------------------------------------------------------------------------------
+/**
+\brief  Repeated OPC UA callback
+
+The function calls the generated OPC UA callback and measures its execution
+time. Afterwards the simulation is notified that the output data was published.
+
+\param[in]      server_p            Pointer to the OPC UA server.
+\param[in]      pData_p             User data, unused.
+*/
+//------------------------------------------------------------------------------
+static void callbackSim(UA_Server* server_p, void* pData_p)
+{
+    UINT64  start;
+    UINT64  duration;
+
+    (void)pData_p;
+
+    start = oplksim_getTimeNs();
+    callbackOPCUA(server_p);
+    duration = oplksim_getTimeNs() - start;
+    oplksim_notifyPublished();
+
+    // only accessed from the server thread
+    callbackTime_l.count++;
+    callbackTime_l.sum += duration;
+    if (duration < callbackTime_l.min)
+        callbackTime_l.min = duration;
+    if (duration > callbackTime_l.max)
+        callbackTime_l.max = duration;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Thread for OPC UA Server
+
+This function implements the thread for the OPC UA server in the same way as
+the gateway does, but with the measuring callback.
+
+\param[in]      pArg_p              Thread argument, unused.
+
+\return The function returns NULL.
+*/
+//------------------------------------------------------------------------------
+static void* opcuaThread(void* pArg_p)
+{
+    UA_ServerConfig*    config;
+    UA_Server*          server;
+    UA_StatusCode       retval;
+
+    (void)pArg_p;
+
+    config = UA_ServerConfig_new_minimal(opts_l.port, NULL);
+    server = UA_Server_new(config);
+
+    UA_Server_addRepeatedCallback(server, callbackSim, NULL, opts_l.interval, NULL);
+
+#ifdef NODESET_SNAPSHOT
+    retval = nodeset(server, &config->nodestore);
+#else
+    retval = nodeset(server);
+#endif
+#ifdef NODESET_PROFILE
+    nodeset_logProfile(UA_Log_Stdout);
+#endif
+    if (retval != UA_STATUSCODE_GOOD)
+    {
+        fprintf(stderr, "Could not add the nodeset!\n");
+    }
+    else if (setupCallbacks_OPCUA(server) != UA_STATUSCODE_GOOD)
+    {
+        fprintf(stderr, "Could not attach the write callbacks!\n");
+    }
+    else
+    {
+        UA_Server_run(server, &running_l);
+    }
+
+    UA_Server_delete(server);
+    UA_ServerConfig_delete(config);
+
+    return NULL;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Print a time statistic
+
+\param[in]      name_p              Name of the statistic.
+\param[in]      pStat_p             Statistic to print.
+*/
+//------------------------------------------------------------------------------
+static void printStat(const char* name_p, const tOplkSimTimeStat* pStat_p)
+{
+    if (pStat_p->count == 0)
+    {
+        printf("%-22s no samples\n", name_p);
+        return;
+    }
+
+    printf("%-22s min %10.1f us  avg %10.1f us  max %10.1f us  (%llu samples)\n",
+           name_p,
+           pStat_p->min / 1000.0,
+           (pStat_p->sum / (double)pStat_p->count) / 1000.0,
+           pStat_p->max / 1000.0,
+           (unsigned long long)pStat_p->count);
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Print the result of a simulation run
+
+\param[in]      wallTime_p          Duration of the run in ns.
+\param[in]      pUsage_p            Resource usage during the run.
+*/
+//------------------------------------------------------------------------------
+static void printReport(UINT64 wallTime_p, const struct rusage* pUsage_p)
+{
+    tOplkSimStats   stats;
+    double          wallTime = wallTime_p / 1e9;
+    double          cpuTime;
+
+    oplksim_getStats(&stats);
+    cpuTime = pUsage_p->ru_utime.tv_sec + pUsage_p->ru_utime.tv_usec / 1e6 +
+              pUsage_p->ru_stime.tv_sec + pUsage_p->ru_stime.tv_usec / 1e6;
+
+    printf("----------------------------------------------------\n");
+    printf("Linked objects:        %u\n", stats.linkedObjects);
+    printf("Process image size:    in %lu bytes, out %lu bytes\n",
+           (ULONG)stats.sizeIn,
+           (ULONG)stats.sizeOut);
+    printf("Object accesses:       %llu reads, %llu writes\n",
+           (unsigned long long)stats.objectReads,
+           (unsigned long long)stats.objectWrites);
+    printf("Cycles:                %llu (%llu overruns)\n",
+           (unsigned long long)stats.cycleCount,
+           (unsigned long long)stats.overrunCount);
+    printf("Cycle rate:            %.1f Hz (target %.1f Hz)\n",
+           stats.cycleCount / wallTime,
+           1e6 / opts_l.cycleLen);
+    printf("CPU usage:             %.1f %% of one core\n",
+           (cpuTime / wallTime) * 100.0);
+    printStat("Wakeup jitter:", &stats.wakeupJitter);
+    printStat("Sync processing:", &stats.syncTime);
+    printStat("OPC UA callback:", &callbackTime_l);
+    printStat("Update latency:", &stats.updateLatency);
+    printf("----------------------------------------------------\n");
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Get command line parameters
+
+The function parses the supplied command line parameters and stores the
+options at pOpts_p.
+
+\param[in]      argc_p              Argument count.
+\param[in]      argv_p              Pointer to arguments.
+\param[out]     pOpts_p             Pointer to store options
+
+\return The function returns the parsing status.
+\retval 0           Successfully parsed
+\retval -1          Parsing error
+*/
+//------------------------------------------------------------------------------
+static int getOptions(int argc_p,
+                      char* const argv_p[],
+                      tOptions* pOpts_p)
+{
+    int opt;
+
+    /* setup default parameters */
+    pOpts_p->cycleLen = CYCLE_LEN;
+    pOpts_p->duration = DURATION;
+    pOpts_p->interval = OPCUA_INTERVAL;
+    pOpts_p->port = OPCUA_PORT;
+
+    /* get command line parameters */
+    while ((opt = getopt(argc_p, argv_p, "c:d:i:p:")) != -1)
+    {
+        switch (opt)
+        {
+            case 'c':
+                pOpts_p->cycleLen = strtoul(optarg, NULL, 10);
+                break;
+
+            case 'd':
+                pOpts_p->duration = strtoul(optarg, NULL, 10);
+                break;
+
+            case 'i':
+                pOpts_p->interval = strtoul(optarg, NULL, 10);
+                break;
+
+            case 'p':
+                pOpts_p->port = (UINT16)strtoul(optarg, NULL, 10);
+                break;
+
+            default: /* '?' */
+                printf("Usage: %s [-c CYCLE_LEN] [-d DURATION] [-i INTERVAL] [-p PORT]\n", argv_p[0]);
+                printf(" -c CYCLE_LEN: Simulated POWERLINK cycle length in us (default %u)\n", CYCLE_LEN);
+                printf(" -d DURATION: Duration of the run in s (default %u)\n", DURATION);
+                printf(" -i INTERVAL: OPC UA update interval in ms (default %u)\n", OPCUA_INTERVAL);
+                printf(" -p PORT: OPC UA server port (default %u)\n", OPCUA_PORT);
+
+                return -1;
+        }
+    }
+    return 0;
+}
+
+/// \}
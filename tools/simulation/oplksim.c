@@ -0,0 +1,563 @@
+/**
+********************************************************************************
+\file   oplksim.c
+
+\brief  Host-only simulation of the openPOWERLINK process image API
+
+This file implements the parts of the openPOWERLINK API which are used by the
+generated application (app.c). Instead of exchanging the process images with
+a POWERLINK network, synthetic cycles are generated with a configurable cycle
+length. Every cycle the output process image is filled with a new pattern so
+that the OPC UA side always sees changing values.
+
+The simulation collects statistics about the achieved cycle timing and the
+latency between an output process image exchange and the point where the
+generated OPC UA callback has published the new values.
+
+\ingroup module_opcua2powerlink_sim
+*******************************************************************************/
+
+/*------------------------------------------------------------------------------
+Copyright (c) 2019, B&R Industrial Automation GmbH
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the copyright holders nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL COPYRIGHT HOLDERS BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+------------------------------------------------------------------------------*/
+
+//------------------------------------------------------------------------------
+// includes
+//------------------------------------------------------------------------------
+#include "oplksim.h"
+
+#include <oplk/debugstr.h>
+#include <eventlog/eventlog.h>
+
+#include <pthread.h>
+#include <time.h>
+#include <errno.h>
+#include <stdarg.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+//============================================================================//
+//            P R I V A T E   D E F I N I T I O N S                           //
+//============================================================================//
+
+//------------------------------------------------------------------------------
+// const defines
+//------------------------------------------------------------------------------
+#define NSEC_PER_SEC        1000000000ULL
+#define NSEC_PER_USEC       1000ULL
+
+//------------------------------------------------------------------------------
+// local types
+//------------------------------------------------------------------------------
+typedef struct
+{
+    UINT64              cycleLen;           ///< Cycle length in ns
+    UINT64              nextCycle;          ///< Deadline of the next cycle in ns
+    UINT64              cycleStart;         ///< Start time of the running cycle in ns
+    UINT64              pendingOut;         ///< Time of the oldest unpublished output exchange
+    BOOL                fStop;              ///< Sync event returns immediately if set
+    void*               pImageIn;
+    void*               pImageOut;
+    pthread_mutex_t     lock;
+    tOplkSimStats       stats;
+} tOplkSimInstance;
+
+//------------------------------------------------------------------------------
+// local vars
+//------------------------------------------------------------------------------
+static tOplkSimInstance     instance_l;
+
+//------------------------------------------------------------------------------
+// local function prototypes
+//------------------------------------------------------------------------------
+static void addSample(tOplkSimTimeStat* pStat_p, UINT64 value_p);
+
+//============================================================================//
+//            P U B L I C   F U N C T I O N S                                 //
+//============================================================================//
+
+//------------------------------------------------------------------------------
+/**
+\brief  Initialize the process image simulation
+
+\param[in]      cycleLen_p          Length of the simulated cycle in us.
+
+\return The function returns a tOplkError error code.
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+tOplkError oplksim_init(UINT32 cycleLen_p)
+{
+    if (cycleLen_p == 0)
+        return kErrorApiInvalidParam;
+
+    memset(&instance_l, 0, sizeof(instance_l));
+    pthread_mutex_init(&instance_l.lock, NULL);
+    instance_l.cycleLen = (UINT64)cycleLen_p * NSEC_PER_USEC;
+    instance_l.nextCycle = oplksim_getTimeNs() + instance_l.cycleLen;
+    instance_l.stats.wakeupJitter.min = (UINT64)-1;
+    instance_l.stats.syncTime.min = (UINT64)-1;
+    instance_l.stats.updateLatency.min = (UINT64)-1;
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Shut down the process image simulation
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+void oplksim_exit(void)
+{
+    oplk_freeProcessImage();
+    pthread_mutex_destroy(&instance_l.lock);
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Stop generating sync events
+
+After calling this function oplk_waitSyncEvent() returns immediately with an
+error, so a waiting sync loop can terminate.
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+void oplksim_stop(void)
+{
+    instance_l.fStop = TRUE;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Notify that the OPC UA side has published the process data
+
+This function must be called after the generated OPC UA callback has finished.
+It closes the latency measurement of the oldest output process image which was
+not yet published.
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+void oplksim_notifyPublished(void)
+{
+    UINT64  now = oplksim_getTimeNs();
+
+    pthread_mutex_lock(&instance_l.lock);
+    if (instance_l.pendingOut != 0)
+    {
+        addSample(&instance_l.stats.updateLatency, now - instance_l.pendingOut);
+        instance_l.pendingOut = 0;
+    }
+    pthread_mutex_unlock(&instance_l.lock);
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Get the collected statistics
+
+\param[out]     pStats_p            Pointer to store the statistics.
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+void oplksim_getStats(tOplkSimStats* pStats_p)
+{
+    pthread_mutex_lock(&instance_l.lock);
+    *pStats_p = instance_l.stats;
+    pthread_mutex_unlock(&instance_l.lock);
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Get the monotonic time
+
+\return The function returns the monotonic time in ns.
+
+\ingroup module_opcua2powerlink_sim
+*/
+//------------------------------------------------------------------------------
+UINT64 oplksim_getTimeNs(void)
+{
+    struct timespec ts;
+
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (UINT64)ts.tv_sec * NSEC_PER_SEC + (UINT64)ts.tv_nsec;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Wait for the next simulated sync event
+
+The function sleeps until the deadline of the next cycle. If the deadline has
+already passed the cycle is counted as an overrun and the cycle timing is
+resynchronized to the current time.
+
+\param[in]      timeout_p           Timeout in us, unused in the simulation.
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_waitSyncEvent(ULONG timeout_p)
+{
+    struct timespec ts;
+    UINT64          now;
+
+    UNUSED_PARAMETER(timeout_p);
+
+    if (instance_l.fStop)
+        return kErrorApiNotInitialized;
+
+    now = oplksim_getTimeNs();
+    if (now > instance_l.nextCycle)
+    {
+        instance_l.stats.overrunCount++;
+        instance_l.nextCycle = now;
+    }
+    else
+    {
+        ts.tv_sec = (time_t)(instance_l.nextCycle / NSEC_PER_SEC);
+        ts.tv_nsec = (long)(instance_l.nextCycle % NSEC_PER_SEC);
+        while (clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &ts, NULL) == EINTR)
+            ;
+        now = oplksim_getTimeNs();
+    }
+
+    pthread_mutex_lock(&instance_l.lock);
+    addSample(&instance_l.stats.wakeupJitter, now - instance_l.nextCycle);
+    instance_l.stats.cycleCount++;
+    pthread_mutex_unlock(&instance_l.lock);
+
+    instance_l.cycleStart = now;
+    instance_l.nextCycle += instance_l.cycleLen;
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Allocate the process images
+
+\param[in]      sizeProcessImageIn_p    Size of the input process image.
+\param[in]      sizeProcessImageOut_p   Size of the output process image.
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_allocProcessImage(size_t sizeProcessImageIn_p,
+                                  size_t sizeProcessImageOut_p)
+{
+    if ((instance_l.pImageIn != NULL) || (instance_l.pImageOut != NULL))
+        return kErrorApiPIAlreadyAllocated;
+
+    // calloc() with a minimum size of 1 so empty images get a valid pointer
+    instance_l.pImageIn = calloc(1, sizeProcessImageIn_p + 1);
+    instance_l.pImageOut = calloc(1, sizeProcessImageOut_p + 1);
+    if ((instance_l.pImageIn == NULL) || (instance_l.pImageOut == NULL))
+    {
+        oplk_freeProcessImage();
+        return kErrorApiPIOutOfMemory;
+    }
+
+    instance_l.stats.sizeIn = sizeProcessImageIn_p;
+    instance_l.stats.sizeOut = sizeProcessImageOut_p;
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Free the process images
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_freeProcessImage(void)
+{
+    free(instance_l.pImageIn);
+    free(instance_l.pImageOut);
+    instance_l.pImageIn = NULL;
+    instance_l.pImageOut = NULL;
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Link a process image variable to an object
+
+The simulation does not contain an object dictionary. It only checks that the
+variable fits into the process image and counts the linked entries.
+
+\param[in]      objIndex_p          Index of the object.
+\param[in]      firstSubindex_p     First sub-index to link.
+\param[in]      offsetPI_p          Offset of the variable in the process image.
+\param[in]      fOutputPI_p         TRUE for the output process image.
+\param[in]      entrySize_p         Size of one entry.
+\param[in,out]  pVarEntries_p       Number of entries to link.
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_linkProcessImageObject(UINT objIndex_p,
+                                       UINT firstSubindex_p,
+                                       size_t offsetPI_p,
+                                       BOOL fOutputPI_p,
+                                       tObdSize entrySize_p,
+                                       UINT* pVarEntries_p)
+{
+    size_t  imageSize;
+
+    UNUSED_PARAMETER(objIndex_p);
+    UNUSED_PARAMETER(firstSubindex_p);
+
+    if (pVarEntries_p == NULL)
+        return kErrorApiInvalidParam;
+
+    if ((instance_l.pImageIn == NULL) || (instance_l.pImageOut == NULL))
+        return kErrorApiPINotAllocated;
+
+    imageSize = fOutputPI_p ? instance_l.stats.sizeOut : instance_l.stats.sizeIn;
+    if (offsetPI_p + (entrySize_p * *pVarEntries_p) > imageSize)
+        return kErrorApiPISizeExceeded;
+
+    instance_l.stats.linkedObjects += *pVarEntries_p;
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Exchange the input process image
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_exchangeProcessImageIn(void)
+{
+    if (instance_l.pImageIn == NULL)
+        return kErrorApiPINotAllocated;
+
+    pthread_mutex_lock(&instance_l.lock);
+    addSample(&instance_l.stats.syncTime, oplksim_getTimeNs() - instance_l.cycleStart);
+    pthread_mutex_unlock(&instance_l.lock);
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Exchange the output process image
+
+The output process image is filled with a pattern derived from the cycle
+counter, which simulates new data received from the POWERLINK network.
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_exchangeProcessImageOut(void)
+{
+    if (instance_l.pImageOut == NULL)
+        return kErrorApiPINotAllocated;
+
+    memset(instance_l.pImageOut,
+           (int)(instance_l.stats.cycleCount & 0xFF),
+           instance_l.stats.sizeOut);
+
+    pthread_mutex_lock(&instance_l.lock);
+    if (instance_l.pendingOut == 0)
+        instance_l.pendingOut = oplksim_getTimeNs();
+    pthread_mutex_unlock(&instance_l.lock);
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Get the input process image
+
+\return The function returns a pointer to the input process image.
+*/
+//------------------------------------------------------------------------------
+void* oplk_getProcessImageIn(void)
+{
+    return instance_l.pImageIn;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Get the output process image
+
+\return The function returns a pointer to the output process image.
+*/
+//------------------------------------------------------------------------------
+void* oplk_getProcessImageOut(void)
+{
+    return instance_l.pImageOut;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Read an entry of the local object dictionary
+
+The simulation does not contain an object dictionary. The destination is filled
+with the same cycle counter pattern as the output process image, which
+simulates a value written by the POWERLINK network.
+
+\param[in]      index_p             Index of the object.
+\param[in]      subindex_p          Sub-index of the object.
+\param[out]     pDstData_p          Pointer to store the entry data.
+\param[in,out]  pSize_p             Size of the destination buffer, returns the
+                                    size of the entry.
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_readLocalObject(UINT index_p,
+                                UINT subindex_p,
+                                void* pDstData_p,
+                                size_t* pSize_p)
+{
+    if ((index_p == 0) ||
+        (subindex_p > 255) ||
+        (pDstData_p == NULL) ||
+        (pSize_p == NULL) ||
+        (*pSize_p == 0))
+        return kErrorApiInvalidParam;
+
+    memset(pDstData_p, (int)(instance_l.stats.cycleCount & 0xFF), *pSize_p);
+
+    pthread_mutex_lock(&instance_l.lock);
+    instance_l.stats.objectReads++;
+    pthread_mutex_unlock(&instance_l.lock);
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Write an entry of the local object dictionary
+
+The simulation does not contain an object dictionary. The write is only
+counted.
+
+\param[in]      index_p             Index of the object.
+\param[in]      subindex_p          Sub-index of the object.
+\param[in]      pSrcData_p          Pointer to the entry data.
+\param[in]      size_p              Size of the entry data.
+
+\return The function returns a tOplkError error code.
+*/
+//------------------------------------------------------------------------------
+tOplkError oplk_writeLocalObject(UINT index_p,
+                                 UINT subindex_p,
+                                 const void* pSrcData_p,
+                                 size_t size_p)
+{
+    if ((index_p == 0) ||
+        (subindex_p > 255) ||
+        (pSrcData_p == NULL) ||
+        (size_p == 0))
+        return kErrorApiInvalidParam;
+
+    pthread_mutex_lock(&instance_l.lock);
+    instance_l.stats.objectWrites++;
+    pthread_mutex_unlock(&instance_l.lock);
+
+    return kErrorOk;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Get the string of an error code
+
+\param[in]      oplkError_p         Error code.
+
+\return The function returns a fixed string with the error code.
+*/
+//------------------------------------------------------------------------------
+const char* debugstr_getRetValStr(tOplkError oplkError_p)
+{
+    static char str[32];
+
+    snprintf(str, sizeof(str), "simulation error 0x%04X", (UINT)oplkError_p);
+    return str;
+}
+
+//------------------------------------------------------------------------------
+/**
+\brief  Print an event log message
+
+\param[in]      level_p             Level of the message.
+\param[in]      category_p          Category of the message.
+\param[in]      fmt_p               Format string.
+*/
+//------------------------------------------------------------------------------
+void eventlog_printMessage(tEventlogLevel level_p,
+                           tEventlogCategory category_p,
+                           const char* fmt_p,
+                           ...)
+{
+    va_list argptr;
+
+    UNUSED_PARAMETER(level_p);
+    UNUSED_PARAMETER(category_p);
+
+    va_start(argptr, fmt_p);
+    vprintf(fmt_p, argptr);
+    va_end(argptr);
+    printf("\n");
+}
+
+//============================================================================//
+//            P R I V A T E   F U N C T I O N S                               //
+//============================================================================//
+/// \name Private Functions
+/// \{
+
+//------------------------------------------------------------------------------
+/**
+\brief  Add a sample to a time statistic
+
+\param[in,out]  pStat_p             Statistic to update.
+\param[in]      value_p             Sample in ns.
+*/
+//------------------------------------------------------------------------------
+static void addSample(tOplkSimTimeStat* pStat_p, UINT64 value_p)
+{
+    pStat_p->count++;
+    pStat_p->sum += value_p;
+    if (value_p < pStat_p->min)
+        pStat_p->min = value_p;
+    if (value_p > pStat_p->max)
+        pStat_p->max = value_p;
+}
+
+/// \}
@@ -0,0 +1,103 @@
+/**
+********************************************************************************
+\file   oplksim.h
+
+\brief  Definitions for the host-only openPOWERLINK process image simulation
+
+This file contains the definitions of the simulated process image API which
+replaces liboplkcn when running the generated gateway code on a plain host.
+
+\ingroup module_opcua2powerlink_sim
+*******************************************************************************/
+
+/*------------------------------------------------------------------------------
+Copyright (c) 2019, B&R Industrial Automation GmbH
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+    * Redistributions of source code must retain the above copyright
+      notice, this list of conditions and the following disclaimer.
+    * Redistributions in binary form must reproduce the above copyright
+      notice, this list of conditions and the following disclaimer in the
+      documentation and/or other materials provided with the distribution.
+    * Neither the name of the copyright holders nor the
+      names of its contributors may be used to endorse or promote products
+      derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL COPYRIGHT HOLDERS BE LIABLE FOR ANY
+DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+------------------------------------------------------------------------------*/
+#ifndef _INC_oplksim_H_
+#define _INC_oplksim_H_
+
+//------------------------------------------------------------------------------
+// includes
+//------------------------------------------------------------------------------
+#include <oplk/oplk.h>
+
+//------------------------------------------------------------------------------
+// const defines
+//------------------------------------------------------------------------------
+
+//------------------------------------------------------------------------------
+// typedef
+//------------------------------------------------------------------------------
+/**
+\brief  Time statistics of one measured quantity
+
+All values are given in nanoseconds.
+*/
+typedef struct
+{
+    UINT64          count;                  ///< Number of samples
+    UINT64          min;                    ///< Minimum sample
+    UINT64          max;                    ///< Maximum sample
+    UINT64          sum;                    ///< Sum of all samples
+} tOplkSimTimeStat;
+
+/**
+\brief  Statistics collected by the process image simulation
+*/
+typedef struct
+{
+    UINT64              cycleCount;         ///< Number of simulated POWERLINK cycles
+    UINT64              overrunCount;       ///< Cycles which started after their deadline
+    UINT32              linkedObjects;      ///< Number of linked process image variables
+    UINT64              objectReads;        ///< Number of on demand object dictionary reads
+    UINT64              objectWrites;       ///< Number of on demand object dictionary writes
+    size_t              sizeIn;             ///< Size of the input process image
+    size_t              sizeOut;            ///< Size of the output process image
+    tOplkSimTimeStat    wakeupJitter;       ///< Delay between cycle deadline and sync event
+    tOplkSimTimeStat    syncTime;           ///< Time spent in the application between the PI exchanges
+    tOplkSimTimeStat    updateLatency;      ///< Delay from output PI exchange to OPC UA update
+} tOplkSimStats;
+
+//------------------------------------------------------------------------------
+// function prototypes
+//------------------------------------------------------------------------------
+#ifdef __cplusplus
+extern "C"
+{
+#endif
+
+tOplkError oplksim_init(UINT32 cycleLen_p);
+void       oplksim_exit(void);
+void       oplksim_stop(void);
+void       oplksim_notifyPublished(void);
+void       oplksim_getStats(tOplkSimStats* pStats_p);
+UINT64     oplksim_getTimeNs(void);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif /* _INC_oplksim_H_ */
@@ -17,6 +17,20 @@ import os
 import sys
 import xml.etree.ElementTree as ET
 import logging
+import multiprocessing
+from xml.sax.saxutils import escape
+
+# Size of the OPC UA node id range of one device in the multi device mode
+DEVICE_NODE_ID_RANGE = 1000000
+
+
+# Parse the variables of one xdd file, used by the worker processes
+def parse_device(args):
+    directory, link, xdd = args
+    converter = ConvertXDD(directory=directory, link=link, xdd=xdd)
+    converter.create_variables()
+    return converter.manufacturer, converter.standardised
+
 
 class ConvertXDD:
 
@@ -94,16 +108,31 @@ class ConvertXDD:
         '000A': ['UA_String', 'UA_TYPES_STRING'],
     }
 
-    # Initialize the Class
-    def __init__(self, directory, link, xdd):
-        # Check if the xdd file exists
-        if not os.path.isfile(xdd):
+    # Initialize the Class, xdd is either one xdd file or a list of xdd files,
+    # the generated nodeset code is split into shards files, the backend of the
+    # nodeset compiler is "functions", "tables" or "snapshot", with profile the
+    # generated nodeset code measures the start-up
+    def __init__(self, directory, link, xdd, shards=1, backend="functions", profile=False):
+        xdd_files = list(xdd) if isinstance(xdd, (list, tuple)) else [xdd]
+        # Check if the xdd files exist
+        if not xdd_files:
             self.logger.error("No xdd file was found!")
             sys.exit(-1)
-        # Parse the .xdd file
-        self.tree = ET.parse(xdd)
-        # Get the root of the .xdd file
-        self.root = self.tree.getroot()
+        for xdd_file in iter(xdd_files):
+            if not os.path.isfile(xdd_file):
+                self.logger.error("No xdd file %s was found!" % xdd_file)
+                sys.exit(-1)
+        if len(xdd_files) == 1:
+            # Parse the .xdd file
+            self.tree = ET.parse(xdd_files[0])
+            # Get the root of the .xdd file
+            self.root = self.tree.getroot()
+            self.xdd_files = None
+        else:
+            # The xdd files of the devices are parsed by worker processes
+            self.tree = None
+            self.root = None
+            self.xdd_files = xdd_files
         # Check if the namespace link was defined
         if link == "":
             self.logger.error("No opc ua namespace link defined!")
@@ -116,8 +145,12 @@ class ConvertXDD:
             self.logger.error("No cmake root directory defined!")
             sys.exit(-1)
         self.directory = directory
+        self.shards = shards
+        self.backend = backend
+        self.profile = profile
         self.standardised = list()
         self.manufacturer = list()
+        self.devices = list()
 
     # Get the List with all the defined Objects from the .xdd files
     def create_oplk_elements(self):
@@ -194,15 +227,18 @@ class ConvertXDD:
                         tmp.update({'name': element.attrib['name']})
                         tmp.update({'dataType': element.attrib['dataType']})
                         tmp.update({'accessType': element.attrib['accessType']})
+                        tmp.update({'pdoMapping': element.attrib.get('PDOmapping', 'no')})
                         self.manufacturer.append(tmp)
             else:
                 index = item.attrib['index']
                 tmp = {}
                 tmp.update({'index': index})
                 tmp.update({'type': 0})
+                tmp.update({'subIndex': '00'})
                 tmp.update({'name': item.attrib['name']})
                 tmp.update({'dataType': item.attrib['dataType']})
                 tmp.update({'accessType': item.attrib['accessType']})
+                tmp.update({'pdoMapping': item.attrib.get('PDOmapping', 'no')})
                 self.manufacturer.append(tmp)
 
         for item in iter(self.oplk_tags['Standardised']):
@@ -227,28 +263,146 @@ class ConvertXDD:
                         tmp.update({'name': element.attrib['name']})
                         tmp.update({'dataType': element.attrib['dataType']})
                         tmp.update({'accessType': element.attrib['accessType']})
+                        tmp.update({'pdoMapping': element.attrib.get('PDOmapping', 'no')})
                         self.standardised.append(tmp)
             else:
                 index = item.attrib['index']
                 tmp = {}
                 tmp.update({'index': index})
                 tmp.update({'type': 0})
+                tmp.update({'subIndex': '00'})
                 tmp.update({'name': item.attrib['name']})
                 tmp.update({'dataType': item.attrib['dataType']})
                 tmp.update({'accessType': item.attrib['accessType']})
+                tmp.update({'pdoMapping': item.attrib.get('PDOmapping', 'no')})
                 self.standardised.append(tmp)
 
-    # Creates the objdict.h file inside the /common/objdicts/CiA401_CN folder
-    def create_objdict(self):
+        self.create_pdo_mapping()
+
+    # Get the value of a sub-object of the object index, the actual value of the configuration is
+    # preferred to the default value. An empty or missing value is 0, a value which is not a number
+    # is logged and also read as 0, so the entry is skipped
+    def get_value(self, index, element):
+        value = element.attrib.get('actualValue', '').strip() or element.attrib.get('defaultValue', '').strip()
+        if not value:
+            return 0
+        try:
+            if value.lower().startswith('0x'):
+                return int(value, 16)
+            return int(value)
+        except ValueError:
+            self.logger.warning("Value '%s' of object 0x%s/0x%s is not a number, the entry is skipped!" % (
+                                value, index, element.attrib['subIndex']))
+            return 0
+
+    # Mark the variables which are mapped into a PDO, only these are exchanged cyclically
+    def create_pdo_mapping(self):
+
+        mapped = set()
+        for obj in self.oplk_elements:
+            index = int(obj.attrib['index'], 16)
+            # RPDO (0x1600 - 0x16FF) and TPDO (0x1A00 - 0x1AFF) mapping parameters
+            if not (0x1600 <= index <= 0x16FF or 0x1A00 <= index <= 0x1AFF):
+                continue
+            entries = 0
+            for element in obj:
+                if int(element.attrib['subIndex'], 16) == 0:
+                    entries = self.get_value(obj.attrib['index'], element)
+            for element in obj:
+                sub_index = int(element.attrib['subIndex'], 16)
+                if sub_index == 0 or sub_index > entries:
+                    continue
+                # Mapping entry: length (63..48), offset (47..32), sub-index (23..16), index (15..0)
+                value = self.get_value(obj.attrib['index'], element)
+                if value != 0:
+                    mapped.add((value & 0xFFFF, (value >> 16) & 0xFF))
+
+        if not mapped:
+            self.logger.info("The xdd file contains no PDO mapping, all PDO mappable objects are exchanged cyclically!")
+
+        for item in self.manufacturer + self.standardised:
+            if mapped:
+                item['cyclic'] = (int(item['index'], 16), int(item['subIndex'], 16)) in mapped
+            else:
+                item['cyclic'] = item['pdoMapping'] != 'no'
 
-        if not self.oplk_tags:
-            if self.root is None:
-                self.logger.error("There is no xml root defined!")
+    # Create the list of devices with the variables and the node id range of each device
+    def create_devices(self):
+
+        self.devices = list()
+
+        if self.xdd_files is None:
+            # Single device mode, the device uses the POWERLINK folder directly
+            self.create_variables()
+            self.devices.append({'name': None, 'offset': 0,
+                                 'manufacturer': self.manufacturer, 'standardised': self.standardised})
+        else:
+            if len(self.xdd_files) * DEVICE_NODE_ID_RANGE >= 2 ** 32 - DEVICE_NODE_ID_RANGE:
+                self.logger.error("Too many xdd files, the node ids of the devices exceed the UInt32 range!")
                 sys.exit(-1)
-            if not self.oplk_elements:
-                self.create_oplk_elements()
-            self.create_oplk_tags()
-            self.logger.info("Creating POWERLINK tags!")
+
+            processes = min(len(self.xdd_files), multiprocessing.cpu_count())
+            pool = multiprocessing.Pool(processes)
+            try:
+                variables = pool.map(parse_device, [(self.directory, self.link, xdd) for xdd in self.xdd_files])
+            finally:
+                pool.close()
+                pool.join()
+
+            names = list()
+            for number, xdd in enumerate(self.xdd_files):
+                # The device folder is named after the xdd file
+                name = os.path.splitext(os.path.basename(xdd))[0]
+                if name in names:
+                    name = "%s_%d" % (name, number)
+                names.append(name)
+                self.devices.append({'name': name, 'offset': (number + 1) * DEVICE_NODE_ID_RANGE,
+                                     'manufacturer': variables[number][0], 'standardised': variables[number][1]})
+
+        # All devices share the object dictionary of the gateway
+        owners = {}
+        for device in iter(self.devices):
+            device_name = device['name'] or "the xdd file"
+            indices = set()
+            for item in device['manufacturer'] + device['standardised']:
+                if item['index'] in owners:
+                    self.logger.error("Object 0x%s of %s is already defined by %s!" % (
+                                      item['index'], device_name, owners[item['index']]))
+                    sys.exit(-1)
+                if not (item['index'] + item['subIndex']).isdigit():
+                    self.logger.error("Object 0x%s/0x%s of %s can't be mapped to a numeric node id!" % (
+                                      item['index'], item['subIndex'], device_name))
+                    sys.exit(-1)
+                item['nodeId'] = device['offset'] + int(item['index'] + item['subIndex'])
+                indices.add(item['index'])
+            for index in iter(indices):
+                owners[index] = device_name
+
+    # Get the manufacturer and standardised variables of all devices sorted by the object index
+    def get_objects(self):
+
+        if not self.devices:
+            self.create_devices()
+
+        manufacturer = list()
+        standardised = list()
+        for device in iter(self.devices):
+            manufacturer.extend(device['manufacturer'])
+            standardised.extend(device['standardised'])
+
+        manufacturer.sort(key=lambda item: int(item['index'], 16))
+        standardised.sort(key=lambda item: int(item['index'], 16))
+        return manufacturer, standardised
+
+    # Get the object dictionary macro and access of a variable. Cyclic variables are linked into the
+    # process image, all other variables are stored in the object dictionary and accessed on demand
+    def get_obd_entry(self, item):
+        if item['cyclic']:
+            return 'OBD_SUBINDEX_RAM_USERDEF', 'kObdAccVPR' if item['accessType'] == 'ro' else 'kObdAccVPRW'
+        return 'OBD_SUBINDEX_RAM_VAR', 'kObdAccR' if item['accessType'] == 'ro' else 'kObdAccRW'
+
+    # Creates the objdict.h file inside the /common/objdicts/CiA401_CN folder
+    def create_objdict(self):
 
         header_file = self.directory + "/tools/schema/objdict.h"
 
@@ -267,14 +421,14 @@ class ConvertXDD:
         header.append("    OBD_BEGIN_PART_MANUFACTURER()\n")
         header.append("\n")
 
-        self.create_variables()
+        manufacturer, standardised = self.get_objects()
 
-        if not self.manufacturer:
+        if not manufacturer:
             pass
         else:
             last_index = '0'
             first_index = 1
-            for item in iter(self.manufacturer):
+            for item in iter(manufacturer):
                 # Array Type
                 if item['type'] == 1:
                     if last_index != item['index']:
@@ -299,9 +453,9 @@ class ConvertXDD:
                             last_index = item['index']
 
                     odb_type = self.object_dict_types[item['dataType']]
-                    odb_acc = 'kObdAccVPR' if item['accessType'] == 'ro' else 'kObdAccVPRW'
+                    odb_macro, odb_acc = self.get_obd_entry(item)
 
-                    header.append("            OBD_SUBINDEX_RAM_USERDEF(0x%s" % item['index'] +
+                    header.append("            %s(0x%s" % (odb_macro, item['index']) +
                                   ", 0x{0:02x}".format(int(item['subIndex'])) +
                                   ", %s, %s, %s, %s, %s)\n" % (
                                 odb_type[0], odb_acc, odb_type[1], item['name'], odb_type[2]))
@@ -322,10 +476,11 @@ class ConvertXDD:
                             last_index = item['index']
 
                         odb_type = self.object_dict_types[item['dataType']]
-                        odb_acc = 'kObdAccVPR' if item['accessType'] == 'ro' else 'kObdAccVPRW'
+                        odb_macro, odb_acc = self.get_obd_entry(item)
 
-                        header.append("            OBD_SUBINDEX_RAM_VAR(0x%s, 0x00, %s, %s, %s, %s, %s)\n" % (
-                                    item['index'], odb_type[0], odb_acc, odb_type[1], item['name'], odb_type[2]))
+                        header.append("            %s(0x%s, 0x00, %s, %s, %s, %s, %s)\n" % (
+                                    odb_macro, item['index'], odb_type[0], odb_acc, odb_type[1], item['name'],
+                                    odb_type[2]))
 
                 header.append("        OBD_END_INDEX(0x%s)\n" % last_index)
                 header.append("\n")
@@ -337,12 +492,12 @@ class ConvertXDD:
         header.append("     *************************************************************************/\n")
         header.append("    OBD_BEGIN_PART_DEVICE()\n")
 
-        if not self.standardised:
+        if not standardised:
             pass
         else:
             last_index = '0'
             first_index = 1
-            for item in iter(self.standardised):
+            for item in iter(standardised):
                 # Array Type
                 if item['type'] == 1:
                     if last_index != item['index']:
@@ -367,9 +522,9 @@ class ConvertXDD:
                             last_index = item['index']
 
                     odb_type = self.object_dict_types[item['dataType']]
-                    odb_acc = 'kObdAccVPR' if item['accessType'] == 'ro' else 'kObdAccVPRW'
+                    odb_macro, odb_acc = self.get_obd_entry(item)
 
-                    header.append("            OBD_SUBINDEX_RAM_USERDEF(0x%s, " % item['index'] +
+                    header.append("            %s(0x%s, " % (odb_macro, item['index']) +
                                   "0x{0:02x}, ".format(int(item['subIndex'])) +
                                   "%s, %s, %s, %s, %s)\n" % (
                                 odb_type[0], odb_acc, odb_type[1], item['name'], odb_type[2]))
@@ -389,10 +544,11 @@ class ConvertXDD:
                             last_index = item['index']
 
                         odb_type = self.object_dict_types[item['dataType']]
-                        odb_acc = 'kObdAccVPR' if item['accessType'] == 'ro' else 'kObdAccVPRW'
+                        odb_macro, odb_acc = self.get_obd_entry(item)
 
-                        header.append("            OBD_SUBINDEX_RAM_VAR(0x%s, 0x00, %s, %s, %s, %s, %s, %s)\n" % (
-                                    item['index'], odb_type[0], odb_acc, odb_type[1], item['name'], odb_type[2]))
+                        header.append("            %s(0x%s, 0x00, %s, %s, %s, %s, %s)\n" % (
+                                    odb_macro, item['index'], odb_type[0], odb_acc, odb_type[1], item['name'],
+                                    odb_type[2]))
             header.append("        OBD_END_INDEX(0x%s)\n" % last_index)
             header.append("\n")
         header.append("    OBD_END_PART()\n")
@@ -409,17 +565,77 @@ class ConvertXDD:
         with open(self.directory + "/common/objdicts/CiA401_CN/objdict.h", 'w') as f:
             f.writelines(header)
 
-    # Create the opc ua nodeset.xml file
+    # Create the opc ua nodeset.xml file and compile it
     def create_nodeset(self):
+        self.create_nodeset_xml()
+        self.compile_nodeset()
 
-        if not self.oplk_tags:
-            if self.root is None:
-                self.logger.error("There is no xml root defined!")
-                sys.exit(-1)
-            if not self.oplk_elements:
-                self.create_oplk_elements()
-            self.create_oplk_tags()
-            self.logger.info("Creating POWERLINK tags!")
+    # Create the xml lines of an opc ua folder
+    def create_nodeset_folder(self, node_id, name, parent):
+        header = list()
+        header.append('    <UAObject NodeId="ns=1;i=%s" BrowseName="1:%s">\n' % (node_id, escape(name, {'"': '&quot;'})))
+        header.append('        <DisplayName>%s</DisplayName>\n' % escape(name))
+        header.append('        <References>\n')
+        header.append('            <Reference ReferenceType="Organizes" IsForward="false">%s</Reference>\n' % parent)
+        header.append('            <Reference ReferenceType="HasTypeDefinition">i=61</Reference>\n')
+        header.append('        </References>\n')
+        header.append('    </UAObject>\n')
+        return header
+
+    # Create the xml lines of the objects and variables of one profile area
+    def create_nodeset_area(self, items, folder, offset):
+        header = list()
+
+        # Node ids of the variables of each array object
+        components = {}
+        for item in iter(items):
+            if item['type'] == 1:
+                components.setdefault(item['index'], list()).append(item['nodeId'])
+
+        last_index = '0'
+        for item in iter(items):
+            parent = folder
+            if item['type'] == 1:
+                parent = offset + int(item['index'])
+                if last_index != item['index']:
+                    # Create Instance
+                    header.append('    <UAObject NodeId="ns=1;i=%s" BrowseName="1:%s">\n' % (
+                                parent, item['ObjectName']))
+                    header.append('        <DisplayName>%s</DisplayName>\n' % (item['ObjectName']))
+                    header.append('        <References>\n')
+                    header.append('            <Reference ReferenceType="Organizes" IsForward="false">' +
+                                  'ns=1;i=%s</Reference>\n' % folder)
+                    header.append('            <Reference ReferenceType="HasTypeDefinition">i=58</Reference>\n')
+                    for node_id in iter(components[item['index']]):
+                        header.append('            <Reference ReferenceType="HasComponent">ns=1;i=%s</Reference>\n' %
+                                      node_id)
+                    header.append('        </References>\n')
+                    header.append('    </UAObject>\n')
+                    last_index = item['index']
+
+            data_type = self.opcua_types.get(item['dataType'])
+            access = '3' if item['accessType'] == 'ro' else '1'
+            header.append('    <UAVariable ParentNodeId="ns=1;i=%s" NodeId="ns=1;i=%s" ' % (parent, item['nodeId']) +
+                          'BrowseName="1:%s" DataType="i=%s" UserAccessLevel="%s" AccessLevel="%s">\n' % (
+                        item['name'], data_type[1], access, access))
+            header.append('        <DisplayName>%s</DisplayName>\n' % item['name'])
+            header.append('        <References>\n')
+            header.append('            <Reference ReferenceType="HasTypeDefinition">i=63</Reference>\n')
+            header.append('            <Reference ReferenceType="HasComponent" IsForward="false">' +
+                          'ns=1;i=%s</Reference>\n' % parent)
+            header.append('        </References>\n')
+            header.append('        <Value>\n')
+            header.append('            <uax:%s>0</uax:%s>\n' % (data_type[0], data_type[0]))
+            header.append('        </Value>\n')
+            header.append('    </UAVariable>\n')
+
+        return header
+
+    # Create the opc ua nodeset.xml file
+    def create_nodeset_xml(self):
+
+        if not self.devices:
+            self.create_devices()
 
         header = list()
         header.append('<UANodeSet xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ' +
@@ -431,15 +647,11 @@ class ConvertXDD:
         header.append('    </NamespaceUris>\n')
 
         unique_datatype = list()
-        self.create_variables()
-
-        for item in iter(self.manufacturer):
-            if not self.opcua_types[item['dataType']] in unique_datatype:
-                unique_datatype.append(self.opcua_types[item['dataType']])
 
-        for item in iter(self.standardised):
-            if not self.opcua_types[item['dataType']] in unique_datatype:
-                unique_datatype.append(self.opcua_types[item['dataType']])
+        for device in iter(self.devices):
+            for item in device['manufacturer'] + device['standardised']:
+                if not self.opcua_types[item['dataType']] in unique_datatype:
+                    unique_datatype.append(self.opcua_types[item['dataType']])
 
         # Add variable types
         header.append('    <Aliases>\n')
@@ -455,140 +667,23 @@ class ConvertXDD:
         header.append('    </Aliases>\n')
 
         # POWERLINK Folder
-        header.append('    <UAObject NodeId="ns=1;i=1000" BrowseName="1:POWERLINK">\n')
-        header.append('        <DisplayName>POWERLINK</DisplayName>\n')
-        header.append('        <References>\n')
-        header.append('            <Reference ReferenceType="Organizes" IsForward="false">i=85</Reference>\n')
-        header.append('            <Reference ReferenceType="HasTypeDefinition">i=61</Reference>\n')
-        header.append('        </References>\n')
-        header.append('    </UAObject>\n')
+        header.extend(self.create_nodeset_folder(1000, 'POWERLINK', 'i=85'))
 
-        # Manufacturer Folder
-        header.append('    <UAObject NodeId="ns=1;i=200" BrowseName="1:Manufacturer">\n')
-        header.append('        <DisplayName>Manufacturer</DisplayName>\n')
-        header.append('        <References>\n')
-        header.append('            <Reference ReferenceType="Organizes" IsForward="false">ns=1;i=1000</Reference>\n')
-        header.append('            <Reference ReferenceType="HasTypeDefinition">i=61</Reference>\n')
-        header.append('        </References>\n')
-        header.append('    </UAObject>\n')
+        for device in iter(self.devices):
+            offset = device['offset']
+            parent = 'ns=1;i=1000'
 
-        # Standardised Folder
-        header.append('    <UAObject NodeId="ns=1;i=600" BrowseName="1:Standardised">\n')
-        header.append('        <DisplayName>Standardised</DisplayName>\n')
-        header.append('        <References>\n')
-        header.append('            <Reference ReferenceType="Organizes" IsForward="false">ns=1;i=1000</Reference>\n')
-        header.append('            <Reference ReferenceType="HasTypeDefinition">i=61</Reference>\n')
-        header.append('        </References>\n')
-        header.append('    </UAObject>\n')
+            # Device Folder, only used if the gateway contains several devices
+            if device['name'] is not None:
+                header.extend(self.create_nodeset_folder(offset + 1000, device['name'], parent))
+                parent = 'ns=1;i=%s' % (offset + 1000)
 
-        last_index = '0'
-        for item in iter(self.manufacturer):
-            if item['type'] == 1:
-                if last_index != item['index']:
-                    # Create Instance
-                    header.append(
-                        '    <UAObject NodeId="ns=1;i=%s" BrowseName="1:%s">\n' % (item['index'], item['ObjectName']))
-                    header.append('        <DisplayName>%s</DisplayName>\n' % (item['ObjectName']))
-                    header.append('        <References>\n')
-                    header.append(
-                        '            <Reference ReferenceType="Organizes" IsForward="false">ns=1;i=600</Reference>\n')
-                    header.append('            <Reference ReferenceType="HasTypeDefinition">i=58</Reference>\n')
-                    for obj in range(0, item['Objects']):
-                        header.append('            <Reference ReferenceType="HasComponent">ns=1;i=%s</Reference>\n' % (
-                                    item['index'] + "{0:02x}".format(obj+1)))
-                    header.append('        </References>\n')
-                    header.append('    </UAObject>\n')
-                    last_index = item['index']
-
-                data_type = self.opcua_types.get(item['dataType'])
-                access = '3' if item['accessType'] == 'ro' else '1'
-                header.append('    <UAVariable ParentNodeId="ns=1;i=%s" NodeId="ns=1;i=%s" ' % (
-                            item['index'], item['index'] + item['subIndex']) +
-                              'BrowseName="1:%s" DataType="i=%s" UserAccessLevel="%s" AccessLevel="%s">\n' % (
-                            item['name'], data_type[1], access, access))
-                header.append('        <DisplayName>%s</DisplayName>\n' % item['name'])
-                header.append('        <References>\n')
-                header.append('            <Reference ReferenceType="HasTypeDefinition">i=63</Reference>\n')
-                header.append(
-                    '            <Reference ReferenceType="HasComponent" IsForward="false">ns=1;i=%s</Reference>\n' % item[
-                        'index'])
-                header.append('        </References>\n')
-                header.append('        <Value>\n')
-                header.append('            <uax:%s>0</uax:%s>\n' % (data_type[0], data_type[0]))
-                header.append('        </Value>\n')
-                header.append('    </UAVariable>\n')
-
-            else:
-                data_type = self.opcua_types.get(item['dataType'])
-                access = '3' if item['accessType'] == 'ro' else '1'
-                header.append('    <UAVariable ParentNodeId="ns=1;i=%s" NodeId="ns=1;i=%s" ' % (
-                            item['index'], item['index'] + item['subIndex']) +
-                              'BrowseName="1:%s" DataType="i=%s" UserAccessLevel="%s" AccessLevel="%s">\n' % (
-                            item['name'], data_type[1], access, access))
-                header.append('        <DisplayName>%s</DisplayName>\n' % item['name'])
-                header.append('        <References>\n')
-                header.append('            <Reference ReferenceType="HasTypeDefinition">i=63</Reference>\n')
-                header.append(
-                    '            <Reference ReferenceType="HasComponent" IsForward="false">ns=1;i=600</Reference>\n')
-                header.append('        </References>\n')
-                header.append('        <Value>\n')
-                header.append('            <uax:%s>0</uax:%s>\n' % (data_type[0], data_type[0]))
-                header.append('        </Value>\n')
-                header.append('    </UAVariable>\n')
-
-        last_index = '0'
-        for item in iter(self.standardised):
-            if item['type'] == 1:
-                if last_index != item['index']:
-                    # Create Instance
-                    header.append('    <UAObject NodeId="ns=1;i=%s" BrowseName="1:%s">\n' % (
-                                item['index'], item['ObjectName']))
-                    header.append('        <DisplayName>%s</DisplayName>\n' % (item['ObjectName']))
-                    header.append('        <References>\n')
-                    header.append('            <Reference ReferenceType="Organizes" IsForward="false">' +
-                                  'ns=1;i=600</Reference>\n')
-                    header.append('            <Reference ReferenceType="HasTypeDefinition">i=58</Reference>\n')
-                    for obj in range(0, item['Objects']):
-                        header.append('            <Reference ReferenceType="HasComponent">ns=1;i=%s</Reference>\n' % (
-                                    item['index'] + "{0:02x}".format(obj+1)))
-                    header.append('        </References>\n')
-                    header.append('    </UAObject>\n')
-                    last_index = item['index']
+            # Manufacturer and Standardised Folders
+            header.extend(self.create_nodeset_folder(offset + 200, 'Manufacturer', parent))
+            header.extend(self.create_nodeset_folder(offset + 600, 'Standardised', parent))
 
-                data_type = self.opcua_types.get(item['dataType'])
-                access = '3' if item['accessType'] == 'ro' else '1'
-                header.append('    <UAVariable ParentNodeId="ns=1;i=%s" NodeId="ns=1;i=%s" ' % (
-                            item['index'], item['index'] + item['subIndex']) +
-                              'BrowseName="1:%s" DataType="i=%s" UserAccessLevel="%s" AccessLevel="%s">\n' % (
-                            item['name'], data_type[1], access, access))
-                header.append('        <DisplayName>%s</DisplayName>\n' % item['name'])
-                header.append('        <References>\n')
-                header.append('            <Reference ReferenceType="HasTypeDefinition">i=63</Reference>\n')
-                header.append('            <Reference ReferenceType="HasComponent" IsForward="false">' +
-                              'ns=1;i=%s</Reference>\n' % item['index'])
-                header.append('        </References>\n')
-                header.append('        <Value>\n')
-                header.append('            <uax:%s>0</uax:%s>\n' % (data_type[0], data_type[0]))
-                header.append('        </Value>\n')
-                header.append('    </UAVariable>\n')
-
-            else:
-                data_type = self.opcua_types.get(item['dataType'])
-                access = '3' if item['accessType'] == 'ro' else '1'
-                header.append('    <UAVariable ParentNodeId="ns=1;i=%s" NodeId="ns=1;i=%s" ' % (
-                            item['index'], item['index'] + item['subIndex']) +
-                              'BrowseName="1:%s" DataType="i=%s" UserAccessLevel="%s" AccessLevel="%s">\n' % (
-                            item['name'], data_type[1], access, access))
-                header.append('        <DisplayName>%s</DisplayName>\n' % item['name'])
-                header.append('        <References>\n')
-                header.append('            <Reference ReferenceType="HasTypeDefinition">i=63</Reference>\n')
-                header.append('            <Reference ReferenceType="HasComponent" IsForward="false">' +
-                              'ns=1;i=600</Reference>\n')
-                header.append('        </References>\n')
-                header.append('        <Value>\n')
-                header.append('            <uax:%s>0</uax:%s>\n' % (data_type[0], data_type[0]))
-                header.append('        </Value>\n')
-                header.append('    </UAVariable>\n')
+            header.extend(self.create_nodeset_area(device['manufacturer'], offset + 200, offset))
+            header.extend(self.create_nodeset_area(device['standardised'], offset + 600, offset))
 
         header.append('    <UAVariable ParentNodeId="ns=1;i=1000" NodeId="ns=1;i=1001" BrowseName="1:' +
                       'OperationStatus" DataType="i=12" UserAccessLevel="1" AccessLevel="1">\n')
@@ -608,15 +703,20 @@ class ConvertXDD:
             for line in iter(header):
                 f.write(line)
 
-        if os.path.isfile(self.directory + "/src/nodeset.c"):
-            os.remove(self.directory + "/src/nodeset.c")
-
-        if os.path.isfile(self.directory + "/include/opcua/nodeset.h"):
-            os.remove(self.directory + "/include/opcua/nodeset.h")
+    # Compile the opc ua nodeset.xml file into the nodeset.c and nodeset.h files
+    # and the nodeset_shard<N>.c files. The compiler only rewrites files whose
+    # content changed, so unchanged files are not compiled again, and it reuses
+    # the code of the nodes which did not change since the last run.
+    def compile_nodeset(self):
 
+        # Only the functions backend is split into shards
+        shards = self.shards if self.backend == "functions" else 1
         ret = os.system(
                 "python %s/tools/nodeset_compiler/nodeset_compiler.py " % self.directory +
-                "--types-array=UA_TYPES --existing %s/tools/schema/Opc.Ua.NodeSet2.Minimal.xml" % self.directory +
+                "--types-array=UA_TYPES --order-cache --code-cache --shards %d" % shards +
+                " --backend %s" % self.backend +
+                (" --profile" if self.profile else "") +
+                " --existing %s/tools/schema/Opc.Ua.NodeSet2.Minimal.xml" % self.directory +
                 " --xml %s %s/include/opcua/nodeset" % (
                     self.directory + '/tools/nodeset/nodeset.xml', self.directory))
 
@@ -627,26 +727,17 @@ class ConvertXDD:
     # Creates the app.c file
     def create_app(self):
 
-        if not self.oplk_tags:
-            if self.root is None:
-                self.logger.error("There is no xml root defined!")
-                sys.exit(-1)
-            if not self.oplk_elements:
-                self.create_oplk_elements()
-            self.create_oplk_tags()
-            self.logger.info("Creating POWERLINK tags!")
-
         with open(self.directory + "/tools/xdd_compiler/exchange.c", 'r') as f:
             file_data = f.readlines()
 
         data_l = list()
 
-        self.create_variables()
+        manufacturer, standardised = self.get_objects()
 
-        for item in iter(self.manufacturer):
+        for item in iter(manufacturer):
             data_l.append(item)
 
-        for item in iter(self.standardised):
+        for item in iter(standardised):
             data_l.append(item)
 
         # Create the structure for the Input variables
@@ -658,8 +749,11 @@ class ConvertXDD:
                 unique_names.append(name_str)
                 data_new.append(
                     {'dataType': self.oplk_types[item['dataType']], 'name': name_str,
-                     'index': item['index'], 'subIndex': item['subIndex'],
-                     'accessType': item['accessType'], 'type': item['type']})
+                     'index': item['index'], 'subIndex': item['subIndex'], 'nodeId': item['nodeId'],
+                     'accessType': item['accessType'], 'type': item['type'], 'cyclic': item['cyclic']})
+
+        # Only the PDO mapped variables are part of the process image
+        data_cyclic = [item for item in data_new if item['cyclic']]
 
         tmp_data_in = list()
         tmp_data_out = list()
@@ -673,7 +767,7 @@ class ConvertXDD:
         tmp_data_out.append("typedef struct\n")
         tmp_data_out.append("{\n")
 
-        for item in iter(data_new):
+        for item in iter(data_cyclic):
             if item['accessType'] == 'ro':
                 tmp_data_in.append("   %s                %s;\n" % (
                                 self.opcua_data_types[self.oplk_types_reverse[item['dataType']]][0], item['name']))
@@ -681,6 +775,12 @@ class ConvertXDD:
                 tmp_data_out.append("   %s                %s;\n" % (
                                 self.opcua_data_types[self.oplk_types_reverse[item['dataType']]][0], item['name']))
 
+        # Structures must not be empty
+        if len(tmp_data_in) == 3:
+            tmp_data_in.append("   UA_Byte                unused;\n")
+        if len(tmp_data_out) == 3:
+            tmp_data_out.append("   UA_Byte                unused;\n")
+
         tmp_data_in.append("} PI_IN;\n")
         tmp_data_in.append("\n")
 
@@ -711,6 +811,34 @@ class ConvertXDD:
         file_data.append("\n")
         file_data.append("BOOL status_init = 1;")
         file_data.append("\n")
+        file_data.append("\n")
+
+        # Variables which are written by OPC UA clients
+        file_data.append("// OPC UA variables written by clients\n")
+        file_data.append("static const tOpcuaWriteTarget aWriteTargets_l[] =\n")
+        file_data.append("{\n")
+        for item in iter(data_cyclic):
+            if item['accessType'] == 'ro':
+                file_data.append("    {%s, &%s, sizeof(%s)},\n" % (
+                                item['nodeId'], item['name'] + "_l", item['name'] + "_l"))
+        file_data.append("    {0, NULL, 0}\n")
+        file_data.append("};\n")
+        file_data.append("\n")
+
+        # Variables which are not PDO mapped, these are accessed in the object dictionary on demand
+        for access, table, comment in [('rw', 'aReadObjects_l', 'read on demand by clients'),
+                                       ('ro', 'aWriteObjects_l', 'written on demand by clients')]:
+            file_data.append("// Object dictionary entries %s\n" % comment)
+            file_data.append("static const tOpcuaObject %s[] =\n" % table)
+            file_data.append("{\n")
+            for item in iter(data_new):
+                if not item['cyclic'] and item['accessType'] == access:
+                    file_data.append("    {%s, 0x%s, 0x%02x, &%s, sizeof(%s)},\n" % (
+                                    item['nodeId'], item['index'], int(item['subIndex'], 16), item['name'] + "_l",
+                                    item['name'] + "_l"))
+            file_data.append("    {0, 0, 0, NULL, 0}\n")
+            file_data.append("};\n")
+            file_data.append("\n")
 
         # processSync function
 
@@ -725,7 +853,7 @@ class ConvertXDD:
 
         file_data.append("\n")
 
-        for item in iter(data_new):
+        for item in iter(data_cyclic):
             if item['accessType'] == 'ro':
                 tmp_data_in.append("    pProcessImageIn_l->%s = %s;\n" % (item['name'], item['name'] + "_l"))
             else:
@@ -751,12 +879,12 @@ class ConvertXDD:
         callback = list()
         callback.append("void callbackOPCUA(UA_Server *server) {\n")
 
-        for item in iter(data_new):
+        for item in iter(data_cyclic):
             # Input type
             if item['accessType'] == 'rw':
                 callback.append("	// Write a different value\n")
                 callback.append("	UA_NodeId %s = UA_NODEID_NUMERIC(2, %s);\n" % (
-                                "nodeId" + item['name'], item['index'] + item['subIndex']))
+                                "nodeId" + item['name'], item['nodeId']))
                 callback.append("\n")
                 callback.append("	%s variable_%s;\n" % (
                                 self.opcua_data_types[self.oplk_types_reverse[item['dataType']]][0],
@@ -771,16 +899,6 @@ class ConvertXDD:
                                  self.opcua_data_types[self.oplk_types_reverse[item['dataType']]][1]))
                 callback.append("	UA_Server_writeValue(server, %s, var%s);\n" % ("nodeId" + item['name'], item['name']))
                 callback.append("\n")
-            else:
-                callback.append("	// Read a value\n")
-                callback.append("	UA_NodeId %s = UA_NODEID_NUMERIC(2, %s);\n" %
-                                ("nodeId" + item['name'], item['index'] + item['subIndex']))
-                callback.append("\n")
-                callback.append("	UA_Variant var%s;\n" % item['name'])
-                callback.append("	UA_Server_readValue(server, %s, &var%s);\n" % ("nodeId" + item['name'], item['name']))
-                callback.append("	memcpy(&%s, var%s.data, sizeof(%s));\n" %
-                                (item['name'] + "_l", item['name'], item['dataType']))
-                callback.append("\n")
 
         callback.append("	// Write the status value\n")
         callback.append("	UA_NodeId nodeIdStatus = UA_NODEID_NUMERIC(2, 1001);\n")
@@ -794,6 +912,48 @@ class ConvertXDD:
         callback.append("}\n")
         callback.append("\n")
 
+        # Attach the write callback to the variables written by clients
+        callback.append("UA_StatusCode setupCallbacks_OPCUA(UA_Server *server) {\n")
+        callback.append("	UA_ValueCallback callback;\n")
+        callback.append("	UA_StatusCode retval;\n")
+        callback.append("	const tOpcuaWriteTarget* pTarget;\n")
+        callback.append("	const tOpcuaObject* pObject;\n")
+        callback.append("\n")
+        callback.append("	callback.onRead = NULL;\n")
+        callback.append("	callback.onWrite = writeCallback;\n")
+        callback.append("\n")
+        callback.append("	for (pTarget = aWriteTargets_l; pTarget->pVar != NULL; pTarget++) {\n")
+        callback.append("		UA_NodeId nodeId = UA_NODEID_NUMERIC(2, pTarget->nodeId);\n")
+        callback.append("\n")
+        callback.append("		retval = UA_Server_setNodeContext(server, nodeId, (void*)pTarget);\n")
+        callback.append("		if (retval == UA_STATUSCODE_GOOD)\n")
+        callback.append("			retval = UA_Server_setVariableNode_valueCallback(server, nodeId, callback);\n")
+        callback.append("		if (retval != UA_STATUSCODE_GOOD)\n")
+        callback.append("			return retval;\n")
+        callback.append("	}\n")
+        callback.append("\n")
+
+        # Attach the object dictionary callbacks to the variables which are not PDO mapped
+        for table, on_read, on_write in [('aReadObjects_l', 'readObjectCallback', 'NULL'),
+                                         ('aWriteObjects_l', 'NULL', 'writeObjectCallback')]:
+            callback.append("	callback.onRead = %s;\n" % on_read)
+            callback.append("	callback.onWrite = %s;\n" % on_write)
+            callback.append("\n")
+            callback.append("	for (pObject = %s; pObject->pVar != NULL; pObject++) {\n" % table)
+            callback.append("		UA_NodeId nodeId = UA_NODEID_NUMERIC(2, pObject->nodeId);\n")
+            callback.append("\n")
+            callback.append("		retval = UA_Server_setNodeContext(server, nodeId, (void*)pObject);\n")
+            callback.append("		if (retval == UA_STATUSCODE_GOOD)\n")
+            callback.append("			retval = UA_Server_setVariableNode_valueCallback(server, nodeId, callback);\n")
+            callback.append("		if (retval != UA_STATUSCODE_GOOD)\n")
+            callback.append("			return retval;\n")
+            callback.append("	}\n")
+            callback.append("\n")
+
+        callback.append("	return UA_STATUSCODE_GOOD;\n")
+        callback.append("}\n")
+        callback.append("\n")
+
         for line in iter(callback):
             file_data.append(line)
 
@@ -870,7 +1030,7 @@ class ConvertXDD:
         for line in iter(app_init):
             file_data.append(line)
 
-        for item in iter(data_new):
+        for item in iter(data_cyclic):
             if item['accessType'] == 'ro':
                 file_data.append("    obdSize = sizeof(pProcessImageIn_l->%s);\n" % item['name'])
             else:
@@ -906,14 +1066,7 @@ class ConvertXDD:
 
     # Create all the required files
     def create_all(self):
-        if not self.oplk_tags:
-            if self.root is None:
-                self.logger.error("There is no xml root defined!")
-                sys.exit(-1)
-            if not self.oplk_elements:
-                self.create_oplk_elements()
-            self.create_oplk_tags()
-            self.logger.info("Creating POWERLINK tags!")
+        self.create_devices()
 
         self.logger.info("Creating Files!")
         self.create_objdict()
@@ -924,12 +1077,19 @@ class ConvertXDD:
 
 # Main function controlling the compilation
 if __name__ == '__main__':
-    # Get the xdd file path
-    xdd_file = sys.argv[1]
+    # Get the xdd file paths, several devices are separated by ';' like a CMake list
+    xdd_file = sys.argv[1].split(';')
     # Get the project start path
     root_dir = sys.argv[2]
     # Get the namespace link
     link_name = sys.argv[3]
-
-    converter = ConvertXDD(link=link_name, xdd=xdd_file, directory=root_dir)
+    # Get the number of nodeset shards, optional
+    shards = int(sys.argv[4]) if len(sys.argv) > 4 and sys.argv[4] else 1
+    # Get the backend of the nodeset compiler, optional
+    backend = sys.argv[5] if len(sys.argv) > 5 and sys.argv[5] else "functions"
+    # Get the start-up profiling of the nodeset code as CMake boolean, optional
+    profile = len(sys.argv) > 6 and sys.argv[6].upper() in ["ON", "TRUE", "YES", "Y", "1"]
+
+    converter = ConvertXDD(link=link_name, xdd=xdd_file, directory=root_dir, shards=shards, backend=backend,
+                           profile=profile)
     converter.create_all()
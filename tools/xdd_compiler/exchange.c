@@ -79,3 +79,21 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 //------------------------------------------------------------------------------
 // local types
 //------------------------------------------------------------------------------
+// OPC UA variable which is written by clients into an application variable
+typedef struct
+{
+    UA_UInt32       nodeId;
+    void*           pVar;
+    size_t          size;
+} tOpcuaWriteTarget;
+
+// Object dictionary entry which is accessed on demand by OPC UA clients
+typedef struct
+{
+    UA_UInt32       nodeId;
+    UINT            index;
+    UINT            subIndex;
+    void*           pVar;
+    size_t          size;
+} tOpcuaObject;
+